@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+    SNMP AsyncPoller - polls all configured devices from a single process
+    using one asyncio event loop (instead of one SNMPMonitoring process per device).
+    Each device has its own long-running task, which sleeps until the device's own
+    jittered tick and polls it, so devices are spread over the interval.
+    Output is written per device to snmp-<device>-latest.json (or .snap, same as SNMPMonitoring).
+"""
+import copy
+import time
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from SNMPMon.snmpmon import SNMPMonitoring
+from SNMPMon.daemonizer import TickSchedule
+from SNMPMon.utilities import getConfig
+from SNMPMon.utilities import getTimeRotLogger
+
+
+class AsyncPoller():
+    """SNMP Async Poller Class"""
+    def __init__(self, config, onetimerun=False):
+        self.config = config
+        self.logger = self._getCustomLogger()
+        self.concurrency = max(1, int(config.get('pollerParams', {}).get('concurrency', 10)))
+        # If onetimerun, each device is polled once (on its tick), otherwise poller runs until stopped
+        self.onetimerun = onetimerun
+        self.schedules = {}
+        # easysnmp calls are blocking, so they run in a bounded thread pool driven by the event loop
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.devices = {}
+        self.refreshDevices()
+
+    def _getCustomLogger(self):
+        """Get Custom Logger (separate log file from MultiWorker)"""
+        logParams = dict(self.config['logParams'])
+        logParams['logFile'] = f"{logParams.get('logFile', 'snmpmon')}.poller.out"
+        logParams['service'] = 'SNMP-Poller'
+        return getTimeRotLogger(**logParams)
+
+    def refreshDevices(self):
+        """Create SNMPMonitoring object for each configured device (kept between cycles)"""
+        for device in self.config.get('snmpMon', {}).keys():
+            if device not in self.devices:
+                # Each device gets own config copy, as SNMPMonitoring modifies logParams
+                self.devices[device] = SNMPMonitoring(copy.deepcopy(self.config), device)
+                interval = self.devices[device].runInterval or self.config.get('runInterval', 30)
+                self.schedules[device] = TickSchedule(f'SNMPPoller-{device}', interval,
+                                                      self.config.get('runJitter', 1.0))
+                self.schedules[device].start(time.time())
+        for device in list(self.devices.keys()):
+            if device not in self.config.get('snmpMon', {}):
+                self.devices.pop(device)
+                self.schedules.pop(device)
+
+    async def _pollDevice(self, semaphore, device, worker):
+        """Poll single device on its tick. Concurrency is limited by semaphore"""
+        schedule = self.schedules[device]
+        await asyncio.sleep(schedule.waitTime(time.time()))
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            startTime = time.time()
+            try:
+                await loop.run_in_executor(self.executor, worker.startwork)
+                return True
+            except Exception:
+                exc = traceback.format_exc()
+                self.logger.critical(f"Device {device} poll failed. Error details: {exc}")
+            finally:
+                schedule.completed(startTime, time.time())
+                worker.scheduleStats = schedule.stats
+            return False
+
+    async def _deviceLoop(self, semaphore, device, worker):
+        """Poll device on each of its ticks (once if onetimerun). Returns last poll result"""
+        while True:
+            result = await self._pollDevice(semaphore, device, worker)
+            if self.onetimerun:
+                return result
+
+    async def _pollAll(self):
+        """Run poll loop of all devices"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [self._deviceLoop(semaphore, device, worker) for device, worker in self.devices.items()]
+        return await asyncio.gather(*tasks)
+
+    def startwork(self):
+        """Poll all configured devices. Runs until stopped (returns after one poll per device if onetimerun)"""
+        if not self.devices:
+            self.logger.error("No devices to monitor configured for SNMP.")
+            return
+        results = asyncio.run(self._pollAll())
+        self.logger.info(f"Polled {len(results)} devices, {results.count(False)} failed.")
+        if not all(results):
+            raise Exception(f"SNMP Polling failed for {results.count(False)} devices.")
+
+
+if __name__ == '__main__':
+    CONFIG = getConfig('/etc/snmp-mon.yaml')
+    POLLER = AsyncPoller(CONFIG)
+    POLLER.startwork()
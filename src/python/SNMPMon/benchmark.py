@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+    SNMPMon micro-benchmarks.
+    Usage:
+        python3 -m SNMPMon.benchmark filter --interfaces 10000 --values 500
+        python3 -m SNMPMon.benchmark collect --sizes 48 1000 5000 --cycles 3 --latency 0.001
+        python3 -m SNMPMon.benchmark merge --sizes 1000 10000 50000 --sources 10
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+from SNMPMon.filterrules import FilterRules
+from SNMPMon.utilities import getFileContentAsJson
+from SNMPMon.utilities import getLatestFileName
+from SNMPMon.utilities import findMaxInteger
+from SNMPMon.utilities import updatedict
+
+
+def timeit(func, repeat=5):
+    """Run func repeat times and return (best time in seconds, last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        result = func()
+        runtime = time.perf_counter() - startTime
+        best = runtime if best is None else min(best, runtime)
+    return best, result
+
+
+def filterRowByRow(table, hostRules):
+    """Reference implementation - evaluate every filter for every row with list lookups"""
+    included = {}
+    for indx, row in table.items():
+        checks = []
+        for filterItem in hostRules.get('filters', []):
+            value, filterVal = row.get(filterItem['Key'], ''), filterItem['Val']
+            filterVal = filterVal if isinstance(filterVal, list) else [filterVal]
+            if filterItem.get('Startswith', False):
+                checks.append(any(value.startswith(item) for item in filterVal))
+            else:
+                checks.append(value in filterVal)
+        if (hostRules['operator'] == 'and' and all(checks)) or (hostRules['operator'] == 'or' and any(checks)):
+            included[indx] = row
+    return included
+
+
+def benchFilterRules(interfaces=10000, values=500, repeat=5):
+    """Benchmark compiled filter rules over interfaces x rule values"""
+    table = {str(idx): {'ifDescr': f'Ethernet{idx}', 'ifAlias': f'Vlan {idx}',
+                        'ifType': '6', 'ifAdminStatus': '1'} for idx in range(interfaces)}
+    step = max(1, interfaces // values)
+    hostRules = {'operator': 'and',
+                 'filters': [{'Key': 'ifDescr', 'Val': [f'Ethernet{idx * step}' for idx in range(values)]},
+                             {'Key': 'ifAlias', 'Val': [f'Vlan {idx * step}' for idx in range(values)],
+                              'Startswith': True}]}
+    logger = logging.getLogger('benchmark')
+    compileTime, rules = timeit(lambda: FilterRules(hostRules, logger), repeat)
+    compiledTime, compiledOut = timeit(lambda: rules.filterTable(table), repeat)
+    referenceTime, referenceOut = timeit(lambda: filterRowByRow(table, hostRules), repeat)
+    if set(compiledOut) != set(referenceOut):
+        raise Exception('Compiled filter rules output does not match reference output')
+    out = {'interfaces': interfaces, 'values': values, 'included': len(compiledOut),
+           'compile_ms': compileTime * 1000, 'compiled_ms': compiledTime * 1000,
+           'reference_ms': referenceTime * 1000}
+    print(f"Filter rules: {interfaces} interfaces x {values} rule values, {len(compiledOut)} included")
+    print(f"  compile:   {out['compile_ms']:.2f} ms")
+    print(f"  compiled:  {out['compiled_ms']:.2f} ms")
+    print(f"  reference: {out['reference_ms']:.2f} ms (row by row)")
+    return out
+
+
+def startSimulator(interfaces, **kwargs):
+    """Start SNMP agent simulator in separate process (so it does not use benchmark CPU/RSS).
+    Returns (process, port)"""
+    cmd = [sys.executable, '-m', 'SNMPMon.simulator', '--port', '0', '--interfaces', str(interfaces),
+           '--vlans', str(kwargs.get('vlans', 10)), '--macs', str(kwargs.get('macs', 20)),
+           '--latency', str(kwargs.get('latency', 0.0)), '--loss', str(kwargs.get('loss', 0.0)), '--seed', '1']
+    if kwargs.get('sonic', False):
+        cmd.append('--sonic')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         env.get('PYTHONPATH', '')])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=env, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith('Listening on'):
+        proc.kill()
+        raise Exception(f'SNMP simulator failed to start: {line}')
+    return proc, int(line.split()[2].split(':')[1])
+
+
+def benchCollect(sizes=(48, 1000, 5000), cycles=3, **kwargs):
+    """Benchmark SNMPMonitoring.startwork against local SNMP agent simulator.
+    Reports wall time, PDUs, CPU and peak RSS per cycle (first cycle is discovery)"""
+    # Imported here, so other benchmarks do not require easysnmp
+    from SNMPMon.snmpmon import SNMPMonitoring
+    results = []
+    print(f"{'ifaces':>7} {'cycle':>5} {'wall_ms':>9} {'cpu_ms':>9} {'pdus':>6} {'varbinds':>9} {'peak_rss_mb':>11}  errors")
+    for size in sizes:
+        tmpdir = tempfile.mkdtemp(prefix='snmpmon-bench-')
+        proc, port = startSimulator(size, **kwargs)
+        try:
+            device = {'snmpParams': {'hostname': '127.0.0.1', 'remote_port': port, 'community': 'public',
+                                     'version': 2, 'timeout': kwargs.get('timeout', 1),
+                                     'retries': kwargs.get('retries', 3)},
+                      'bulkParams': kwargs.get('bulkParams', {}), 'deadline': 0, 'macParams': {'interval': 0}}
+            if kwargs.get('sonic', False):
+                device['customOverride'] = 'ifDescrSonic'
+            config = {'tmpdir': tmpdir, 'runInterval': 30, 'snmpMon': {'bench': device},
+                      'logParams': {'logFile': os.path.join(tmpdir, 'bench'), 'logLevel': 'WARNING'}}
+            worker = SNMPMonitoring(config, 'bench')
+            for cycle in range(cycles):
+                error = ''
+                cpuStart, wallStart = time.process_time(), time.perf_counter()
+                try:
+                    worker.startwork()
+                except Exception as ex:
+                    error = str(ex)[:80]
+                wallTime, cpuTime = time.perf_counter() - wallStart, time.process_time() - cpuStart
+                stats = getFileContentAsJson(getLatestFileName(config, 'bench')).get('snmp_scan_stats', {})
+                out = {'interfaces': size, 'cycle': cycle, 'wall_ms': wallTime * 1000, 'cpu_ms': cpuTime * 1000,
+                       'pdus': stats.get('pdus', 0), 'varbinds': stats.get('varbinds', 0),
+                       'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'error': error}
+                results.append(out)
+                print(f"{size:>7} {cycle:>5} {out['wall_ms']:>9.1f} {out['cpu_ms']:>9.1f} {out['pdus']:>6} "
+                      f"{out['varbinds']:>9} {out['peak_rss_mb']:>11.1f}  {error}")
+        finally:
+            proc.kill()
+            proc.wait()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
+
+
+def updatedictReference(orig, new):
+    """Reference implementation - scan all container keys for next free index on every entry"""
+    for key, val in new.items():
+        for key1, val1 in val.items():
+            if not isinstance(val1, dict):
+                orig.setdefault(key, {}).setdefault(key1, "")
+                orig[key][key1] = val1
+                continue
+            for _mkey, mval in val1.items():
+                allitems = list(orig.get(key, {}).get(key1, {}).keys())
+                nextint = findMaxInteger(allitems) + 1 if allitems else 0
+                orig.setdefault(key, {}).setdefault(key1, {})[str(nextint)] = mval
+    return orig
+
+
+def benchMerge(sizes=(1000, 10000, 50000), sources=10, referenceLimit=10000, repeat=3):
+    """Benchmark merge of outputs (MultiWorker) - entries are split between sources,
+    all merged into the same device containers"""
+    results = []
+    print(f"{'entries':>8} {'sources':>7} {'merge_ms':>10} {'reference_ms':>12}")
+    for size in sizes:
+        perSource = max(1, size // sources)
+        outputs = [{'device': {'hostname': 'device', f'source{src}': src,
+                               'macs': {str(idx): f'00:00:00:{src:02x}:{idx // 256 % 256:02x}:{idx % 256:02x}'
+                                        for idx in range(perSource)}}} for src in range(sources)]
+
+        def merge(func):
+            out = {'device': {'macs': {}}}
+            for output in outputs:
+                out = func(out, output)
+            return out
+        mergeTime, mergeOut = timeit(lambda: merge(updatedict), repeat)
+        out = {'entries': perSource * sources, 'sources': sources, 'merge_ms': mergeTime * 1000, 'reference_ms': None}
+        if size <= referenceLimit:
+            referenceTime, referenceOut = timeit(lambda: merge(updatedictReference), 1)
+            if mergeOut != referenceOut:
+                raise Exception('Merge output does not match reference output')
+            out['reference_ms'] = referenceTime * 1000
+        results.append(out)
+        reference = f"{out['reference_ms']:>12.2f}" if out['reference_ms'] is not None else f"{'-':>12}"
+        print(f"{out['entries']:>8} {sources:>7} {out['merge_ms']:>10.2f} {reference}")
+    return results
+
+
+def getParser():
+    """Returns the argparse parser."""
+    oparser = argparse.ArgumentParser(description='SNMPMon micro-benchmarks', add_help=True)
+    subparsers = oparser.add_subparsers(dest='bench')
+    filterParser = subparsers.add_parser('filter', help='Benchmark compiled filter rules')
+    filterParser.add_argument('--interfaces', type=int, default=10000, help='Number of interfaces. Default 10000')
+    filterParser.add_argument('--values', type=int, default=500, help='Number of values per rule. Default 500')
+    filterParser.add_argument('--repeat', type=int, default=5, help='Repeat count (best is reported). Default 5')
+    collectParser = subparsers.add_parser('collect', help='Benchmark SNMP collection against local SNMP agent simulator')
+    collectParser.add_argument('--sizes', type=int, nargs='+', default=[48, 1000, 5000],
+                               help='Number of interfaces of simulated devices. Default 48 1000 5000')
+    collectParser.add_argument('--cycles', type=int, default=3, help='Polling cycles per device. Default 3')
+    collectParser.add_argument('--latency', type=float, default=0.0, help='Agent response latency in seconds. Default 0')
+    collectParser.add_argument('--loss', type=float, default=0.0, help='Agent request loss probability (0-1). Default 0')
+    collectParser.add_argument('--vlans', type=int, default=10, help='Number of vlans in FDB table. Default 10')
+    collectParser.add_argument('--macs', type=int, default=20, help='Number of MACs per vlan. Default 20')
+    collectParser.add_argument('--sonic', action='store_true', help='Simulate SONiC device (ifDescrSonic override)')
+    collectParser.add_argument('--timeout', type=float, default=1, help='SNMP timeout in seconds. Default 1')
+    collectParser.add_argument('--retries', type=int, default=3, help='SNMP retries. Default 3')
+    mergeParser = subparsers.add_parser('merge', help='Benchmark merge of outputs (updatedict)')
+    mergeParser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                             help='Number of merged entries. Default 1000 10000 50000')
+    mergeParser.add_argument('--sources', type=int, default=10, help='Number of merged outputs. Default 10')
+    mergeParser.add_argument('--reference-limit', dest='referenceLimit', type=int, default=10000,
+                             help='Run reference (quadratic) implementation up to this size. Default 10000')
+    mergeParser.add_argument('--repeat', type=int, default=3, help='Repeat count (best is reported). Default 3')
+    return oparser
+
+
+def execute(args):
+    """Main Execute."""
+    inargs = getParser().parse_args(args)
+    if inargs.bench == 'filter':
+        benchFilterRules(inargs.interfaces, inargs.values, inargs.repeat)
+    elif inargs.bench == 'collect':
+        benchCollect(inargs.sizes, inargs.cycles, latency=inargs.latency, loss=inargs.loss, vlans=inargs.vlans,
+                     macs=inargs.macs, sonic=inargs.sonic, timeout=inargs.timeout, retries=inargs.retries)
+    elif inargs.bench == 'merge':
+        benchMerge(inargs.sizes, inargs.sources, inargs.referenceLimit, inargs.repeat)
+    else:
+        getParser().print_help()
+
+
+if __name__ == '__main__':
+    execute(sys.argv[1:])
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+    SNMP Collector - collects SNMP table columns using GETBULK requests.
+    Multiple columns are requested in a single PDU and each PDU returns
+    maxRepetitions rows for every requested column.
+"""
+from easysnmp.exceptions import EasySNMPUnknownObjectIDError
+from easysnmp.exceptions import EasySNMPTimeoutError
+from SNMPMon.resilience import Deadline, DeadlineExceeded
+from SNMPMon.iftable import parseValue
+
+# All interface keys queried from ifTable/ifXTable
+IF_KEYS = ['ifDescr', 'ifType', 'ifMtu', 'ifAdminStatus', 'ifOperStatus',
+           'ifHighSpeed', 'ifAlias', 'ifHCInOctets', 'ifHCOutOctets', 'ifInDiscards',
+           'ifOutDiscards', 'ifInErrors', 'ifOutErrors', 'ifHCInUcastPkts',
+           'ifHCOutUcastPkts', 'ifHCInMulticastPkts', 'ifHCOutMulticastPkts',
+           'ifHCInBroadcastPkts', 'ifHCOutBroadcastPkts']
+
+# Interface metadata keys, which change rarely (cached and refreshed on ifLastChange/TTL)
+STATIC_KEYS = ['ifDescr', 'ifType', 'ifMtu', 'ifHighSpeed', 'ifAlias']
+# Keys which do not depend on interface state. Discovery filters interfaces only by these keys
+DISCOVERY_KEYS = ['ifDescr', 'ifType', 'ifAlias']
+# Status and counter keys, polled on every cycle
+DYNAMIC_KEYS = [key for key in IF_KEYS if key not in STATIC_KEYS]
+
+# SNMP types which mean that walk reached end of the column/mib
+END_TYPES = ['ENDOFMIBVIEW', 'NOSUCHOBJECT', 'NOSUCHINSTANCE']
+
+
+class SNMPCollector():
+    """SNMP Collector Class. Walks multiple columns per PDU with GETBULK"""
+    def __init__(self, session, logger, **kwargs):
+        self.session = session
+        self.logger = logger
+        self.maxRepetitions = int(kwargs.get('maxRepetitions', 25))
+        self.columnsPerPdu = int(kwargs.get('columnsPerPdu', 10))
+        self.useBulk = bool(kwargs.get('useBulk', True))
+        self.varbindsPerPdu = int(kwargs.get('varbindsPerPdu', 40))
+        # Deadline budget for the cycle. Once exhausted, remaining requests are not sent
+        self.deadline = kwargs.get('deadline', None) or Deadline(0)
+        self.stats = {}
+        self.resetStats()
+
+    def resetStats(self):
+        """Reset PDU/Round-trip statistics (done at start of each cycle)"""
+        self.stats = {'pdus': 0, 'roundtrips': 0, 'varbinds': 0, 'deadline_exceeded': 0}
+
+    def _deadlineExpired(self, err):
+        """Check deadline budget. Records error only once per cycle"""
+        if not self.deadline.expired():
+            return False
+        if not self.stats['deadline_exceeded']:
+            self.stats['deadline_exceeded'] = 1
+            self.logger.warning(f'Deadline budget of {self.deadline.budget}s exhausted. Remaining requests aborted')
+            err.append(DeadlineExceeded(f'Deadline budget of {self.deadline.budget}s exhausted'))
+        return True
+
+    def _getRequest(self, oids):
+        """Issue one GET with multiple varbinds"""
+        resp = self.session.get(oids)
+        self.stats['pdus'] += 1
+        self.stats['roundtrips'] += 1
+        self.stats['varbinds'] += len(resp)
+        return resp
+
+    def getScalars(self, oids, err=None):
+        """Get values of full OIDs (e.g. ifNumber.0) with batched GET requests
+        (varbindsPerPdu per PDU). Missing values are None"""
+        out = {oid: None for oid in oids}
+        err = [] if err is None else err
+        for idx in range(0, len(oids), self.varbindsPerPdu):
+            if self._deadlineExpired(err):
+                break
+            chunk = oids[idx:idx + self.varbindsPerPdu]
+            try:
+                for oid, item in zip(chunk, self._getRequest(chunk)):
+                    if item.snmp_type not in END_TYPES:
+                        out[oid] = item.value
+            except (EasySNMPUnknownObjectIDError, EasySNMPTimeoutError) as ex:
+                self.logger.warning(f'Got exception for scalars {chunk}: {ex}')
+                err.append(ex)
+        return out
+
+    def getColumns(self, columns, indexes, err=None):
+        """Get columns only for the given indexes using batched GET requests.
+        Returns output in same format as walkColumns: out[ifIndex][key] = value"""
+        out = {}
+        err = [] if err is None else err
+        oids = [f'{col}.{indx}' for indx in indexes for col in columns]
+        for idx in range(0, len(oids), self.varbindsPerPdu):
+            if self._deadlineExpired(err):
+                break
+            chunk = oids[idx:idx + self.varbindsPerPdu]
+            try:
+                resp = self._getRequest(chunk)
+            except EasySNMPUnknownObjectIDError as ex:
+                self.logger.warning(f'Got exception for keys {chunk}: {ex}')
+                err.append(ex)
+                continue
+            except EasySNMPTimeoutError as ex:
+                self.logger.warning(f'Got SNMP Timeout Exception: {ex}')
+                err.append(ex)
+                continue
+            for item in resp:
+                if item.snmp_type in END_TYPES:
+                    continue
+                out.setdefault(item.oid_index, {})
+                out[item.oid_index][item.oid] = parseValue(item)
+        return out
+
+    def _chunks(self, columns, solo):
+        """Split columns into PDU chunks. Columns in solo are always sent alone"""
+        grouped = [col for col in columns if col not in solo]
+        for idx in range(0, len(grouped), self.columnsPerPdu):
+            yield grouped[idx:idx + self.columnsPerPdu]
+        for col in columns:
+            if col in solo:
+                yield [col]
+
+    def _bulkRequest(self, chunkCols, active, out):
+        """Issue one GETBULK for chunkCols and update out. Returns finished columns"""
+        oids = [f'{col}.{active[col]}' if active[col] else col for col in chunkCols]
+        resp = self.session.get_bulk(oids, non_repeaters=0, max_repetitions=self.maxRepetitions)
+        self.stats['pdus'] += 1
+        self.stats['roundtrips'] += 1
+        self.stats['varbinds'] += len(resp)
+        finished, advanced = set(), set()
+        # Response is interleaved: row1(col1, col2, ...), row2(col1, col2, ...)
+        for pos, item in enumerate(resp):
+            col = chunkCols[pos % len(chunkCols)]
+            if col in finished:
+                continue
+            if item.oid != col or item.snmp_type in END_TYPES:
+                finished.add(col)
+                continue
+            out.setdefault(item.oid_index, {})
+            out[item.oid_index][col] = parseValue(item)
+            active[col] = item.oid_index
+            advanced.add(col)
+        # Columns which did not move forward are done (protects from endless loop)
+        for col in chunkCols:
+            if col not in advanced:
+                finished.add(col)
+        return finished
+
+    def walkSubtree(self, oid):
+        """Walk full subtree under oid (GETBULK if supported). Returns list of SNMP variables.
+        Raises DeadlineExceeded if deadline budget is exhausted"""
+        if self.deadline.expired():
+            raise DeadlineExceeded(f'Deadline budget of {self.deadline.budget}s exhausted')
+        if self.useBulk:
+            allvals = self.session.bulkwalk(oid, non_repeaters=0, max_repetitions=self.maxRepetitions)
+            pdus = len(allvals) // self.maxRepetitions + 1
+        else:
+            allvals = self.session.walk(oid)
+            pdus = len(allvals) + 1
+        self.stats['pdus'] += pdus
+        self.stats['roundtrips'] += pdus
+        self.stats['varbinds'] += len(allvals)
+        return allvals
+
+    def _walkColumnsLegacy(self, columns, out, err):
+        """Walk each column separately with GETNEXT (SNMPv1 has no GETBULK)"""
+        for key in columns:
+            if self._deadlineExpired(err):
+                break
+            try:
+                allvals = self.session.walk(key)
+                # Walk sends one GETNEXT per value, and one more to find end of column
+                self.stats['pdus'] += len(allvals) + 1
+                self.stats['roundtrips'] += len(allvals) + 1
+                self.stats['varbinds'] += len(allvals)
+                for item in allvals:
+                    indx = item.oid_index
+                    out.setdefault(indx, {})
+                    out[indx][key] = parseValue(item)
+            except EasySNMPUnknownObjectIDError as ex:
+                self.logger.warning(f'Got exception for key {key}: {ex}')
+                err.append(ex)
+            except EasySNMPTimeoutError as ex:
+                self.logger.warning(f'Got SNMP Timeout Exception: {ex}')
+                err.append(ex)
+        return out
+
+    def walkColumns(self, columns, err=None):
+        """Walk all columns and return output as out[ifIndex][key] = value"""
+        out = {}
+        err = [] if err is None else err
+        if not self.useBulk:
+            return self._walkColumnsLegacy(columns, out, err)
+        # Each active column keeps last seen index, so next request continues from it
+        active = {col: '' for col in columns}
+        solo = set()
+        while active and not self._deadlineExpired(err):
+            # Each pass sends one PDU per chunk of still active columns
+            for chunkCols in list(self._chunks(list(active.keys()), solo)):
+                if self._deadlineExpired(err):
+                    break
+                try:
+                    finished = self._bulkRequest(chunkCols, active, out)
+                except EasySNMPUnknownObjectIDError as ex:
+                    if len(chunkCols) > 1:
+                        # Find out which one is unknown by sending each column in separate PDU
+                        solo.update(chunkCols)
+                        continue
+                    self.logger.warning(f'Got exception for key {chunkCols[0]}: {ex}')
+                    err.append(ex)
+                    finished = chunkCols
+                except EasySNMPTimeoutError as ex:
+                    self.logger.warning(f'Got SNMP Timeout Exception for keys {chunkCols}: {ex}')
+                    err.append(ex)
+                    finished = chunkCols
+                for col in finished:
+                    active.pop(col, None)
+        return out
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+    Counter rates for SNMP Monitoring. Keeps previous counter samples of each
+    interface in an array-backed ring buffer and computes per-second rates,
+    handling 32/64-bit counter wraps and agent restarts (sysUpTime reset).
+"""
+from array import array
+
+# Counter keys for which rates are computed
+COUNTER_KEYS = ['ifHCInOctets', 'ifHCOutOctets', 'ifInDiscards', 'ifOutDiscards',
+                'ifInErrors', 'ifOutErrors', 'ifHCInUcastPkts', 'ifHCOutUcastPkts',
+                'ifHCInMulticastPkts', 'ifHCOutMulticastPkts', 'ifHCInBroadcastPkts',
+                'ifHCOutBroadcastPkts']
+# Counter32 keys (all other keys are Counter64)
+COUNTER32_KEYS = ['ifInDiscards', 'ifOutDiscards', 'ifInErrors', 'ifOutErrors']
+
+
+class CounterRates():
+    """Counter history (ring buffer per interface) and rate computation"""
+    def __init__(self, keys=None):
+        self.keys = list(keys or COUNTER_KEYS)
+        self.wraps = [2**32 if key in COUNTER32_KEYS else 2**64 for key in self.keys]
+        # Previous and current sample - rate is computed between two latest samples
+        self.depth = 2
+        self.uptime = None
+        self.rows = {}
+        self.freeRows = []
+        # values/valid: row * depth * len(keys); times: row * depth; heads/counts: per row
+        self.values = array('Q')
+        self.valid = array('B')
+        self.times = array('d')
+        self.heads = array('l')
+        self.counts = array('l')
+
+    def reset(self):
+        """Forget all samples (e.g. agent restarted)"""
+        self.__init__(self.keys)
+
+    def checkRestart(self, uptime):
+        """Reset history if sysUpTime went back (agent restarted). Returns True if reset"""
+        restarted = False
+        if uptime is not None and self.uptime is not None and int(uptime) < int(self.uptime):
+            self.reset()
+            restarted = True
+        self.uptime = uptime
+        return restarted
+
+    def prune(self, indexes):
+        """Free rows of interfaces which are not in indexes"""
+        for indx in set(self.rows) - set(indexes):
+            rown = self.rows.pop(indx)
+            self.counts[rown] = 0
+            self.freeRows.append(rown)
+
+    def _getRow(self, indx):
+        """Get ring buffer row for interface (allocate if new)"""
+        if indx in self.rows:
+            return self.rows[indx]
+        if self.freeRows:
+            rown = self.freeRows.pop()
+        else:
+            rown = len(self.heads)
+            self.values.extend([0] * (self.depth * len(self.keys)))
+            self.valid.extend([0] * (self.depth * len(self.keys)))
+            self.times.extend([0.0] * self.depth)
+            self.heads.append(-1)
+            self.counts.append(0)
+        self.heads[rown] = -1
+        self.counts[rown] = 0
+        self.rows[indx] = rown
+        return rown
+
+    def update(self, indx, sampleTime, vals):
+        """Store new sample for interface and return {key: rate per second}"""
+        rown = self._getRow(indx)
+        nkeys = len(self.keys)
+        prevSlot = self.heads[rown]
+        slot = (prevSlot + 1) % self.depth
+        base = (rown * self.depth + slot) * nkeys
+        self.times[rown * self.depth + slot] = sampleTime
+        for col, key in enumerate(self.keys):
+            try:
+                self.values[base + col] = int(vals[key])
+                self.valid[base + col] = 1
+            except (KeyError, ValueError, TypeError, OverflowError):
+                self.valid[base + col] = 0
+        self.heads[rown] = slot
+        self.counts[rown] = min(self.counts[rown] + 1, self.depth)
+        rates = {}
+        if self.counts[rown] < 2:
+            return rates
+        timeDiff = sampleTime - self.times[rown * self.depth + prevSlot]
+        if timeDiff <= 0:
+            return rates
+        prevBase = (rown * self.depth + prevSlot) * nkeys
+        for col, key in enumerate(self.keys):
+            if not (self.valid[base + col] and self.valid[prevBase + col]):
+                continue
+            newVal, oldVal = self.values[base + col], self.values[prevBase + col]
+            delta = newVal - oldVal
+            if delta < 0:
+                # Counter wrapped. Counter32 which already went above 2**32 must be 64-bit.
+                wrap = self.wraps[col] if oldVal < self.wraps[col] else 2**64
+                delta += wrap
+                if delta >= wrap // 2:
+                    # Too big for a wrap between two samples - counter was reset (e.g. cleared)
+                    continue
+            rates[key] = delta / timeDiff
+        return rates
@@ -8,7 +8,9 @@ Changes applied to this code:
 """
 import os
 import sys
+import math
 import time
+import zlib
 import argparse
 import traceback
 import atexit
@@ -40,6 +42,59 @@ def validateArgs(inargs):
     if inargs.action not in ['start', 'stop', 'status', 'restart']:
         raise Exception(f"Action '{inargs.action}' not supported. Supported actions: start, stop, status, restart")
 
+def getPidFile(component, devicename=''):
+    """Get pid file of component (and device)"""
+    if devicename:
+        return f'/tmp/nsi-snmpmon-{component}-{devicename}.pid'
+    return f'/tmp/nsi-snmpmon-{component}.pid'
+
+class TickSchedule():
+    """Wall-clock aligned schedule. Ticks fire at k * interval + offset, where offset is
+    a deterministic jitter (same name - same offset), so devices do not poll at the same moment.
+    If run overruns next tick(s), missed ticks are skipped and counted."""
+    def __init__(self, name, interval=30, jitter=1.0):
+        self.interval = max(1.0, float(interval))
+        jitter = min(max(float(jitter), 0.0), 1.0)
+        self.offset = (zlib.crc32(name.encode('utf-8')) % 10000) / 10000.0 * jitter * self.interval
+        self.nextTick = None
+        self.stats = {'schedule_interval': self.interval, 'schedule_offset': self.offset,
+                      'schedule_ticks': 0, 'schedule_overruns': 0, 'schedule_missed_ticks': 0,
+                      'schedule_last_runtime': 0.0}
+
+    def alignedTick(self, now):
+        """Get first tick at or after now"""
+        # Small epsilon protects from float rounding (tick + interval must stay the next tick)
+        return math.ceil((now - self.offset) / self.interval - 1e-6) * self.interval + self.offset
+
+    def start(self, now, immediate=False):
+        """Set first tick (now if immediate, otherwise first aligned tick)"""
+        self.nextTick = now if immediate else self.alignedTick(now)
+
+    def due(self, now):
+        """Check if tick is due"""
+        return self.nextTick is not None and now >= self.nextTick
+
+    def waitTime(self, now):
+        """Seconds until next tick"""
+        return max(0.0, self.nextTick - now)
+
+    def followingTick(self):
+        """Tick after the current one (end of current run)"""
+        return self.alignedTick(self.nextTick + self.interval)
+
+    def completed(self, startTime, endTime):
+        """Mark run as completed and schedule next tick. Skips missed ticks if run overrun"""
+        self.stats['schedule_ticks'] += 1
+        self.stats['schedule_last_runtime'] = endTime - startTime
+        nextTick = self.followingTick()
+        if endTime > nextTick:
+            missed = int((endTime - nextTick) // self.interval) + 1
+            self.stats['schedule_overruns'] += 1
+            self.stats['schedule_missed_ticks'] += missed
+            nextTick += missed * self.interval
+        self.nextTick = nextTick
+
+
 class Daemon():
     """A generic daemon class.
     Usage: subclass the Daemon class and override the run() method.
@@ -49,9 +104,7 @@ class Daemon():
         self.component = component
         self.inargs = inargs
         self.runCount = 0
-        self.pidfile = f'/tmp/nsi-snmpmon-{component}.pid'
-        if self.inargs.devicename:
-            self.pidfile = f'/tmp/nsi-snmpmon-{component}-{self.inargs.devicename}.pid'
+        self.pidfile = getPidFile(component, self.inargs.devicename)
         self.config = getConfig('/etc/snmp-mon.yaml')
         self.logger = getStreamLogger(**self.config['logParams'])
 
@@ -221,32 +274,50 @@ class Daemon():
                 self.logger.critical("Exception!!! Error details:  %s", exc)
                 time.sleep(30)
 
+    def _getSchedule(self, sitename, rthread):
+        """Get tick schedule for thread. Interval can be set per thread (runInterval attribute)"""
+        interval = getattr(rthread, 'runInterval', None) or self.config.get('runInterval', 30)
+        name = f'{self.component}-{self.inargs.devicename}-{sitename}'
+        schedule = TickSchedule(name, interval, self.config.get('runJitter', 1.0))
+        schedule.start(time.time(), immediate=self.inargs.onetimerun)
+        return schedule
+
     def run(self):
         """Run main execution"""
         runThreads = self.refreshThreads()
+        schedules = {sitename: self._getSchedule(sitename, rthread) for sitename, rthread in runThreads.items()}
         while self.runLoop():
-            self.runCount += 1
             hadFailure = False
             try:
+                if schedules and not any(schedule.due(time.time()) for schedule in schedules.values()):
+                    time.sleep(min(schedule.waitTime(time.time()) for schedule in schedules.values()))
+                self.runCount += 1
                 for sitename, rthread in list(runThreads.items()):
+                    if not schedules[sitename].due(time.time()):
+                        continue
                     self.logger.info('Start worker for %s site', sitename)
+                    startTime = time.time()
+                    overruns = schedules[sitename].stats['schedule_overruns']
+                    if hasattr(rthread, 'runDeadline'):
+                        # Worker which keeps working inside its run (e.g. merge on change) stops at next tick
+                        rthread.runDeadline = schedules[sitename].followingTick()
                     try:
                         rthread.startwork()
                     except:
                         hadFailure = True
                         exc = traceback.format_exc()
                         self.logger.critical("Exception!!! Error details:  %s", exc)
-                if self.runLoop():
-                    time.sleep(30)
+                    schedules[sitename].completed(startTime, time.time())
+                    if schedules[sitename].stats['schedule_overruns'] > overruns:
+                        self.logger.warning('Worker %s overrun its interval, missed ticks skipped. Stats: %s',
+                                            sitename, schedules[sitename].stats)
+                    if hasattr(rthread, 'scheduleStats'):
+                        rthread.scheduleStats = schedules[sitename].stats
             except KeyboardInterrupt as ex:
                 self.logger.critical("Received KeyboardInterrupt: %s ", ex)
                 sys.exit(3)
-            if hadFailure:
-                self.logger.info('Had Runtime Failure. Sleep for 30 seconds')
-                if self.runLoop():
-                    time.sleep(30)
-                else:
-                    sys.exit(4)
+            if hadFailure and not self.runLoop():
+                sys.exit(4)
 
     @staticmethod
     def getThreads():
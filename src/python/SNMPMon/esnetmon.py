@@ -11,6 +11,7 @@ from SNMPMon.utilities import dumpFileContentAsJson
 from SNMPMon.utilities import getTimeRotLogger
 from SNMPMon.utilities import getUTCnow
 from SNMPMon.utilities import parseEsTime
+from SNMPMon.manifest import registerOutput
 
 class ESnetES():
     """ESnet ElasticSearch Class"""
@@ -194,7 +195,8 @@ class ESnetES():
             # Set the runtime
             snmpout.setdefault(device, {}).setdefault('snmp_scan_runtime', getUTCnow())
         pprint.pprint(snmpout)
-        return dumpFileContentAsJson(self.config, self.monports['oscarsid'], snmpout)
+        fName = dumpFileContentAsJson(self.config, self.monports['oscarsid'], snmpout)
+        return registerOutput(self.config, fName, 'ESnetMonitoring')
 
     def startwork(self):
         """Main run"""
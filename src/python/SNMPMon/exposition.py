@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+    Streaming Prometheus text exposition writer for SNMP Monitoring. Samples are
+    written straight from device output (snapshot) to exposition lines, without
+    prometheus_client metric and label-child objects. Output is the same as
+    prometheus_client generate_latest (sorted labels, Go float formatting,
+    Info rendered as <name>_info gauge, sample with same labels replaces previous one).
+    Same samples are used for OpenMetrics format (only family headers differ) and
+    exposition can be compressed (gzip, or zstd if zstandard is installed).
+"""
+import zlib
+from prometheus_client.utils import floatToGoString
+from SNMPMon.utilities import isValFloat
+from SNMPMon.utilities import getUTCnow
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Metric families: sample name -> (help, labelnames, type).
+# Info families are exposed as <name>_info gauge (OpenMetrics - <name> info family).
+DEVICE_FAMILIES = {'service_runtime_timestamp': ('Service Runtime Timestamp', ['servicename', 'hostname'], 'gauge'),
+                   'interface_statistics': ('Interface Statistics', ['ifDescr', 'ifType', 'ifAlias', 'hostname', 'Key'],
+                                            'gauge'),
+                   'mac_table_info': ('Mac Address Table', ['vlan', 'hostname', 'incr'], 'info'),
+                   'snmp_scan_statistics': ('SNMP Scan Statistics', ['hostname', 'Key'], 'gauge')}
+GLOBAL_FAMILIES = {'supervisor_statistics': ('MultiWorker Supervisor Statistics', ['worker', 'Key'], 'gauge'),
+                   'exposition_cache_statistics': ('Metrics Exposition Cache Statistics', ['Key'], 'gauge')}
+
+# Exposition formats: name -> Content-Type
+FORMATS = {'text': 'text/plain',
+           'openmetrics': 'application/openmetrics-text; version=1.0.0; charset=utf-8'}
+# Supported content encodings (in order of preference)
+ENCODINGS = ['zstd', 'gzip'] if zstandard else ['gzip']
+
+
+def familyHeader(name, documentation, mtype='gauge', fmt='text'):
+    """HELP and TYPE lines of metric family"""
+    if fmt == 'openmetrics':
+        if mtype == 'info':
+            name = name[:-len('_info')]
+        documentation = documentation.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+        return f'# HELP {name} {documentation}\n# TYPE {name} {mtype}\n'.encode('utf-8')
+    documentation = documentation.replace('\\', r'\\').replace('\n', r'\n')
+    return f'# HELP {name} {documentation}\n# TYPE {name} gauge\n'.encode('utf-8')
+
+
+def escapeLabel(value):
+    """Escape label value"""
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class FamilyWriter():
+    """Sample lines of one metric family. Sample with the same identity (labels) replaces
+    previous value in place (same as prometheus_client label child)"""
+    __slots__ = ('name', 'lines', 'index')
+
+    def __init__(self, name):
+        self.name = name
+        self.lines = []
+        self.index = {}
+
+    def add(self, labels, value, identity=None):
+        """Add sample. labels - dict of label values, identity - labels which identify sample
+        (Default all labels)"""
+        labelstr = ','.join(f'{key}="{escapeLabel(val)}"' for key, val in sorted(labels.items()))
+        line = f'{self.name}{{{labelstr}}} {floatToGoString(value)}\n'
+        key = labelstr if identity is None else identity
+        pos = self.index.get(key)
+        if pos is None:
+            self.index[key] = len(self.lines)
+            self.lines.append(line)
+        else:
+            self.lines[pos] = line
+
+    def getvalue(self):
+        """Encoded sample lines"""
+        return ''.join(self.lines).encode('utf-8')
+
+
+def writeMacInfo(macVals, devname, writer):
+    """Write Mac Address Table samples"""
+    for _cntr, vlandict in macVals.items():
+        # diff (added/removed since previous scan) and scan_runtime are not exposed
+        if _cntr == 'diff' or not isinstance(vlandict, dict):
+            continue
+        for vlan, macs in vlandict.items():
+            incr = 0
+            added = set()
+            for mac in macs:
+                mac = mac.lower()
+                # Secure from duplicate entries;
+                if mac in added:
+                    continue
+                added.add(mac)
+                writer.add({'vlan': vlan, 'hostname': devname, 'incr': incr, 'macaddress': mac}, 1,
+                           identity=(str(vlan), str(incr)))
+                incr += 1
+
+
+def writeGeneralInfo(vals, devname, writer):
+    """Write Interface Statistics samples"""
+    for _cntr, val in vals.items():
+        keys = {'ifDescr': val.get('ifDescr', ''), 'ifType': val.get('ifType', ''),
+                'ifAlias': val.get('ifAlias', ''), 'hostname': devname}
+        for key1, val1 in val.items():
+            if isValFloat(val1):
+                keys['Key'] = key1
+                writer.add(keys, val1)
+
+
+def writeStats(vals, labels, writer):
+    """Write numeric statistics (labels + Key)"""
+    for key, val in vals.items():
+        if isValFloat(val):
+            writer.add(dict(labels, Key=key), val)
+
+
+def writeDevice(devname, devout, logger):
+    """Write samples of single device. Returns ({family: samples}, UTC timestamp until output is valid).
+    Device runtime older than 5 mins is exposed only as runtime timestamp."""
+    writers = {name: FamilyWriter(name) for name in DEVICE_FAMILIES}
+    runtime = writers['service_runtime_timestamp']
+    validUntil = float('inf')
+    if 'snmp_scan_runtime' not in devout:
+        runtime.add({'servicename': 'SNMPMonitoring', 'hostname': devname}, 0)
+        logger.info('SNMP Scan Runtime does not have runtime details. Something wrong with SNMPRuntime Thread')
+    elif int(devout['snmp_scan_runtime']) < int(getUTCnow() - 300):
+        runtime.add({'servicename': 'SNMPMonitoring', 'hostname': devname}, devout['snmp_scan_runtime'])
+        logger.info('SNMP Scan Runtime is older than 5 mins. Something wrong with SNMPRuntime Thread')
+    else:
+        validUntil = int(devout['snmp_scan_runtime']) + 301
+        for hostname, vals in devout.items():
+            if hostname == 'snmp_scan_runtime':
+                runtime.add({'servicename': 'SNMPMonitoring', 'hostname': devname}, vals)
+            elif hostname == 'snmp_sample_time':
+                runtime.add({'servicename': 'SNMPSample', 'hostname': devname}, vals)
+            elif hostname == "macs":
+                writeMacInfo(vals, devname, writers['mac_table_info'])
+            elif hostname == "snmp_scan_stats":
+                writeStats(vals, {'hostname': devname}, writers['snmp_scan_statistics'])
+            else:
+                writeGeneralInfo(vals, devname, writers['interface_statistics'])
+    return {name: writer.getvalue() for name, writer in writers.items()}, validUntil
+
+
+def iterExposition(families, fragments, fmt='text'):
+    """Exposition chunks: per family - header and samples of each fragment"""
+    for name, (documentation, _labelnames, mtype) in families.items():
+        yield familyHeader(name, documentation, mtype, fmt)
+        for fragment in fragments:
+            samples = fragment.get(name)
+            if samples:
+                yield samples
+    if fmt == 'openmetrics':
+        yield b'# EOF\n'
+
+
+def compressChunks(chunks, encoding):
+    """Compress exposition chunks (gzip or zstd). Returns compressed bytes"""
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        raise ValueError(f'Content encoding {encoding} is not supported')
+    out = [compressor.compress(chunk) for chunk in chunks]
+    out.append(compressor.flush())
+    return b''.join(out)
+
+
+def _parseQuality(header):
+    """Parse Accept/Accept-Encoding header. Returns {value: quality}"""
+    out = {}
+    for item in header.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        out[parts[0].lower()] = max(quality, out.get(parts[0].lower(), 0.0))
+    return out
+
+
+def negotiateFormat(accept):
+    """Exposition format for Accept header (OpenMetrics if preferred over text/plain)"""
+    qualities = _parseQuality(accept or '')
+    openmetrics = qualities.get('application/openmetrics-text', 0.0)
+    text = qualities.get('text/plain', qualities.get('text/*', qualities.get('*/*', 0.0)))
+    return 'openmetrics' if openmetrics > 0 and openmetrics >= text else 'text'
+
+
+def negotiateEncoding(acceptEncoding):
+    """Content encoding for Accept-Encoding header (None - identity)"""
+    qualities = _parseQuality(acceptEncoding or '')
+    best, bestQuality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > bestQuality:
+            best, bestQuality = encoding, quality
+    return best
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+    Filter rules for SNMP Monitoring. Rules are compiled once at config load
+    (hash sets, prefix tries and replacement maps) and evaluated over the whole
+    interface table at once.
+"""
+from SNMPMon.iftable import InterfaceTable
+
+
+class PrefixTrie():
+    """Prefix Trie used for Startswith filters"""
+    END = '\x00'
+
+    def __init__(self, prefixes=None):
+        self.root = {}
+        for prefix in prefixes or []:
+            self.add(prefix)
+
+    def add(self, prefix):
+        """Add prefix to trie"""
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self.END] = prefix
+
+    def longestPrefix(self, value):
+        """Return longest prefix in trie which value starts with, or None"""
+        node, found = self.root, self.root.get(self.END)
+        for char in value:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(self.END, found)
+        return found
+
+
+class FilterRule():
+    """Single compiled filter rule"""
+    def __init__(self, filterItem):
+        self.key = filterItem.get('Key', '')
+        filterVal = filterItem.get('Val', '')
+        self.valid = bool(self.key and filterVal)
+        self.startswith = bool(filterItem.get('Startswith', False))
+        # Val can be a scalar (e.g. ifType: 6) or a list
+        values = list(filterVal) if isinstance(filterVal, (list, tuple, set)) else [filterVal]
+        values = [str(val) for val in values]
+        replacement = filterItem.get('Replacement', '')
+        if self.startswith:
+            self.trie = PrefixTrie(values)
+            # prefix -> replacement (value.replace(prefix, replacement))
+            self.replaceMap = {val: replacement for val in values} if replacement else {}
+        else:
+            self.values = set(values)
+            # value -> new value
+            self.replaceMap = {val: replacement for val in values} if replacement else {}
+
+    def _match(self, value):
+        """Check single value. Returns (matched, newvalue)"""
+        if self.startswith:
+            prefix = self.trie.longestPrefix(value)
+            if prefix is None:
+                return False, value
+            if prefix in self.replaceMap:
+                return True, value.replace(prefix, self.replaceMap[prefix])
+            return True, value
+        if value not in self.values:
+            return False, value
+        return True, self.replaceMap.get(value, value)
+
+    def matchTable(self, table, replace=True):
+        """Match rule against whole table. Returns set of matched indexes.
+        Replacement (if defined and replace is True) is applied on matched rows."""
+        if not self.valid:
+            return set(table.keys())
+        matched = set()
+        key = self.key
+        for indx, row in table.items():
+            value = row.get(key)
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                value = str(value)
+            flag, newvalue = self._match(value)
+            if flag:
+                matched.add(indx)
+                if replace and newvalue is not value:
+                    row[key] = newvalue
+        return matched
+
+
+class FilterRules():
+    """
+    Compiled filter rules for a single host.
+    # Filter rules inside configuration file
+    filterRules:
+      dellos9_s0:
+        operator: 'and'
+        filters:
+          - Key: 'ifAdminStatus'
+            Val: 'up'
+            Startswith: False (default is False - if True - will use py startswith call)
+            Replacement: '<new_value>' (optional - if defined will replace value with new_value)
+          - Key: ifDescr
+            Val: ["hundredGigE 1/21", "Vlan 100"]
+    Val can be a string or a list. If list, row value must be one of list items
+    (or start with one of list items, if Startswith is True).
+    """
+    def __init__(self, hostRules, logger):
+        self.logger = logger
+        hostRules = hostRules or {}
+        self.operator = hostRules.get('operator', 'and')
+        if hostRules.get('filters') and self.operator not in ['and', 'or']:
+            self.logger.warning(f'Filter operator {self.operator} not supported. All interfaces will be filtered out')
+        self.rules = []
+        for filterItem in hostRules.get('filters', None) or []:
+            rule = FilterRule(filterItem)
+            if not rule.valid:
+                # That is wrong filter. We raise error and continue to include it
+                self.logger.warning('Filter rule missing either Key or Val defined. Will not check based on this Key/Val')
+            self.rules.append(rule)
+
+    def candidateIndexes(self, table, keys):
+        """Indexes which can pass filters, evaluated only with rules on keys (e.g. static keys).
+        Rules on other keys are treated as matching all rows. Table values are not replaced."""
+        if not self.rules:
+            return set(table.keys())
+        if self.operator == 'and':
+            matches = [rule.matchTable(table, replace=False) for rule in self.rules if rule.key in keys]
+            return set.intersection(*matches) if matches else set(table.keys())
+        if self.operator == 'or':
+            if any(rule.key not in keys for rule in self.rules):
+                return set(table.keys())
+            return set.union(*[rule.matchTable(table, replace=False) for rule in self.rules])
+        return set()
+
+    def filterTable(self, table):
+        """Filter whole table (out[ifIndex][key] or InterfaceTable) and return new table with included rows"""
+        if not self.rules:
+            included = set(table.keys())
+        else:
+            matches = [rule.matchTable(table) for rule in self.rules]
+            if self.operator == 'and':
+                included = set.intersection(*matches)
+            elif self.operator == 'or':
+                included = set.union(*matches)
+            else:
+                included = set()
+        if isinstance(table, InterfaceTable):
+            return table.select(included)
+        return {indx: row for indx, row in table.items() if indx in included}
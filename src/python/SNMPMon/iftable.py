@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+    Interface table for SNMP Monitoring. Columnar storage of interface values:
+    labels are interned strings, integer values and counters are kept in typed
+    arrays and rates in float arrays. Converts to/from the JSON layout used in
+    output files: out[ifIndex][key] = value.
+"""
+import sys
+from array import array
+from SNMPMon.counterrates import COUNTER_KEYS
+
+# Column schema: key -> type ('label' - interned str, array typecode otherwise)
+LABEL_KEYS = ['ifDescr', 'ifAlias']
+INTEGER_KEYS = ['ifType', 'ifMtu', 'ifAdminStatus', 'ifOperStatus', 'ifHighSpeed']
+RATE_KEYS = [f'{key}Rate' for key in COUNTER_KEYS]
+SCHEMA = dict([(key, 'label') for key in LABEL_KEYS] + [(key, 'q') for key in INTEGER_KEYS] +
+              [(key, 'Q') for key in COUNTER_KEYS] + [(key, 'd') for key in RATE_KEYS])
+# Output key order (same as collected IF_KEYS, rates at the end)
+ORDER = ['ifDescr', 'ifType', 'ifMtu', 'ifAdminStatus', 'ifOperStatus', 'ifHighSpeed', 'ifAlias'] + \
+    COUNTER_KEYS + RATE_KEYS
+
+# SNMP types which values are integers
+NUMERIC_TYPES = ['INTEGER', 'INTEGER32', 'UNSIGNED32', 'COUNTER', 'COUNTER64', 'GAUGE', 'TICKS']
+
+
+def parseValue(item):
+    """Parse SNMP variable value at collection time: numbers to int, strings interned"""
+    if item.snmp_type in NUMERIC_TYPES:
+        try:
+            return int(item.value)
+        except ValueError:
+            pass
+    return sys.intern(item.value.replace('\x00', ''))
+
+
+class InterfaceRow():
+    """Row view of InterfaceTable. Supports dict like access: row[key], row.get(key), key in row"""
+    __slots__ = ('table', 'pos')
+
+    def __init__(self, table, pos):
+        self.table = table
+        self.pos = pos
+
+    def __getitem__(self, key):
+        return self.table.getValue(self.pos, key)
+
+    def __setitem__(self, key, value):
+        self.table.setValue(self.pos, key, value)
+
+    def __contains__(self, key):
+        try:
+            self.table.getValue(self.pos, key)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        """Get value or default if not present"""
+        try:
+            return self.table.getValue(self.pos, key)
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        """Set value if not present and return value"""
+        try:
+            return self.table.getValue(self.pos, key)
+        except KeyError:
+            self.table.setValue(self.pos, key, default)
+            return default
+
+    def items(self):
+        """Row items (same key order as in JSON output)"""
+        return self.table.rowDict(self.pos).items()
+
+    def keys(self):
+        """Row keys"""
+        return self.table.rowDict(self.pos).keys()
+
+
+class InterfaceTable():
+    """Columnar interface table. Values which do not fit column type (or keys
+    which are not in schema) are kept in extra (per row dict)"""
+    __slots__ = ('indexes', 'positions', 'columns', 'valid', 'extra')
+
+    def __init__(self):
+        self.indexes = []
+        self.positions = {}
+        self.columns = {key: [] if ctype == 'label' else array(ctype) for key, ctype in SCHEMA.items()}
+        self.valid = {key: array('B') for key in SCHEMA}
+        self.extra = {}
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __contains__(self, indx):
+        return indx in self.positions
+
+    def __iter__(self):
+        return iter(self.indexes)
+
+    def __getitem__(self, indx):
+        return InterfaceRow(self, self.positions[indx])
+
+    def keys(self):
+        """ifIndexes in table"""
+        return list(self.indexes)
+
+    def items(self):
+        """(ifIndex, row) pairs"""
+        return [(indx, InterfaceRow(self, pos)) for pos, indx in enumerate(self.indexes)]
+
+    def addRow(self, indx, vals=None):
+        """Add new row (ifIndex) and set values from vals dict. Returns row"""
+        if indx in self.positions:
+            row = self[indx]
+        else:
+            pos = len(self.indexes)
+            self.indexes.append(indx)
+            self.positions[indx] = pos
+            for key, col in self.columns.items():
+                col.append('' if SCHEMA[key] == 'label' else 0)
+                self.valid[key].append(0)
+            row = InterfaceRow(self, pos)
+        for key, value in (vals or {}).items():
+            row[key] = value
+        return row
+
+    def getValue(self, pos, key):
+        """Get value. Raises KeyError if not present"""
+        if self.extra and pos in self.extra and key in self.extra[pos]:
+            return self.extra[pos][key]
+        if key in self.valid and self.valid[key][pos]:
+            return self.columns[key][pos]
+        raise KeyError(key)
+
+    def setValue(self, pos, key, value):
+        """Set value. Converted to column type, kept in extra if it does not fit"""
+        ctype = SCHEMA.get(key)
+        if ctype is not None:
+            try:
+                if ctype == 'label':
+                    value = sys.intern(value) if isinstance(value, str) else sys.intern(str(value))
+                elif ctype == 'd':
+                    value = float(value)
+                elif not isinstance(value, int):
+                    value = int(value)
+                self.columns[key][pos] = value
+                self.valid[key][pos] = 1
+                if pos in self.extra:
+                    self.extra[pos].pop(key, None)
+                return
+            except (ValueError, TypeError, OverflowError):
+                self.valid[key][pos] = 0
+        self.extra.setdefault(pos, {})[key] = value
+
+    def column(self, key):
+        """Get column as list of (ifIndex, value) for rows which have value"""
+        return [(indx, self.getValue(pos, key)) for pos, indx in enumerate(self.indexes)
+                if (key in self.valid and self.valid[key][pos]) or key in self.extra.get(pos, {})]
+
+    def rowDict(self, pos):
+        """Row as dict (JSON layout)"""
+        out = {}
+        extra = self.extra.get(pos, {}) if self.extra else {}
+        for key in ORDER:
+            if key in extra:
+                out[key] = extra[key]
+            elif self.valid[key][pos]:
+                out[key] = self.columns[key][pos]
+        for key, value in extra.items():
+            if key not in out:
+                out[key] = value
+        return out
+
+    def select(self, indexes):
+        """New table with only given ifIndexes (same order as in this table)"""
+        indexes = set(indexes)
+        new = InterfaceTable()
+        for pos, indx in enumerate(self.indexes):
+            if indx in indexes:
+                newPos = len(new.indexes)
+                new.indexes.append(indx)
+                new.positions[indx] = newPos
+                for key, col in self.columns.items():
+                    new.columns[key].append(col[pos])
+                    new.valid[key].append(self.valid[key][pos])
+                if pos in self.extra:
+                    new.extra[newPos] = dict(self.extra[pos])
+        return new
+
+    def toDict(self):
+        """Convert to JSON layout: out[ifIndex][key] = value"""
+        return {indx: self.rowDict(pos) for pos, indx in enumerate(self.indexes)}
+
+    @classmethod
+    def fromDict(cls, out):
+        """Create table from JSON layout: out[ifIndex][key] = value"""
+        table = cls()
+        for indx, vals in out.items():
+            table.addRow(indx, vals)
+        return table
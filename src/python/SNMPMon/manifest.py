@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+    Output manifest for SNMP Monitoring. Producers (ESnet, TSDS) register output
+    files they write into tmpdir with expiry time. MultiWorker takes active outputs
+    from manifest (instead of scanning tmpdir) and compaction removes expired
+    outputs and leftover temporary files.
+    Manifest is a JSON file (tmpdir/.manifest):
+        {filename: {'producer': name, 'updated': timestamp, 'expires': timestamp}}
+    Writers update it under lock (tmpdir/.manifest.lock) and replace it atomically,
+    so readers do not need a lock.
+"""
+import os
+import json
+import time
+import fcntl
+
+MANIFEST_NAME = '.manifest'
+LOCK_NAME = '.manifest.lock'
+# Outputs are active for 5 minutes after last write (same as previous tmpdir scan)
+DEFAULT_TTL = 300
+
+
+class OutputManifest():
+    """Manifest of producer output files in tmpdir"""
+    def __init__(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.path = os.path.join(tmpdir, MANIFEST_NAME)
+        self.lockPath = os.path.join(tmpdir, LOCK_NAME)
+        self.cache = {'key': None, 'entries': {}}
+        self.stats = {'manifest_reads': 0, 'compact_expired': 0, 'compact_removed': 0, 'compact_tmp_removed': 0}
+
+    def _readFile(self):
+        """Read manifest file. Empty if it does not exist or is broken"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fd:
+                entries = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _update(self, func):
+        """Update manifest under lock. func(entries) modifies entries in place"""
+        if not os.path.isdir(self.tmpdir):
+            os.makedirs(self.tmpdir, exist_ok=True)
+        with open(self.lockPath, 'a', encoding='utf-8') as lockfd:
+            fcntl.flock(lockfd, fcntl.LOCK_EX)
+            entries = self._readFile()
+            func(entries)
+            tmpPath = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmpPath, 'w', encoding='utf-8') as fd:
+                json.dump(entries, fd)
+            os.replace(tmpPath, self.path)
+
+    def register(self, fName, producer, ttl=DEFAULT_TTL):
+        """Register (or refresh) output file. It is active for ttl seconds"""
+        now = time.time()
+        entry = {'producer': producer, 'updated': now, 'expires': now + ttl}
+        self._update(lambda entries: entries.__setitem__(os.path.basename(fName), entry))
+
+    def entries(self):
+        """All manifest entries (manifest is read again only if it changed)"""
+        try:
+            fstat = os.stat(self.path)
+        except OSError:
+            return {}
+        key = (fstat.st_ino, fstat.st_mtime_ns, fstat.st_size)
+        if self.cache['key'] != key:
+            self.cache = {'key': key, 'entries': self._readFile()}
+            self.stats['manifest_reads'] += 1
+        return self.cache['entries']
+
+    def active(self):
+        """Active (not expired) output files (full path)"""
+        now = time.time()
+        return [os.path.join(self.tmpdir, name) for name, entry in self.entries().items()
+                if entry.get('expires', 0) >= now]
+
+    def compact(self, tmpAge=DEFAULT_TTL):
+        """Remove expired outputs (and their entries) and temporary files older than tmpAge.
+        Output which was written again after expiry (by producer which did not register it) is kept."""
+        now = time.time()
+        removed = []
+
+        def expire(entries):
+            for name, entry in list(entries.items()):
+                if entry.get('expires', 0) >= now:
+                    continue
+                del entries[name]
+                self.stats['compact_expired'] += 1
+                fName = os.path.join(self.tmpdir, name)
+                try:
+                    if os.stat(fName).st_mtime <= entry.get('expires', 0):
+                        os.remove(fName)
+                        removed.append(fName)
+                except OSError:
+                    continue
+        if any(entry.get('expires', 0) < now for entry in self.entries().values()):
+            self._update(expire)
+        self.stats['compact_removed'] += len(removed)
+        try:
+            with os.scandir(self.tmpdir) as dirEntries:
+                for dirEntry in dirEntries:
+                    if not dirEntry.name.endswith('.tmp') or not dirEntry.is_file():
+                        continue
+                    try:
+                        if dirEntry.stat().st_mtime < now - tmpAge:
+                            os.remove(dirEntry.path)
+                            removed.append(dirEntry.path)
+                            self.stats['compact_tmp_removed'] += 1
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return removed
+
+
+def registerOutput(config, fName, producer):
+    """Register producer output file in tmpdir manifest (outputTTL - seconds, default 300)"""
+    manifest = OutputManifest(config['tmpdir'])
+    manifest.register(fName, producer, config.get('outputTTL', DEFAULT_TTL))
+    return fName
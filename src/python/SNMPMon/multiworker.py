@@ -10,15 +10,20 @@ Date: 2024/05/23
 """
 import os
 import time
-import subprocess
+import threading
 from datetime import datetime, timedelta
-import shlex
 from SNMPMon.utilities import getTimeRotLogger
 from SNMPMon.utilities import getFileContentAsJson
+from SNMPMon.utilities import dumpFileContent
 from SNMPMon.utilities import dumpFileContentAsJson
 from SNMPMon.utilities import moveFile
-from SNMPMon.utilities import updatedict
+from SNMPMon.utilities import getLatestFileName
+from SNMPMon.utilities import IndexedMerge
 from SNMPMon.utilities import getConfig
+from SNMPMon.shmstore import ShmStoreWriter
+from SNMPMon.notify import getWatcher
+from SNMPMon.manifest import OutputManifest
+from SNMPMon.supervisor import Supervisor
 
 def fileUpdatedLastNMin(filename, minutes=5):
     """Check if file was updated with-in last N minutes."""
@@ -33,52 +38,63 @@ def fileUpdatedLastNMin(filename, minutes=5):
     return False
 
 
-def externalCommand(command, communicate=True):
-    """Execute External Commands and return stdout and stderr."""
-    command = shlex.split(str(command))
-    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if communicate:
-        return proc.communicate()
-    return proc
-
 class MultiWorker():
     """SNMP Monitoring Class"""
     def __init__(self, config):
         super().__init__()
         self.config = config
         self.logger = getTimeRotLogger(**config['logParams'])
-        self.firstRun = True
-        self.scannedfiles = []
-
-    def _runCmd(self, cmd, action, device, foreground=False):
-        """Start execution of new requests"""
-        retOut = {'stdout': [], 'stderr': [], 'exitCode': -1}
-        command = f"{cmd} --action {action} --devicename {device}"
-        if foreground:
-            command += " --foreground"
-        cmdOut = externalCommand(command, False)
-        out, err = cmdOut.communicate()
-        retOut['stdout'] += out.decode("utf-8").split('\n')
-        retOut['stderr'] += err.decode("utf-8").split('\n')
-        retOut['exitCode'] = cmdOut.returncode
-        return retOut
+        self.scannedfiles = set()
+        # Shared memory snapshot store (optional) - WSGI Frontend reads merged output from it
+        self.store = ShmStoreWriter(config['shmStore'], self.logger) if config.get('shmStore') else None
+        # Merge outputs as soon as device output lands in tmpdir (between scheduled runs)
+        self.runInterval = config.get('runInterval', 30)
+        # Next scheduled run (set by Daemon scheduler before each run)
+        self.runDeadline = None
+        self.watcher = None
+        if config.get('mergeOnChange', True):
+            if not os.path.isdir(config['tmpdir']):
+                os.makedirs(config['tmpdir'])
+            self.watcher = getWatcher([config['tmpdir']], self.logger)
+        self.mergeStats = {'merges': 0, 'merges_on_change': 0, 'merge_skipped_writes': 0}
+        # Parsed files cache: fName -> {'key': (inode, mtime, size), 'content': parsed content}
+        self.mergeCache = {}
+        # Merged output, files it was built from (fName -> (device, identity, top level keys))
+        self.merged = {'out': {}, 'files': {}, 'written': False}
+        # Producers (ESnet, TSDS) register outputs in tmpdir manifest. If disabled - tmpdir is scanned
+        self.manifest = OutputManifest(config['tmpdir']) if config.get('outputManifest', True) else None
+        self.compactor = None
+        # Worker processes are started and tracked in process (restarted with backoff if they exit)
+        self.supervisor = Supervisor(self.logger, config.get('supervisorParams', {}))
+        self.supervisor.onExit(lambda worker, exitCode: self.logger.error(
+            f"{worker.name} exited with code {exitCode}. Stats: {worker.stats}"))
+        # Component started in last run (workers of all other components are stopped)
+        self.activeComponent = None
 
-    def __getLatestOutput(self, fName):
-        retryCount = 0
-        while retryCount < 5:
-            try:
-                out = getFileContentAsJson(fName)
-                if out:
-                    return out
-            except Exception as ex:
-                self.logger.debug(f'Got Exception3: {ex}')
-            retryCount += 1
-            time.sleep(0.2)
-        return {}
+    def __getLatestOutput(self, fName, stats):
+        """Get parsed file content. Parsed content is cached by file (inode, mtime, size)
+        and file is parsed again only if it changed. Returns (file identity, content)"""
+        try:
+            fstat = os.stat(fName)
+        except OSError:
+            return None, {}
+        key = (fstat.st_ino, fstat.st_mtime_ns, fstat.st_size)
+        cached = self.mergeCache.get(fName)
+        if cached and cached['key'] == key:
+            stats['merge_cache_hits'] += 1
+            return key, cached['content']
+        stats['merge_reparses'] += 1
+        # Output files are replaced atomically (rename), so there is no need to retry
+        try:
+            content = getFileContentAsJson(fName)
+        except Exception as ex:
+            self.logger.debug(f'Got Exception3: {ex}')
+            return None, {}
+        self.mergeCache[fName] = {'key': key, 'content': content}
+        return key, content
 
-    def _latestOutputESnet(self):
-        """Get latest output from all ESnet monitored devices."""
-        out = {}
+    def _latestOutputESnet(self, stats):
+        """Get latest output files from all ESnet monitored devices."""
         # First identify oscarsid (if we have it)
         oscarIds = []
         for file in os.listdir(self.config['httpdir']):
@@ -86,159 +102,180 @@ class MultiWorker():
                 continue
             fName = os.path.join(self.config['httpdir'], file)
             try:
-                self.scannedfiles.append(fName)
-                tmpOut = getFileContentAsJson(fName)
+                self.scannedfiles.add(fName)
+                _, tmpOut = self.__getLatestOutput(fName, stats)
                 if tmpOut and tmpOut.get('runinfo', {}).get('oscarsid', ''):
                     if tmpOut['runinfo']['oscarsid'] not in oscarIds:
                         oscarIds.append(tmpOut['runinfo']['oscarsid'])
             except Exception as ex:
                 self.logger.debug(f'Got Exception4: {ex}')
-        # Now here we loop via all OscarIds and get latest output
-        for oscarId in oscarIds:
-            fName = os.path.join(self.config['tmpdir'], f"snmp-{oscarId}.json")
-            try:
-                tmpOut = self.__getLatestOutput(fName)
-                if tmpOut:
-                    out = updatedict(out, tmpOut)
-            except Exception as ex:
-                self.logger.debug(f'Got Exception1: {ex}')
-        return out
+        # Latest output of each OscarId
+        return [os.path.join(self.config['tmpdir'], f"snmp-{oscarId}.json") for oscarId in oscarIds]
 
     def _latestOutputOther(self):
-        """Get all the rest files and merge them."""
+        """Get all the rest files (merged into device outputs)."""
+        if self.manifest:
+            # Active outputs registered by producers
+            return [fName for fName in self.manifest.active()
+                    if fName not in self.scannedfiles and fName != getLatestFileName(self.config, 'multiworker')]
         # Get all the rest files
-        out = {}
+        out = []
         for dirname, _dirs, files in os.walk(self.config['tmpdir']):
             for filename in files:
                 fName = os.path.join(dirname, filename)
                 if fName in self.scannedfiles:
                     continue
-                if filename == 'snmp-multiworker-latest.json':
+                if fName == getLatestFileName(self.config, 'multiworker') or filename == 'supervisor-stats.json':
                     continue
                 if not fileUpdatedLastNMin(fName, 5):
                     continue
-                try:
-                    tmpOut = getFileContentAsJson(fName)
-                    if tmpOut:
-                        out = updatedict(out, tmpOut)
-                except Exception as ex:
-                    self.logger.debug(f'Got Exception2: {ex}')
+                out.append(fName)
         return out
 
-    def _latestOutput(self):
-        """Get latest output from all devices and write it to a single file."""
-        out = {}
-        for device in self.config.get('snmpMon', {}).keys():
-            fName = os.path.join(self.config['tmpdir'], f"snmp-{device}-latest.json")
+    def _mergeKey(self, key, sources):
+        """Build merged output of single top level key. Device output is the base and
+        all other outputs are merged into it (IndexedMerge). Cached contents are never modified."""
+        value, patches = None, []
+        for device, content in sources:
+            if device == key:
+                value = content
+            elif device is None and key in content:
+                patches.append(content[key])
+        if patches and value is not None:
+            # Copy levels which IndexedMerge modifies
+            value = {key1: dict(val1) if isinstance(val1, dict) else val1 for key1, val1 in value.items()}
+        merged = IndexedMerge({key: value} if value is not None else {})
+        for patch in patches:
             try:
-                self.scannedfiles.append(fName)
-                tmpOut = self.__getLatestOutput(fName)
-                if tmpOut:
-                    out[device] = tmpOut
+                merged.update({key: patch})
             except Exception as ex:
-                self.logger.debug(f'Got Exception5: {ex}')
-        esnetout = self._latestOutputESnet()
-        if esnetout:
-            out = updatedict(out, esnetout)
-        out = updatedict(out, self._latestOutputOther())
-        return dumpFileContentAsJson(self.config, 'multiworker', out)
+                self.logger.debug(f'Got Exception2: {ex}')
+        return merged.out.get(key)
+
+    def _latestOutput(self):
+        """Get latest output from all devices and write it to a single file.
+        Only files which changed are parsed again and only affected devices are merged again.
+        Returns new file name or None if nothing changed."""
+        stats = {'merge_cache_hits': 0, 'merge_reparses': 0, 'merge_rebuilt_keys': 0}
+        sources = [(getLatestFileName(self.config, device), device)
+                   for device in self.config.get('snmpMon', {}).keys()]
+        self.scannedfiles.update(fName for fName, _ in sources)
+        sources += [(fName, None) for fName in self._latestOutputESnet(stats)]
+        sources += [(fName, None) for fName in self._latestOutputOther()]
+        loaded = []
+        for fName, device in sources:
+            key, content = self.__getLatestOutput(fName, stats)
+            if content and isinstance(content, dict):
+                loaded.append((fName, device, key, content))
+        # Top level keys affected by new, changed or removed files
+        affected = set()
+        files = {}
+        for fName, device, key, content in loaded:
+            files.setdefault(fName, (device, key, {device} if device else set(content.keys())))
+            prev = self.merged['files'].get(fName, (None, None, set()))
+            if prev[:2] != (device, key):
+                affected |= files[fName][2] | prev[2]
+        for fName, (_device, _key, keys) in self.merged['files'].items():
+            if fName not in files:
+                affected |= keys
+        self.merged['files'] = files
+        for fName in set(self.mergeCache) - set(files) - self.scannedfiles:
+            self.mergeCache.pop(fName, None)
+        self.mergeStats.update(stats)
+        if not affected and self.merged['written']:
+            self.mergeStats['merge_skipped_writes'] += 1
+            self.logger.debug(f'No output changes. Merged output is not written. Stats: {self.mergeStats}')
+            return None
+        ordered = [(device, content) for _fName, device, _key, content in loaded]
+        # Keys in source (file) order, so merged output (and its bytes) does not depend on set order
+        keyOrder = list(dict.fromkeys(key for _fName, device, _key, content in loaded
+                                      for key in ([device] if device else content.keys())))
+        out = self.merged['out']
+        for key in keyOrder:
+            if key in affected:
+                out[key] = self._mergeKey(key, ordered)
+                self.mergeStats['merge_rebuilt_keys'] += 1
+        for key in affected - set(keyOrder):
+            out.pop(key, None)
+            self.mergeStats['merge_rebuilt_keys'] += 1
+        self.merged['out'] = {key: out[key] for key in keyOrder if out.get(key) is not None}
+        self.merged['written'] = True
+        self.logger.debug(f'Merged output of {len(affected)} changed keys. Stats: {self.mergeStats}')
+        if self.store:
+            gen = self.store.publish(self.merged['out'])
+            self.logger.debug(f'Published generation {gen} to shared snapshot store ({self.store.stats["store_bytes"]} bytes)')
+        return dumpFileContent(self.config, 'multiworker', self.merged['out'])
 
     def _startSNMPMonitoring(self):
         """Start SNMP Monitoring processes for each device."""
-        # Read config and for each device start SNMPMonitoring supervisord process
-        # which should check if it is status ok and if not - restart it.
+        # Read config and for each device make sure SNMPMonitoring process is running
+        # (supervisor restarts it with backoff if it exited).
         if not self.config.get('snmpMon', {}):
             self.logger.error("No devices to monitor configured for SNMP.")
             return False
-        for device in self.config.get('snmpMon', {}).keys():
-            # Check status
-            retOut = self._runCmd('SNMPMonitoring', 'status', device)
-            if retOut['exitCode'] != 0 and self.firstRun:
-                self.logger.info(f"Starting SNMPMonitoring for {device}")
-                retOut = self._runCmd('SNMPMonitoring', 'start', device, True)
-                self.logger.info(f"Starting SNMPMonitoring for {device} - {retOut}")
-                continue
-            if retOut['exitCode'] != 0 and not self.firstRun:
-                self.logger.error(f"SNMPMonitoring for {device} failed: {retOut}")
-                retOut = self._runCmd('SNMPMonitoring', 'restart', device, True)
-                self.logger.info(f"Restarting SNMPMonitoring for {device} - {retOut}")
-                continue
+        # pollerMode async - single SNMPPoller process polls all devices
+        if self.config.get('pollerMode', 'process') == 'async':
+            devices, cmd = ['all'], 'SNMPPoller'
+        else:
+            devices, cmd = list(self.config.get('snmpMon', {}).keys()), 'SNMPMonitoring'
+        for device in devices:
+            self.supervisor.ensure(cmd, device)
+        self.supervisor.prune(cmd, devices)
+        self.activeComponent = cmd
         return True
 
-    def _startTSDSMonitoring(self):
-        """Read hhtpdir config and start TSDS monitoring processes"""
-        if not self.config.get('tsds_uri', ''):
-            self.logger.error("No TSDS devices to monitor configured.")
-            return False
+    def _startRequestedMonitoring(self, cmd):
+        """Read httpdir requests and start (or stop) cmd monitoring processes.
+        Workers which request file was removed are stopped"""
+        requested = set()
         for file in os.listdir(self.config['httpdir']):
             if not file.endswith('.json'):
                 continue
             fName = os.path.join(self.config['httpdir'], file)
             config = getFileContentAsJson(fName)
             uuid, orchestrator = config.get('uuid', ''), config.get('orchestrator', '')
-            firstRun, stopRun = bool(config.get('firstRun', True)), bool(config.get('stopRun', False))
+            stopRun = bool(config.get('stopRun', False))
             if not uuid or not orchestrator:
                 self.logger.error(f"UUID or Orchestrator is missing in {fName}")
                 continue
             if stopRun:
-                self.logger.info(f"Stopping TSDSMonitoring for {uuid}")
-                retOut = self._runCmd('TSDSMonitoring', 'stop', uuid, True)
-                self.logger.info(f"Stopping TSDSMonitoring for {uuid} - {retOut}")
+                self.logger.info(f"Stopping {cmd} for {uuid}")
+                self.supervisor.stop(cmd, uuid)
                 os.remove(fName)
                 continue
-            # Write back the file with firstRun set to False
-            retOut = self._runCmd('TSDSMonitoring', 'status', uuid)
-            if retOut['exitCode'] != 0 and firstRun:
-                self.logger.info(f"Starting TSDSMonitoring for {uuid}")
-                retOut = self._runCmd('TSDSMonitoring', 'start', uuid, True)
-                self.logger.info(f"Starting TSDSMonitoring for {uuid} - {retOut}")
-                continue
-            if retOut['exitCode'] != 0 and not firstRun:
-                self.logger.error(f"TSDSMonitoring for {uuid} failed: {retOut}")
-                retOut = self._runCmd('TSDSMonitoring', 'restart', uuid, True)
-                self.logger.info(f"Restarting TSDSMonitoring for {uuid} - {retOut}")
-                continue
+            self.supervisor.ensure(cmd, uuid)
+            requested.add(uuid)
+        self.supervisor.prune(cmd, requested)
+        self.activeComponent = cmd
         return True
 
+    def _startTSDSMonitoring(self):
+        """Read hhtpdir config and start TSDS monitoring processes"""
+        if not self.config.get('tsds_uri', ''):
+            self.logger.error("No TSDS devices to monitor configured.")
+            return False
+        return self._startRequestedMonitoring('TSDSMonitoring')
+
     def _startESnetMonitoring(self):
         """Read httpdir config and start ESnet monitoring processes"""
         if not self.config.get('es_host', '') and not self.config.get('es_index', ''):
             self.logger.error("No ESnet devices to monitor configured.")
             return False
-        for file in os.listdir(self.config['httpdir']):
-            if not file.endswith('.json'):
-                continue
-            fName = os.path.join(self.config['httpdir'], file)
-            config = getFileContentAsJson(fName)
-            uuid, orchestrator = config.get('uuid', ''), config.get('orchestrator', '')
-            firstRun, stopRun = bool(config.get('firstRun', True)), bool(config.get('stopRun', False))
-            if not uuid or not orchestrator:
-                self.logger.error(f"UUID or Orchestrator is missing in {fName}")
-                continue
-            if stopRun:
-                self.logger.info(f"Stopping ESnetMonitoring for {uuid}")
-                retOut = self._runCmd('ESnetMonitoring', 'stop', uuid, True)
-                self.logger.info(f"Stopping ESnetMonitoring for {uuid} - {retOut}")
-                os.remove(fName)
-                continue
-            # Write back the file with firstRun set to False
-            retOut = self._runCmd('ESnetMonitoring', 'status', uuid)
-            if retOut['exitCode'] != 0 and firstRun:
-                self.logger.info(f"Starting ESnetMonitoring for {uuid}")
-                retOut = self._runCmd('ESnetMonitoring', 'start', uuid, True)
-                self.logger.info(f"Starting ESnetMonitoring for {uuid} - {retOut}")
-                continue
-            if retOut['exitCode'] != 0 and not firstRun:
-                self.logger.error(f"ESnetMonitoring for {uuid} failed: {retOut}")
-                retOut = self._runCmd('ESnetMonitoring', 'restart', uuid, True)
-                self.logger.info(f"Restarting ESnetMonitoring for {uuid} - {retOut}")
-                continue
-        return True
+        return self._startRequestedMonitoring('ESnetMonitoring')
+
+    def _writeSupervisorStats(self):
+        """Write supervisor metrics (exposed by web frontend)"""
+        fName = os.path.join(self.config['tmpdir'], 'supervisor-stats.json')
+        dumpFileContentAsJson(self.config, fName, self.supervisor.getStats(), True)
 
     def startwork(self):
         """Multiworker main process"""
+        startTime = time.time()
+        self._startCompactor()
+        # Reap exited workers (exit callbacks are called for all of them, not only for ensured ones)
+        self.supervisor.check()
         # Start all SNMPMonitoring processes
-        self.scannedfiles = []
+        self.activeComponent = None
         for service, servclass in {'SNMPMonitoring': self._startSNMPMonitoring,
                                    'ESnetMonitoring': self._startESnetMonitoring,
                                    'TSDSMonitoring': self._startTSDSMonitoring}.items():
@@ -247,12 +284,64 @@ class MultiWorker():
                 self.logger.info(f"{service} started successfully. Will not start any other monitoring (Only one allowed).")
                 break
             self.logger.error(f"{service} not started. Either not configured or already running.")
+        # Workers of other components (pollerMode or service switch) are not needed anymore
+        stopped = self.supervisor.pruneInactive(self.activeComponent)
+        if stopped:
+            self.logger.info(f'Stopped workers of inactive components: {stopped}')
+        self._writeSupervisorStats()
         # join all output files to a single file
+        self._publishOutput()
+        if self.watcher:
+            # Keep merging on changes until next scheduled run (leave 1 second for the scheduler)
+            endTime = self.runDeadline or startTime + float(self.runInterval)
+            self._mergeOnChange(endTime - 1)
+
+    def _publishOutput(self):
+        """Merge all outputs and publish (file and shared store) if anything changed"""
+        self.scannedfiles = set()
         newFName = self._latestOutput()
-        latestFName = os.path.join(self.config['tmpdir'], 'snmp-multiworker-latest.json')
-        moveFile(latestFName, newFName)
-        # Mark as not first run, so if service stops, it uses restart
-        self.firstRun = False
+        if newFName:
+            latestFName = getLatestFileName(self.config, 'multiworker')
+            moveFile(latestFName, newFName)
+        self.mergeStats['merges'] += 1
+
+    def _startCompactor(self):
+        """Start background compaction of tmpdir (expired outputs, leftover temporary files)"""
+        if not self.manifest or (self.compactor and self.compactor.is_alive()):
+            return
+        self.compactor = threading.Thread(target=self._compactLoop, name='compactor', daemon=True)
+        self.compactor.start()
+
+    def _compactLoop(self):
+        """Compact tmpdir every compactInterval seconds (Default 600)"""
+        interval = float(self.config.get('compactInterval', 600))
+        while True:
+            try:
+                removed = self.manifest.compact(self.config.get('outputTTL', 300))
+                if removed:
+                    self.logger.info(f'Compaction removed {len(removed)} files. Stats: {self.manifest.stats}')
+            except Exception as ex:
+                self.logger.error(f'Compaction of {self.config["tmpdir"]} failed: {ex}')
+            time.sleep(interval)
+
+    @staticmethod
+    def _isDeviceOutput(filename):
+        """Check if file is device output (not merged output or temporary file)"""
+        return filename.startswith('snmp-') and filename.endswith(('.json', '.snap')) and \
+            not filename.startswith('snmp-multiworker')
+
+    def _mergeOnChange(self, endTime):
+        """Wait for device outputs and merge as soon as any of them changed (until endTime)"""
+        while time.time() < endTime:
+            changed = [name for _, name in self.watcher.wait(endTime - time.time())
+                       if not name or self._isDeviceOutput(name)]
+            if not changed:
+                continue
+            # Devices finishing at the same moment are merged together
+            self.watcher.wait(0.05)
+            self._publishOutput()
+            self.mergeStats['merges_on_change'] += 1
+            self.logger.debug(f'Merged outputs after change of {changed}. Stats: {self.mergeStats}')
 
 if __name__ == '__main__':
     CONFIG = getConfig('/etc/snmp-mon.yaml')
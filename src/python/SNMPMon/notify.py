@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+    File change notification for SNMP Monitoring. Uses Linux inotify (via ctypes)
+    to get notified when files are written or renamed into watched directories.
+    On systems without inotify, falls back to polling directory file mtimes.
+"""
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher():
+    """Watch directories for files which were written (closed) or renamed into them"""
+    def __init__(self, paths, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        for path in paths:
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(err, f'inotify_add_watch failed for {path}')
+            self.watches[wd] = path
+
+    def _readEvents(self):
+        """Read all pending events. Returns set of (directory, filename)"""
+        out = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return out
+            pos = 0
+            while pos + EVENT.size <= len(data):
+                wd, mask, _cookie, length = EVENT.unpack_from(data, pos)
+                name = data[pos + EVENT.size:pos + EVENT.size + length].rstrip(b'\x00')
+                pos += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost - report all watched directories as changed
+                    out.update((path, '') for path in self.watches.values())
+                elif wd in self.watches:
+                    out.add((self.watches[wd], os.fsdecode(name)))
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for changes. Returns set of (directory, filename)"""
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        return self._readEvents()
+
+    def close(self):
+        """Close inotify file descriptor"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class PollingWatcher():
+    """Fallback watcher - polls directory file mtimes"""
+    def __init__(self, paths, pollInterval=0.5):
+        self.paths = list(paths)
+        self.pollInterval = pollInterval
+        self.mtimes = self._scan()
+
+    def _scan(self):
+        """Get mtimes of all files in watched directories"""
+        out = {}
+        for path in self.paths:
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            out[(path, entry.name)] = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+        return out
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for changes. Returns set of (directory, filename)"""
+        endTime = time.time() + max(0.0, timeout)
+        while True:
+            mtimes = self._scan()
+            changed = {key for key, mtime in mtimes.items() if self.mtimes.get(key) != mtime}
+            self.mtimes = mtimes
+            if changed or time.time() >= endTime:
+                return changed
+            time.sleep(min(self.pollInterval, max(0.0, endTime - time.time())))
+
+    def close(self):
+        """Nothing to close"""
+
+
+def getWatcher(paths, logger=None):
+    """Get inotify watcher, or polling watcher if inotify is not available"""
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError) as ex:
+        if logger:
+            logger.warning(f'inotify not available ({ex}). Will poll for file changes')
+        return PollingWatcher(paths)
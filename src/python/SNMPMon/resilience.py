@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+    Per-device deadline budget and circuit breaker for SNMP Monitoring.
+    Deadline - limits how long a single polling cycle can query a device.
+    CircuitBreaker - stops polling dead devices and probes them with exponential backoff.
+"""
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Deadline budget for polling cycle is exhausted"""
+
+
+class Deadline():
+    """Deadline budget (seconds) for a single polling cycle. 0 or less - no deadline"""
+    def __init__(self, budget=0):
+        self.budget = float(budget or 0)
+        self.endTime = time.time() + self.budget if self.budget > 0 else None
+
+    def remaining(self):
+        """Seconds left in budget"""
+        if self.endTime is None:
+            return float('inf')
+        return max(0.0, self.endTime - time.time())
+
+    def expired(self):
+        """Check if budget is exhausted"""
+        return self.endTime is not None and time.time() >= self.endTime
+
+
+class CircuitBreaker():
+    """Circuit breaker for a single device.
+    closed - device is polled on every cycle;
+    open - after failureThreshold failed cycles device is not polled until backoff passes;
+    probe - after backoff, device gets a single cheap probe before full scan.
+    Each failed probe doubles backoff (up to maxBackoff)."""
+    def __init__(self, logger, **kwargs):
+        self.logger = logger
+        self.failureThreshold = max(1, int(kwargs.get('failureThreshold', 1)))
+        self.baseBackoff = float(kwargs.get('backoff', 60))
+        self.maxBackoff = float(kwargs.get('maxBackoff', 900))
+        self.backoff = self.baseBackoff
+        self.failures = 0
+        self.openUntil = 0
+        self.stats = {'breaker_open': 0, 'breaker_trips': 0, 'breaker_probes': 0, 'breaker_skipped': 0}
+
+    def state(self, now):
+        """Get breaker state: closed, open or probe"""
+        if self.failures < self.failureThreshold:
+            return 'closed'
+        if now < self.openUntil:
+            return 'open'
+        return 'probe'
+
+    def allow(self, now):
+        """Check if device can be polled now. Returns False if breaker is open"""
+        state = self.state(now)
+        if state == 'open':
+            self.stats['breaker_skipped'] += 1
+            return False
+        if state == 'probe':
+            self.stats['breaker_probes'] += 1
+        return True
+
+    def recordSuccess(self):
+        """Device responded. Close breaker"""
+        if self.failures >= self.failureThreshold:
+            self.logger.info('Device responded. Circuit breaker closed')
+        self.failures = 0
+        self.backoff = self.baseBackoff
+        self.openUntil = 0
+        self.stats['breaker_open'] = 0
+
+    def recordFailure(self, now):
+        """Device did not respond. Open breaker (with exponential backoff) after failureThreshold failures"""
+        self.failures += 1
+        if self.failures < self.failureThreshold:
+            return
+        self.openUntil = now + self.backoff
+        self.stats['breaker_open'] = 1
+        self.stats['breaker_trips'] += 1
+        self.logger.warning(f'Device not responding. Circuit breaker open for {self.backoff} seconds')
+        self.backoff = min(self.backoff * 2, self.maxBackoff)
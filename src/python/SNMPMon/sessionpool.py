@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+    SNMP Session pool. Keeps SNMP session alive between polling cycles
+    (no SNMPv3 engine discovery/key localization on every cycle) and rebuilds
+    it only after a streak of timeouts.
+"""
+import time
+from easysnmp import Session
+from easysnmp.exceptions import EasySNMPTimeoutError
+
+
+class SessionPool():
+    """SNMP Session pool for a single device"""
+    def __init__(self, snmpParams, logger, **kwargs):
+        # Copy, so config is never modified (hostname pop below)
+        self.snmpParams = dict(snmpParams)
+        self.logger = logger
+        self.timeoutStreak = max(1, int(kwargs.get('timeoutStreak', 3)))
+        self.session = None
+        self.stats = {'sessions_created': 0, 'session_setup_ms': 0.0,
+                      'session_setup_total_ms': 0.0, 'timeout_streak': 0,
+                      'health_checks': 0}
+
+    def _createSession(self):
+        """Create new SNMP Session"""
+        startTime = time.perf_counter()
+        params = dict(self.snmpParams)
+        try:
+            session = Session(**params)
+        except ValueError:
+            hostname = params.pop('hostname')
+            session = Session(**params)
+            session.update_session(hostname=hostname)
+        setupTime = (time.perf_counter() - startTime) * 1000
+        self.stats['sessions_created'] += 1
+        self.stats['session_setup_ms'] = setupTime
+        self.stats['session_setup_total_ms'] += setupTime
+        self.logger.info(f'Created new SNMP session in {setupTime:.1f} ms (total created: {self.stats["sessions_created"]})')
+        return session
+
+    def getSession(self):
+        """Get SNMP Session (create if not available or it was dropped after timeouts)"""
+        if self.session is None:
+            self.session = self._createSession()
+        return self.session
+
+    def dropSession(self):
+        """Drop session, next getSession call will create a new one"""
+        self.session = None
+        self.stats['timeout_streak'] = 0
+
+    def healthCheck(self):
+        """Check session with a single sysUpTime GET. Returns sysUpTime or None on timeout.
+        Failure counts towards timeout streak, success does not reset it (only successful cycle does)"""
+        self.stats['health_checks'] += 1
+        try:
+            item = self.getSession().get('sysUpTime.0')
+            return item.value
+        except EasySNMPTimeoutError as ex:
+            self.logger.warning(f'SNMP session health check failed: {ex}')
+            self.reportCycle([ex])
+        return None
+
+    def reportCycle(self, err):
+        """Report cycle errors. Session is rebuilt after timeoutStreak cycles with timeouts"""
+        if not any(isinstance(ex, EasySNMPTimeoutError) for ex in err):
+            self.stats['timeout_streak'] = 0
+            return
+        self.stats['timeout_streak'] += 1
+        if self.stats['timeout_streak'] >= self.timeoutStreak:
+            self.logger.warning(f'{self.stats["timeout_streak"]} cycles with timeouts. Will rebuild SNMP session')
+            self.dropSession()
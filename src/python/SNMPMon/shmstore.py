@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+    Shared snapshot store. Memory mapped, double buffered file (e.g. in /dev/shm)
+    with a generation counter. Writer (MultiWorker) publishes merged snapshot
+    (binary snapshot format) into the inactive slot and flips generation.
+    Readers (WSGI Frontend) map the file once and decode only the devices they need.
+    File layout:
+        header (one page): magic (8 bytes), version (u32), slot capacity (u64),
+                           generation (u64) - last complete publish,
+                           writing (u64) - publish which is being written,
+                           per slot: data length (u64)
+        slot 0, slot 1:    capacity bytes each. Publish N is written to slot N % 2
+    A reader which started on generation N is valid as long as publish N + 2 (which
+    reuses the same slot) did not start. If store outgrows capacity, a new file with
+    bigger slots is written and renamed over (readers remap on inode change).
+"""
+import os
+import mmap
+import struct
+from SNMPMon.snapshot import dumps, SnapshotReader
+
+MAGIC = b'SNMPSHM1'
+VERSION = 1
+HEADERSIZE = mmap.PAGESIZE
+# magic, version, capacity, generation, writing, slot0 length, slot1 length
+HEADER = struct.Struct('<8sIQQQQQ')
+GENERATION = struct.Struct('<QQ')
+GENERATION_OFFSET = 8 + 4 + 8
+LENGTH_OFFSET = GENERATION_OFFSET + GENERATION.size
+U64 = struct.Struct('<Q')
+MIN_CAPACITY = 1024 * 1024
+
+
+class StoreChanged(Exception):
+    """Store was updated while it was read"""
+
+
+class ShmStoreWriter():
+    """Single writer of shared snapshot store"""
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+        self.fd = None
+        self.mmap = None
+        self.capacity = 0
+        self.generation = 0
+        self.stats = {'store_publishes': 0, 'store_resizes': 0, 'store_bytes': 0}
+        self._open()
+
+    def _open(self):
+        """Map existing store (continue its generation) if it is valid"""
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'r+b') as fd:
+                header = HEADER.unpack(fd.read(HEADER.size))
+                if header[0] != MAGIC or header[1] != VERSION:
+                    return
+                size = os.fstat(fd.fileno()).st_size
+                if size < HEADERSIZE + 2 * header[2]:
+                    return
+                self.mmap = mmap.mmap(fd.fileno(), size)
+            self.capacity = header[2]
+            self.generation = max(header[3], header[4])
+        except (OSError, struct.error, ValueError):
+            self.mmap = None
+
+    def _create(self, capacity):
+        """Create new store file with given slot capacity and rename it over old one"""
+        capacity = max(MIN_CAPACITY, -(-capacity // mmap.PAGESIZE) * mmap.PAGESIZE)
+        tmpPath = f'{self.path}.tmp'
+        with open(tmpPath, 'w+b') as fd:
+            fd.truncate(HEADERSIZE + 2 * capacity)
+            newMap = mmap.mmap(fd.fileno(), HEADERSIZE + 2 * capacity)
+        newMap[0:HEADER.size] = HEADER.pack(MAGIC, VERSION, capacity, self.generation, self.generation, 0, 0)
+        if self.mmap is not None:
+            # Copy current data, so readers of renamed file see the same generation
+            slot = self.generation % 2
+            length = U64.unpack_from(self.mmap, LENGTH_OFFSET + slot * U64.size)[0]
+            if length <= capacity:
+                start = HEADERSIZE + slot * self.capacity
+                newMap[HEADERSIZE + slot * capacity:HEADERSIZE + slot * capacity + length] = \
+                    self.mmap[start:start + length]
+                U64.pack_into(newMap, LENGTH_OFFSET + slot * U64.size, length)
+            self.mmap.close()
+        os.rename(tmpPath, self.path)
+        self.mmap = newMap
+        self.capacity = capacity
+        self.stats['store_resizes'] += 1
+        if self.logger:
+            self.logger.info(f'Shared snapshot store {self.path} created with slot capacity {capacity} bytes')
+
+    def publish(self, content):
+        """Publish new snapshot (dict). Returns new generation"""
+        data = dumps(content)
+        if self.mmap is None or len(data) > self.capacity:
+            self._create(len(data) * 2)
+        gen = self.generation + 1
+        slot = gen % 2
+        # Mark slot as being written, so readers of generation gen - 2 (same slot) retry
+        U64.pack_into(self.mmap, GENERATION_OFFSET + U64.size, gen)
+        start = HEADERSIZE + slot * self.capacity
+        self.mmap[start:start + len(data)] = data
+        U64.pack_into(self.mmap, LENGTH_OFFSET + slot * U64.size, len(data))
+        U64.pack_into(self.mmap, GENERATION_OFFSET, gen)
+        self.generation = gen
+        self.stats['store_publishes'] += 1
+        self.stats['store_bytes'] = len(data)
+        return gen
+
+    def close(self):
+        """Unmap store"""
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+
+class ShmStoreReader():
+    """Reader of shared snapshot store. Store is mapped once (remapped if file was replaced)"""
+    def __init__(self, path, retries=5):
+        self.path = path
+        self.retries = retries
+        self.mmap = None
+        self.inode = None
+        self.capacity = 0
+
+    def _map(self):
+        """Map store file (or remap if it was replaced). Returns False if store not available"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        if self.mmap is not None and stat.st_ino == self.inode:
+            return True
+        self.close()
+        with open(self.path, 'rb') as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if size < HEADERSIZE:
+                return False
+            newMap = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ)
+            inode = os.fstat(fd.fileno()).st_ino
+        header = HEADER.unpack_from(newMap, 0)
+        if header[0] != MAGIC or header[1] != VERSION or size < HEADERSIZE + 2 * header[2]:
+            newMap.close()
+            return False
+        self.mmap, self.inode, self.capacity = newMap, inode, header[2]
+        return True
+
+    def generation(self):
+        """Get current (last complete) generation. 0 if store not available"""
+        if not self._map():
+            return 0
+        return GENERATION.unpack_from(self.mmap, GENERATION_OFFSET)[0]
+
+    def _readOnce(self, func):
+        """Call func(SnapshotReader) on current generation. Raises StoreChanged if slot was reused"""
+        gen = GENERATION.unpack_from(self.mmap, GENERATION_OFFSET)[0]
+        if not gen:
+            return gen, None
+        slot = gen % 2
+        length = U64.unpack_from(self.mmap, LENGTH_OFFSET + slot * U64.size)[0]
+        start = HEADERSIZE + slot * self.capacity
+        view = memoryview(self.mmap)[start:start + length]
+        try:
+            out = func(SnapshotReader(data=view))
+        except (ValueError, IndexError, KeyError, UnicodeDecodeError, struct.error) as ex:
+            out = ex
+        finally:
+            view.release()
+        # Slot is reused by publish gen + 2
+        if GENERATION.unpack_from(self.mmap, GENERATION_OFFSET)[1] >= gen + 2:
+            raise StoreChanged(f'Store generation {gen} was overwritten while reading')
+        if isinstance(out, Exception):
+            raise out
+        return gen, out
+
+    def read(self, func):
+        """Call func(SnapshotReader) on consistent generation (retries without sleep if writer
+        reused slot while reading). Returns (generation, func output); (0, None) if store not available"""
+        for _ in range(self.retries):
+            if not self._map():
+                return 0, None
+            try:
+                return self._readOnce(func)
+            except StoreChanged:
+                continue
+        raise StoreChanged(f'Store {self.path} changed during {self.retries} reads')
+
+    def close(self):
+        """Unmap store"""
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                # Some view is still alive. Drop reference, it is unmapped once released
+                pass
+            self.mmap = None
+            self.inode = None
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+    Local SNMP agent simulator. Serves synthetic (or recorded with snmpwalk -On)
+    IF-MIB, ENTITY-MIB and Q-BRIDGE-MIB tables over SNMPv1/v2c on UDP, with
+    configurable size, latency and loss. Used by benchmarks (SNMPMon.benchmark collect)
+    to measure collection without a real switch.
+    Usage:
+        python3 -m SNMPMon.simulator --port 1161 --interfaces 1000 --latency 0.002 --loss 0.01
+"""
+import re
+import sys
+import time
+import random
+import socket
+import argparse
+import threading
+from bisect import bisect_right
+
+# BER/SNMP tags
+TAG_INTEGER = 0x02
+TAG_OCTETSTR = 0x04
+TAG_NULL = 0x05
+TAG_OBJECTID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IPADDR = 0x40
+TAG_COUNTER = 0x41
+TAG_GAUGE = 0x42
+TAG_TICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_NOSUCHOBJECT = 0x80
+TAG_NOSUCHINSTANCE = 0x81
+TAG_ENDOFMIBVIEW = 0x82
+# PDU types
+PDU_GET = 0xA0
+PDU_GETNEXT = 0xA1
+PDU_RESPONSE = 0xA2
+PDU_SET = 0xA3
+PDU_GETBULK = 0xA5
+
+# SNMP type names (same as easysnmp snmp_type) -> BER tag
+TYPES = {'INTEGER': TAG_INTEGER, 'OCTETSTR': TAG_OCTETSTR, 'NULL': TAG_NULL,
+         'OBJECTID': TAG_OBJECTID, 'IPADDR': TAG_IPADDR, 'COUNTER': TAG_COUNTER,
+         'GAUGE': TAG_GAUGE, 'TICKS': TAG_TICKS, 'COUNTER64': TAG_COUNTER64,
+         'NOSUCHOBJECT': TAG_NOSUCHOBJECT, 'NOSUCHINSTANCE': TAG_NOSUCHINSTANCE,
+         'ENDOFMIBVIEW': TAG_ENDOFMIBVIEW}
+TAGNAMES = {tag: name for name, tag in TYPES.items()}
+UNSIGNED_TAGS = [TAG_COUNTER, TAG_GAUGE, TAG_TICKS, TAG_COUNTER64]
+
+# Keep responses below maximum UDP payload
+MAX_RESPONSE_SIZE = 65000
+
+# IF-MIB/ENTITY-MIB/Q-BRIDGE-MIB OIDs served by synthetic device
+OIDS = {'sysDescr': '1.3.6.1.2.1.1.1', 'sysUpTime': '1.3.6.1.2.1.1.3', 'sysName': '1.3.6.1.2.1.1.5',
+        'ifNumber': '1.3.6.1.2.1.2.1', 'ifTableLastChange': '1.3.6.1.2.1.31.1.5',
+        'ifIndex': '1.3.6.1.2.1.2.2.1.1', 'ifDescr': '1.3.6.1.2.1.2.2.1.2', 'ifType': '1.3.6.1.2.1.2.2.1.3',
+        'ifMtu': '1.3.6.1.2.1.2.2.1.4', 'ifSpeed': '1.3.6.1.2.1.2.2.1.5',
+        'ifAdminStatus': '1.3.6.1.2.1.2.2.1.7', 'ifOperStatus': '1.3.6.1.2.1.2.2.1.8',
+        'ifLastChange': '1.3.6.1.2.1.2.2.1.9', 'ifInDiscards': '1.3.6.1.2.1.2.2.1.13',
+        'ifInErrors': '1.3.6.1.2.1.2.2.1.14', 'ifOutDiscards': '1.3.6.1.2.1.2.2.1.19',
+        'ifOutErrors': '1.3.6.1.2.1.2.2.1.20', 'ifName': '1.3.6.1.2.1.31.1.1.1.1',
+        'ifHCInOctets': '1.3.6.1.2.1.31.1.1.1.6', 'ifHCInUcastPkts': '1.3.6.1.2.1.31.1.1.1.7',
+        'ifHCInMulticastPkts': '1.3.6.1.2.1.31.1.1.1.8', 'ifHCInBroadcastPkts': '1.3.6.1.2.1.31.1.1.1.9',
+        'ifHCOutOctets': '1.3.6.1.2.1.31.1.1.1.10', 'ifHCOutUcastPkts': '1.3.6.1.2.1.31.1.1.1.11',
+        'ifHCOutMulticastPkts': '1.3.6.1.2.1.31.1.1.1.12', 'ifHCOutBroadcastPkts': '1.3.6.1.2.1.31.1.1.1.13',
+        'ifHighSpeed': '1.3.6.1.2.1.31.1.1.1.15', 'ifAlias': '1.3.6.1.2.1.31.1.1.1.18',
+        'entPhysicalName': '1.3.6.1.2.1.47.1.1.1.1.7', 'entLastChangeTime': '1.3.6.1.2.1.47.1.4.1',
+        'dot1qFdbDynamicCount': '1.3.6.1.2.1.17.7.1.2.1.1.2', 'dot1qTpFdbPort': '1.3.6.1.2.1.17.7.1.2.2.1.2',
+        'dot1qTpFdbStatus': '1.3.6.1.2.1.17.7.1.2.2.1.3'}
+# Counter columns (name, Counter type, increase per second per ifIndex)
+COUNTERS = [('ifHCInOctets', 'COUNTER64', 125000), ('ifHCOutOctets', 'COUNTER64', 120000),
+            ('ifHCInUcastPkts', 'COUNTER64', 100), ('ifHCOutUcastPkts', 'COUNTER64', 95),
+            ('ifHCInMulticastPkts', 'COUNTER64', 2), ('ifHCOutMulticastPkts', 'COUNTER64', 2),
+            ('ifHCInBroadcastPkts', 'COUNTER64', 1), ('ifHCOutBroadcastPkts', 'COUNTER64', 1),
+            ('ifInDiscards', 'COUNTER', 0), ('ifOutDiscards', 'COUNTER', 0),
+            ('ifInErrors', 'COUNTER', 0), ('ifOutErrors', 'COUNTER', 0)]
+
+
+def oidToTuple(oid):
+    """Convert dotted OID string to tuple of integers"""
+    return tuple(int(item) for item in oid.strip().strip('.').split('.') if item)
+
+
+def oidToStr(oid):
+    """Convert OID tuple to dotted string"""
+    return '.'.join(str(item) for item in oid)
+
+
+def encodeLength(length):
+    """BER length"""
+    if length < 0x80:
+        return bytes([length])
+    out = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(out)]) + out
+
+
+def encodeTlv(tag, payload):
+    """BER Tag-Length-Value"""
+    return bytes([tag]) + encodeLength(len(payload)) + payload
+
+
+def encodeInteger(value, tag=TAG_INTEGER):
+    """BER INTEGER (signed) or Counter/Gauge/TimeTicks (unsigned) with given tag"""
+    value = int(value)
+    if tag in UNSIGNED_TAGS:
+        payload = value.to_bytes(value.bit_length() // 8 + 1, 'big')
+    else:
+        payload = value.to_bytes((value + (value < 0)).bit_length() // 8 + 1, 'big', signed=True)
+    return encodeTlv(tag, payload)
+
+
+def encodeOid(oid):
+    """BER OBJECT IDENTIFIER"""
+    oid = oidToTuple(oid) if isinstance(oid, str) else tuple(oid)
+    if len(oid) < 2:
+        oid = tuple(oid) + (0,) * (2 - len(oid))
+    payload = bytearray([oid[0] * 40 + oid[1]])
+    for item in oid[2:]:
+        chunk = [item & 0x7F]
+        item >>= 7
+        while item:
+            chunk.append(0x80 | (item & 0x7F))
+            item >>= 7
+        payload.extend(reversed(chunk))
+    return encodeTlv(TAG_OBJECTID, bytes(payload))
+
+
+def encodeValue(snmpType, value):
+    """Encode value of given SNMP type name"""
+    tag = TYPES[snmpType]
+    if tag in [TAG_INTEGER] + UNSIGNED_TAGS:
+        return encodeInteger(value, tag)
+    if tag == TAG_OCTETSTR:
+        return encodeTlv(tag, value if isinstance(value, bytes) else str(value).encode('utf-8'))
+    if tag == TAG_OBJECTID:
+        return encodeOid(value)
+    if tag == TAG_IPADDR:
+        return encodeTlv(tag, bytes(int(item) for item in str(value).split('.')))
+    return encodeTlv(tag, b'')
+
+
+def decodeTlv(data, pos):
+    """Decode BER TLV at pos. Returns (tag, payload, next position)"""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        nbytes = length & 0x7F
+        length = int.from_bytes(data[pos:pos + nbytes], 'big')
+        pos += nbytes
+    if pos + length > len(data):
+        raise ValueError('BER length exceeds message size')
+    return tag, data[pos:pos + length], pos + length
+
+
+def decodeSequence(data):
+    """Decode all TLVs inside constructed payload"""
+    out, pos = [], 0
+    while pos < len(data):
+        tag, payload, pos = decodeTlv(data, pos)
+        out.append((tag, payload))
+    return out
+
+
+def decodeInteger(payload, tag=TAG_INTEGER):
+    """Decode BER INTEGER payload"""
+    return int.from_bytes(payload, 'big', signed=tag not in UNSIGNED_TAGS)
+
+
+def decodeOid(payload):
+    """Decode BER OBJECT IDENTIFIER payload to tuple"""
+    if not payload:
+        return ()
+    out = [payload[0] // 40, payload[0] % 40]
+    item = 0
+    for byte in payload[1:]:
+        item = (item << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            out.append(item)
+            item = 0
+    return tuple(out)
+
+
+def decodeValue(tag, payload):
+    """Decode varbind value to (SNMP type name, python value)"""
+    name = TAGNAMES.get(tag, 'OCTETSTR')
+    if tag in [TAG_INTEGER] + UNSIGNED_TAGS:
+        return name, decodeInteger(payload, tag)
+    if tag == TAG_OBJECTID:
+        return name, oidToStr(decodeOid(payload))
+    if tag == TAG_IPADDR:
+        return name, '.'.join(str(item) for item in payload)
+    if tag == TAG_OCTETSTR:
+        return name, payload.decode('utf-8', errors='replace')
+    return name, None
+
+
+def encodeMessage(version, community, pduType, requestId, errStatus, errIndex, varbinds):
+    """Encode SNMP message. varbinds - list of (oid, SNMP type name, value)"""
+    vbl = b''.join(encodeTlv(TAG_SEQUENCE, encodeOid(oid) + encodeValue(snmpType, value))
+                   for oid, snmpType, value in varbinds)
+    pdu = encodeInteger(requestId) + encodeInteger(errStatus) + encodeInteger(errIndex) + \
+        encodeTlv(TAG_SEQUENCE, vbl)
+    return encodeTlv(TAG_SEQUENCE, encodeInteger(version) + encodeValue('OCTETSTR', community) +
+                     encodeTlv(pduType, pdu))
+
+
+def decodeMessage(data):
+    """Decode SNMP message. Returns dict with version, community, pduType, requestId,
+    errStatus (non-repeaters for GETBULK), errIndex (max-repetitions for GETBULK) and
+    varbinds - list of (oid tuple, SNMP type name, value)"""
+    tag, payload, _ = decodeTlv(data, 0)
+    if tag != TAG_SEQUENCE:
+        raise ValueError('SNMP message is not a SEQUENCE')
+    items = decodeSequence(payload)
+    if len(items) != 3:
+        raise ValueError('SNMP message must have version, community and PDU')
+    pduType, pduPayload = items[2]
+    pdu = decodeSequence(pduPayload)
+    varbinds = []
+    for _, vbPayload in decodeSequence(pdu[3][1]):
+        (_, oidPayload), (valTag, valPayload) = decodeSequence(vbPayload)
+        varbinds.append((decodeOid(oidPayload),) + decodeValue(valTag, valPayload))
+    return {'version': decodeInteger(items[0][1]), 'community': items[1][1].decode('utf-8', errors='replace'),
+            'pduType': pduType, 'requestId': decodeInteger(pdu[0][1]), 'errStatus': decodeInteger(pdu[1][1]),
+            'errIndex': decodeInteger(pdu[2][1]), 'varbinds': varbinds}
+
+
+class MibTree():
+    """Sorted OID tree. Values can be constants or callables (evaluated on each request)"""
+    def __init__(self):
+        self.values = {}
+        self.oids = []
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.values)
+
+    def set(self, oid, snmpType, value):
+        """Set OID value"""
+        oid = oidToTuple(oid) if isinstance(oid, str) else tuple(oid)
+        if oid not in self.values:
+            self.dirty = True
+        self.values[oid] = (snmpType, value)
+
+    def _sorted(self):
+        """Sorted OID list (rebuilt only after new OIDs were added)"""
+        if self.dirty:
+            self.oids = sorted(self.values)
+            self.dirty = False
+        return self.oids
+
+    def _value(self, oid):
+        """Get (type, value) of existing OID"""
+        snmpType, value = self.values[oid]
+        return snmpType, value() if callable(value) else value
+
+    def get(self, oid):
+        """GET. Returns (oid, type, value), NOSUCHINSTANCE/NOSUCHOBJECT if not present"""
+        if oid in self.values:
+            return (oid,) + self._value(oid)
+        oids = self._sorted()
+        pos = bisect_right(oids, oid[:-1])
+        if pos < len(oids) and len(oids[pos]) == len(oid) and oids[pos][:-1] == oid[:-1]:
+            return oid, 'NOSUCHINSTANCE', None
+        return oid, 'NOSUCHOBJECT', None
+
+    def getNext(self, oid):
+        """GETNEXT. Returns (oid, type, value) of the next OID, ENDOFMIBVIEW at the end"""
+        oids = self._sorted()
+        pos = bisect_right(oids, oid)
+        if pos >= len(oids):
+            return oid, 'ENDOFMIBVIEW', None
+        return (oids[pos],) + self._value(oids[pos])
+
+
+def buildMib(interfaces=48, vlans=10, macsPerVlan=20, sonic=False, startTime=None):
+    """Build synthetic device: system, IF-MIB (ifTable/ifXTable), ENTITY-MIB
+    (entPhysicalName for SONiC ifDescr override) and Q-BRIDGE-MIB FDB tables.
+    Counters increase with time (per ifIndex rate), so rates can be computed"""
+    mib = MibTree()
+    startTime = time.time() if startTime is None else startTime
+
+    def counter(base, rate, wrap):
+        return lambda: (base + int(rate * (time.time() - startTime))) % wrap
+
+    mib.set(OIDS['sysDescr'] + '.0', 'OCTETSTR', 'SNMPMon simulator' + (' SONiC' if sonic else ''))
+    mib.set(OIDS['sysUpTime'] + '.0', 'TICKS', lambda: int((time.time() - startTime) * 100))
+    mib.set(OIDS['sysName'] + '.0', 'OCTETSTR', 'snmpmon-simulator')
+    mib.set(OIDS['ifNumber'] + '.0', 'INTEGER', interfaces)
+    mib.set(OIDS['ifTableLastChange'] + '.0', 'TICKS', 0)
+    mib.set(OIDS['entLastChangeTime'] + '.0', 'TICKS', 0)
+    for idx in range(1, interfaces + 1):
+        name = f'Ethernet{(idx - 1) * 4}'
+        row = {'ifIndex': ('INTEGER', idx), 'ifDescr': ('OCTETSTR', f'etp{idx}' if sonic else name),
+               'ifType': ('INTEGER', 6), 'ifMtu': ('INTEGER', 9100), 'ifSpeed': ('GAUGE', 4294967295),
+               'ifAdminStatus': ('INTEGER', 1), 'ifOperStatus': ('INTEGER', 1 if idx % 10 else 2),
+               'ifLastChange': ('TICKS', 0), 'ifName': ('OCTETSTR', name),
+               'ifHighSpeed': ('GAUGE', 100000), 'ifAlias': ('OCTETSTR', f'Port {idx}')}
+        for key, (snmpType, value) in row.items():
+            mib.set(f'{OIDS[key]}.{idx}', snmpType, value)
+        for key, snmpType, rate in COUNTERS:
+            wrap = 2**64 if snmpType == 'COUNTER64' else 2**32
+            mib.set(f'{OIDS[key]}.{idx}', snmpType, counter(idx * 1000000, rate * idx, wrap))
+        if sonic:
+            mib.set(f"{OIDS['entPhysicalName']}.{1000000000 + idx * 100}", 'OCTETSTR', name)
+    for vlan in range(1, vlans + 1):
+        vlanId = 100 + vlan
+        mib.set(f"{OIDS['dot1qFdbDynamicCount']}.{vlanId}", 'COUNTER', macsPerVlan)
+        for macn in range(macsPerVlan):
+            mac = '.'.join(str(item) for item in (2, 0, vlan >> 8, vlan & 0xFF, macn >> 8, macn & 0xFF))
+            port = (macn % max(1, interfaces)) + 1
+            mib.set(f"{OIDS['dot1qTpFdbPort']}.{vlanId}.{mac}", 'INTEGER', port)
+            mib.set(f"{OIDS['dot1qTpFdbStatus']}.{vlanId}.{mac}", 'INTEGER', 3)
+    return mib
+
+
+# snmpwalk -On output: .1.3.6.1.2.1.1.5.0 = STRING: "name"
+WALK_LINE = re.compile(r'^\.?([0-9.]+)\s*=\s*(?:([A-Za-z0-9-]+):\s*)?(.*)$')
+WALK_TYPES = {'STRING': 'OCTETSTR', 'Hex-STRING': 'OCTETSTR', 'INTEGER': 'INTEGER', 'Counter32': 'COUNTER',
+              'Counter64': 'COUNTER64', 'Gauge32': 'GAUGE', 'Timeticks': 'TICKS', 'OID': 'OBJECTID',
+              'IpAddress': 'IPADDR', 'Network Address': 'IPADDR'}
+
+
+def loadWalk(fname):
+    """Load recorded device from `snmpwalk -On -v2c -c <community> <device> .1` output"""
+    mib = MibTree()
+    with open(fname, 'r', encoding='utf-8', errors='replace') as fd:
+        for line in fd:
+            match = WALK_LINE.match(line.strip())
+            if not match:
+                continue
+            oid, walkType, value = match.groups()
+            snmpType = WALK_TYPES.get(walkType or 'STRING', 'OCTETSTR')
+            if walkType == 'Hex-STRING':
+                value = bytes(int(item, 16) for item in value.split())
+            elif walkType == 'Timeticks':
+                value = int(value.split(')')[0].strip('(')) if value.startswith('(') else int(value)
+            elif snmpType in ['INTEGER', 'COUNTER', 'COUNTER64', 'GAUGE']:
+                # INTEGER: up(1) -> 1
+                value = int(re.findall(r'-?\d+', value)[-1])
+            elif snmpType == 'OBJECTID':
+                value = value.strip('.')
+            else:
+                value = value.strip('"')
+            mib.set(oid, snmpType, value)
+    return mib
+
+
+class SNMPAgent():
+    """SNMPv1/v2c agent serving MibTree over UDP.
+    latency - seconds to wait before each response; loss - probability to drop request"""
+    def __init__(self, mib, host='127.0.0.1', port=1161, **kwargs):
+        self.mib = mib
+        self.community = kwargs.get('community', 'public')
+        self.latency = float(kwargs.get('latency', 0.0))
+        self.loss = float(kwargs.get('loss', 0.0))
+        self.random = random.Random(kwargs.get('seed', None))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, int(port)))
+        self.address = self.sock.getsockname()
+        self.thread = None
+        self.running = False
+        self.stats = {'requests': 0, 'responses': 0, 'dropped': 0, 'varbinds': 0, 'errors': 0}
+
+    def _bulk(self, varbinds, nonRepeaters, maxRepetitions):
+        """GETBULK response varbinds"""
+        out = [self.mib.getNext(oid) for oid, _, _ in varbinds[:nonRepeaters]]
+        current = [oid for oid, _, _ in varbinds[nonRepeaters:]]
+        size = 0
+        for _ in range(max(0, maxRepetitions) if current else 0):
+            row = [self.mib.getNext(oid) for oid in current]
+            size += sum(len(oid) + 16 for oid, _, _ in row)
+            if out and size > MAX_RESPONSE_SIZE:
+                break
+            out.extend(row)
+            current = [oid for oid, _, _ in row]
+            if all(snmpType == 'ENDOFMIBVIEW' for _, snmpType, _ in row):
+                break
+        return out
+
+    def handle(self, data):
+        """Handle single request. Returns response bytes or None (invalid request)"""
+        try:
+            msg = decodeMessage(data)
+        except (ValueError, IndexError):
+            self.stats['errors'] += 1
+            return None
+        if msg['community'] != self.community or msg['version'] not in [0, 1]:
+            self.stats['errors'] += 1
+            return None
+        errStatus, errIndex = 0, 0
+        if msg['pduType'] == PDU_GET:
+            out = [self.mib.get(oid) for oid, _, _ in msg['varbinds']]
+        elif msg['pduType'] == PDU_GETNEXT:
+            out = [self.mib.getNext(oid) for oid, _, _ in msg['varbinds']]
+        elif msg['pduType'] == PDU_GETBULK and msg['version'] == 1:
+            out = self._bulk(msg['varbinds'], msg['errStatus'], msg['errIndex'])
+        else:
+            # SET (and GETBULK on SNMPv1) - readOnly/genErr
+            out = [(oid, snmpType, value) for oid, snmpType, value in msg['varbinds']]
+            errStatus, errIndex = (4 if msg['pduType'] == PDU_SET else 5), 1
+        if msg['version'] == 0:
+            # SNMPv1 has no exception values - report noSuchName
+            for pos, (_, snmpType, _) in enumerate(out):
+                if snmpType in ['NOSUCHOBJECT', 'NOSUCHINSTANCE', 'ENDOFMIBVIEW']:
+                    out = [(oid, snmpType, value) for oid, snmpType, value in msg['varbinds']]
+                    errStatus, errIndex = 2, pos + 1
+                    break
+        self.stats['varbinds'] += len(out)
+        return encodeMessage(msg['version'], msg['community'], PDU_RESPONSE, msg['requestId'],
+                             errStatus, errIndex, out)
+
+    def serve(self):
+        """Serve requests until stop is called"""
+        self.running = True
+        self.sock.settimeout(0.5)
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.stats['requests'] += 1
+            if self.loss and self.random.random() < self.loss:
+                self.stats['dropped'] += 1
+                continue
+            response = self.handle(data)
+            if response is None:
+                continue
+            if self.latency:
+                time.sleep(self.latency)
+            self.sock.sendto(response, addr)
+            self.stats['responses'] += 1
+
+    def start(self):
+        """Start serving in background thread"""
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self.address
+
+    def stop(self):
+        """Stop serving and close socket"""
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+
+def getParser():
+    """Returns the argparse parser."""
+    oparser = argparse.ArgumentParser(description='SNMPMon local SNMP agent simulator', add_help=True)
+    oparser.add_argument('--host', default='127.0.0.1', help='Listen address. Default 127.0.0.1')
+    oparser.add_argument('--port', type=int, default=1161, help='Listen port (0 - any free port). Default 1161')
+    oparser.add_argument('--community', default='public', help='SNMP community. Default public')
+    oparser.add_argument('--interfaces', type=int, default=48, help='Number of interfaces. Default 48')
+    oparser.add_argument('--vlans', type=int, default=10, help='Number of vlans in FDB table. Default 10')
+    oparser.add_argument('--macs', type=int, default=20, help='Number of MACs per vlan. Default 20')
+    oparser.add_argument('--sonic', action='store_true', help='Serve SONiC entPhysicalName interface names')
+    oparser.add_argument('--walkfile', default='', help='Serve recorded `snmpwalk -On` output instead of synthetic device')
+    oparser.add_argument('--latency', type=float, default=0.0, help='Response latency in seconds. Default 0')
+    oparser.add_argument('--loss', type=float, default=0.0, help='Request loss probability (0-1). Default 0')
+    oparser.add_argument('--seed', type=int, default=None, help='Random seed for loss')
+    return oparser
+
+
+def execute(args):
+    """Main Execute."""
+    inargs = getParser().parse_args(args)
+    if inargs.walkfile:
+        mib = loadWalk(inargs.walkfile)
+    else:
+        mib = buildMib(inargs.interfaces, inargs.vlans, inargs.macs, inargs.sonic)
+    agent = SNMPAgent(mib, inargs.host, inargs.port, community=inargs.community,
+                      latency=inargs.latency, loss=inargs.loss, seed=inargs.seed)
+    print(f'Listening on {agent.address[0]}:{agent.address[1]} with {len(mib)} OIDs', flush=True)
+    try:
+        agent.serve()
+    except KeyboardInterrupt:
+        pass
+    agent.stop()
+
+
+if __name__ == '__main__':
+    execute(sys.argv[1:])
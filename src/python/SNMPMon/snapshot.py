@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+    Binary snapshot format for SNMP Monitoring outputs (per device and merged).
+    File layout (all integers little-endian):
+        header:   magic (8 bytes), version (u16), flags (u16), number of sections (u32)
+        index:    per section - name length (u16), name (utf-8), offset (u64), length (u64)
+        sections: per top level key - string table (count u32, per string: length u32 + utf-8)
+                  followed by encoded value.
+    Usage (print snapshot as JSON for debugging):
+        python3 -m SNMPMon.snapshot /opt/snmpmon/output/snmp-multiworker-latest.snap [section]
+    Each section has its own string table, so a single device can be loaded without
+    reading the rest of the file. Tables (dict of dicts with scalar values, like
+    out[ifIndex][key]) are stored as packed columns with a presence map.
+"""
+import os
+import sys
+import json
+import mmap
+import hashlib
+import shutil
+import struct
+from array import array
+from itertools import compress
+
+MAGIC = b'SNMPSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+INDEXENTRY = struct.Struct('<QQ')
+U16 = struct.Struct('<H')
+U32 = struct.Struct('<I')
+I64 = struct.Struct('<q')
+U64 = struct.Struct('<Q')
+F64 = struct.Struct('<d')
+
+# Value tags
+TAG_NONE = b'N'
+TAG_TRUE = b'T'
+TAG_FALSE = b'F'
+TAG_INT = b'i'
+TAG_UINT = b'u'
+TAG_BIGINT = b'b'
+TAG_FLOAT = b'd'
+TAG_STR = b's'
+TAG_MAP = b'm'
+TAG_LIST = b'l'
+TAG_TABLE = b't'
+# Table column types: packed array typecode, 'o' - generic encoded values
+COLUMN_TYPES = {'q': 'q', 'Q': 'Q', 'd': 'd', 's': 'I'}
+
+
+def _toBytes(arr):
+    """Array to little-endian bytes"""
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _fromBytes(typecode, data):
+    """Little-endian bytes to array"""
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+def isSnapshot(filename):
+    """Check if file is a binary snapshot (by magic)"""
+    try:
+        with open(filename, 'rb') as fd:
+            return fd.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SectionEncoder():
+    """Encodes single section value with its own string table"""
+    def __init__(self):
+        self.strings = {}
+        self.out = bytearray()
+
+    def strId(self, value):
+        """Get string id from string table (add if new)"""
+        sid = self.strings.get(value)
+        if sid is None:
+            sid = len(self.strings)
+            self.strings[value] = sid
+        return sid
+
+    @staticmethod
+    def _isTable(value):
+        """Dict of dicts with only scalar values (e.g. out[ifIndex][key])"""
+        if not value or not isinstance(value, dict):
+            return False
+        for row in value.values():
+            if not isinstance(row, dict):
+                return False
+            for val in row.values():
+                if isinstance(val, (dict, list, tuple)):
+                    return False
+        return True
+
+    @staticmethod
+    def _columnType(values):
+        """Packed column type for present values"""
+        if all(isinstance(val, str) for val in values):
+            return 's'
+        if all(isinstance(val, int) and not isinstance(val, bool) for val in values):
+            if all(-2**63 <= val < 2**63 for val in values):
+                return 'q'
+            if all(0 <= val < 2**64 for val in values):
+                return 'Q'
+        if all(isinstance(val, float) for val in values):
+            return 'd'
+        return 'o'
+
+    def _encodeTable(self, value):
+        """Encode table as packed columns"""
+        out = self.out
+        rows = list(value.keys())
+        columns = {}
+        for row in value.values():
+            for key in row:
+                columns.setdefault(key, None)
+        out += TAG_TABLE + U32.pack(len(rows))
+        out += _toBytes(array('I', [self.strId(str(row)) for row in rows]))
+        out += U32.pack(len(columns))
+        for key in columns:
+            presence = array('B', [1 if key in row else 0 for row in value.values()])
+            values = [row[key] for row in value.values() if key in row]
+            ctype = self._columnType(values)
+            out += U32.pack(self.strId(str(key))) + ctype.encode() + _toBytes(presence)
+            if ctype == 's':
+                out += _toBytes(array('I', [self.strId(val) for val in values]))
+            elif ctype in COLUMN_TYPES:
+                out += _toBytes(array(COLUMN_TYPES[ctype], values))
+            else:
+                for val in values:
+                    self.encode(val)
+
+    def encode(self, value):
+        """Encode value"""
+        out = self.out
+        if value is None:
+            out += TAG_NONE
+        elif value is True:
+            out += TAG_TRUE
+        elif value is False:
+            out += TAG_FALSE
+        elif isinstance(value, int):
+            if -2**63 <= value < 2**63:
+                out += TAG_INT + I64.pack(value)
+            elif 0 <= value < 2**64:
+                out += TAG_UINT + U64.pack(value)
+            else:
+                out += TAG_BIGINT + U32.pack(self.strId(str(value)))
+        elif isinstance(value, float):
+            out += TAG_FLOAT + F64.pack(value)
+        elif isinstance(value, str):
+            out += TAG_STR + U32.pack(self.strId(value))
+        elif self._isTable(value):
+            self._encodeTable(value)
+        elif isinstance(value, dict):
+            out += TAG_MAP + U32.pack(len(value))
+            for key, val in value.items():
+                out += U32.pack(self.strId(str(key)))
+                self.encode(val)
+        elif isinstance(value, (list, tuple, set)):
+            out += TAG_LIST + U32.pack(len(value))
+            for val in value:
+                self.encode(val)
+        else:
+            out += TAG_STR + U32.pack(self.strId(str(value)))
+
+    def dumps(self, value):
+        """Encoded section: string table and value"""
+        self.encode(value)
+        table = bytearray(U32.pack(len(self.strings)))
+        for string in self.strings:
+            data = string.encode('utf-8')
+            table += U32.pack(len(data)) + data
+        return bytes(table) + bytes(self.out)
+
+
+class SectionDecoder():
+    """Decodes single section"""
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+        count = self._unpack(U32)
+        for _ in range(count):
+            length = self._unpack(U32)
+            self.strings.append(str(data[self.pos:self.pos + length], 'utf-8'))
+            self.pos += length
+
+    def _unpack(self, fmt):
+        """Unpack single value and move position"""
+        val = fmt.unpack_from(self.data, self.pos)[0]
+        self.pos += fmt.size
+        return val
+
+    def _array(self, typecode, count):
+        """Read packed array of count items"""
+        size = array(typecode).itemsize * count
+        arr = _fromBytes(typecode, self.data[self.pos:self.pos + size])
+        self.pos += size
+        return arr
+
+    def _decodeTable(self):
+        """Decode packed columns table"""
+        strings = self.strings
+        nrows = self._unpack(U32)
+        rowKeys = list(map(strings.__getitem__, self._array('I', nrows)))
+        columns = []
+        for _ in range(self._unpack(U32)):
+            key = strings[self._unpack(U32)]
+            ctype = chr(self.data[self.pos])
+            self.pos += 1
+            presence = self._array('B', nrows)
+            count = sum(presence)
+            if ctype == 's':
+                values = list(map(strings.__getitem__, self._array('I', count)))
+            elif ctype in COLUMN_TYPES:
+                values = self._array(COLUMN_TYPES[ctype], count).tolist()
+            else:
+                values = [self.decode() for _ in range(count)]
+            columns.append((key, presence if count != nrows else None, values))
+        if all(presence is None for _, presence, _ in columns):
+            # All rows have all columns - build rows at once
+            keys = [key for key, _, _ in columns]
+            rows = [dict(zip(keys, vals)) for vals in zip(*[values for _, _, values in columns])]
+            return dict(zip(rowKeys, rows)) if columns else {key: {} for key in rowKeys}
+        rows = [{} for _ in range(nrows)]
+        for key, presence, values in columns:
+            for row, val in zip(rows if presence is None else compress(rows, presence), values):
+                row[key] = val
+        return dict(zip(rowKeys, rows))
+
+    def decode(self):
+        """Decode value at current position"""
+        tag = bytes(self.data[self.pos:self.pos + 1])
+        self.pos += 1
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_INT:
+            return self._unpack(I64)
+        if tag == TAG_UINT:
+            return self._unpack(U64)
+        if tag == TAG_BIGINT:
+            return int(self.strings[self._unpack(U32)])
+        if tag == TAG_FLOAT:
+            return self._unpack(F64)
+        if tag == TAG_STR:
+            return self.strings[self._unpack(U32)]
+        if tag == TAG_MAP:
+            out = {}
+            for _ in range(self._unpack(U32)):
+                key = self.strings[self._unpack(U32)]
+                out[key] = self.decode()
+            return out
+        if tag == TAG_LIST:
+            return [self.decode() for _ in range(self._unpack(U32))]
+        if tag == TAG_TABLE:
+            return self._decodeTable()
+        raise ValueError(f'Unknown snapshot value tag {tag} at position {self.pos - 1}')
+
+
+def dumps(content):
+    """Encode content (dict) to binary snapshot"""
+    sections = [(str(key), SectionEncoder().dumps(val)) for key, val in content.items()]
+    header = bytearray(HEADER.pack(MAGIC, VERSION, 0, len(sections)))
+    indexSize = sum(U16.size + len(name.encode('utf-8')) + INDEXENTRY.size for name, _ in sections)
+    offset = len(header) + indexSize
+    for name, data in sections:
+        encName = name.encode('utf-8')
+        header += U16.pack(len(encName)) + encName + INDEXENTRY.pack(offset, len(data))
+        offset += len(data)
+    return bytes(header) + b''.join(data for _, data in sections)
+
+
+def writeSnapshot(filename, content):
+    """Write binary snapshot (to tmp file and move, so readers never see partial file)"""
+    tmpoutFile = filename + '.tmp'
+    with open(tmpoutFile, 'wb') as fd:
+        fd.write(dumps(content))
+    shutil.move(tmpoutFile, filename)
+    return filename
+
+
+class SnapshotReader():
+    """Lazy snapshot reader. File is memory mapped and sections (top level keys, e.g. devices)
+    are decoded only when accessed. Behaves like a read-only dict"""
+    def __init__(self, filename=None, data=None):
+        self.mmap = None
+        if data is None:
+            with open(filename, 'rb') as fd:
+                size = os.fstat(fd.fileno()).st_size
+                # mmap keeps old content available even if file is replaced (moved over)
+                self.mmap = mmap.mmap(fd.fileno(), size, access=mmap.ACCESS_READ) if size else None
+            data = self.mmap if self.mmap is not None else b''
+        self.data = memoryview(data)
+        self.sections = {}
+        self.cache = {}
+        self._readIndex()
+
+    def _readIndex(self):
+        """Read header and section index"""
+        if len(self.data) < HEADER.size:
+            raise ValueError('Snapshot is too short')
+        magic, version, _flags, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a binary snapshot')
+        if version > VERSION:
+            raise ValueError(f'Snapshot version {version} is not supported (max {VERSION})')
+        pos = HEADER.size
+        for _ in range(count):
+            length = U16.unpack_from(self.data, pos)[0]
+            pos += U16.size
+            name = str(self.data[pos:pos + length], 'utf-8')
+            pos += length
+            self.sections[name] = INDEXENTRY.unpack_from(self.data, pos)
+            pos += INDEXENTRY.size
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __getitem__(self, name):
+        if name not in self.cache:
+            offset, length = self.sections[name]
+            self.cache[name] = SectionDecoder(self.data[offset:offset + length]).decode()
+        return self.cache[name]
+
+    def digest(self, name):
+        """Digest of raw (encoded) section - changes only if section content changed"""
+        offset, length = self.sections[name]
+        return hashlib.blake2b(self.data[offset:offset + length], digest_size=16).digest()
+
+    def keys(self):
+        """Section names"""
+        return self.sections.keys()
+
+    def get(self, name, default=None):
+        """Get decoded section or default"""
+        if name not in self.sections:
+            return default
+        return self[name]
+
+    def items(self):
+        """Decode sections one by one"""
+        for name in self.sections:
+            yield name, self[name]
+
+    def toDict(self):
+        """Decode all sections"""
+        return {name: self[name] for name in self.sections}
+
+    def close(self):
+        """Release memory map"""
+        self.data.release()
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+
+
+def loads(data):
+    """Decode binary snapshot bytes to dict"""
+    return SnapshotReader(data=data).toDict()
+
+
+def readSnapshot(filename):
+    """Read whole binary snapshot as dict"""
+    reader = SnapshotReader(filename)
+    try:
+        return reader.toDict()
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <snapshot file> [section]')
+        sys.exit(1)
+    READER = SnapshotReader(sys.argv[1])
+    print(json.dumps(READER[sys.argv[2]] if len(sys.argv) > 2 else READER.toDict(), indent=2))
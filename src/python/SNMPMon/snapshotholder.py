@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+    Process wide holder of latest MultiWorker output for WSGI Frontend threads.
+    Output is loaded once per generation and published with read-copy-update:
+    readers take a reference to current state without lock, a single updater
+    (under lock) loads new output into a new state and swaps the reference.
+    Old output is released once last reader drops its reference.
+    Shared snapshot store (if configured) is mapped once per process. Its access is
+    serialized (remap of a replaced store is not thread safe), so each generation is
+    copied out once under lock and published the same way; rendering runs without lock.
+"""
+import os
+import threading
+from SNMPMon.utilities import getFileContentAsJson
+from SNMPMon.utilities import getLatestFileName
+from SNMPMon.shmstore import ShmStoreReader
+from SNMPMon.snapshot import SnapshotReader
+
+
+class SnapshotHolder():
+    """Latest output (file) and shared store reader, shared by all threads of the process"""
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self.fName = getLatestFileName(config, 'multiworker')
+        self.store = ShmStoreReader(config['shmStore']) if config.get('shmStore') else None
+        self.lock = threading.Lock()
+        self.storeLock = threading.Lock()
+        # Published state: (output file identity, output). Replaced, never modified in place
+        self.state = (None, {})
+        # Published store state: (store identity, detached SnapshotReader)
+        self.storeState = (None, None)
+        self.stats = {'holder_loads': 0, 'holder_swaps': 0, 'holder_hits': 0, 'holder_load_errors': 0,
+                      'holder_store_copies': 0}
+
+    @staticmethod
+    def _fileKey(fName):
+        """File identity (inode, mtime, size). None if file does not exist"""
+        try:
+            stat = os.stat(fName)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def generation(self, host=None):
+        """Identity of latest output (store generation or output file identity) and
+        supervisor stats (only for all devices, host None)"""
+        key = None
+        if self.store:
+            with self.storeLock:
+                try:
+                    gen = self.store.generation()
+                    key = ('store', self.store.inode, gen) if gen else None
+                except OSError:
+                    key = None
+        if key is None:
+            key = ('file',) + (self._fileKey(self.fName) or (None,))
+        if not host:
+            key += self._fileKey(os.path.join(self.config['tmpdir'], 'supervisor-stats.json')) or ()
+        return key
+
+    def snapshot(self):
+        """Latest output from file. It is loaded again only if file changed (once per change for
+        all threads), otherwise (or if it can not be read) previous output is used."""
+        key = self._fileKey(self.fName)
+        # Read side - reference to published state, no lock
+        state = self.state
+        if key is None or key == state[0]:
+            self.stats['holder_hits'] += 1
+            return state[1]
+        with self.lock:
+            # Other thread could load it while we waited for the lock
+            state = self.state
+            if key == state[0]:
+                self.stats['holder_hits'] += 1
+                return state[1]
+            try:
+                # Binary snapshot is loaded lazily - only changed devices are decoded
+                out = getFileContentAsJson(self.fName, lazy=True)
+                self.stats['holder_loads'] += 1
+                if out:
+                    self.state = (key, out)
+                    self.stats['holder_swaps'] += 1
+            except Exception as ex:
+                self.stats['holder_load_errors'] += 1
+                self.logger.debug(f'Got Exception: {ex}')
+            return self.state[1]
+
+    def storeSnapshot(self):
+        """Latest store generation as a snapshot detached from the store (copied once per generation).
+        None if store is not available"""
+        with self.storeLock:
+            gen = self.store.generation()
+            if not gen:
+                return None
+            state = self.storeState
+            if state[0] == ('store', self.store.inode, gen):
+                self.stats['holder_hits'] += 1
+                return state[1]
+            # Consistent copy (read retries if writer reused the slot while copying)
+            gen, data = self.store.read(lambda reader: bytes(reader.data))
+            if not gen:
+                return None
+            self.storeState = (('store', self.store.inode, gen), SnapshotReader(data=data))
+            self.stats['holder_store_copies'] += 1
+            return self.storeState[1]
+
+    def withOutput(self, func):
+        """Call func(output) on latest output (shared store if available, output file otherwise).
+        func runs without holding any lock"""
+        output = None
+        if self.store:
+            try:
+                output = self.storeSnapshot()
+            except Exception as ex:
+                self.logger.debug(f'Got Exception reading shared snapshot store: {ex}')
+        if output is None:
+            output = self.snapshot()
+        return func(output)
+
+
+# Process wide holders (one per configuration and pid - not shared with forked children)
+_HOLDERS = {}
+_HOLDERS_LOCK = threading.Lock()
+
+
+def getSnapshotHolder(config, logger):
+    """Get process wide snapshot holder for config"""
+    key = (os.getpid(), config['tmpdir'], config.get('shmStore'))
+    with _HOLDERS_LOCK:
+        if key not in _HOLDERS:
+            _HOLDERS[key] = SnapshotHolder(config, logger)
+        return _HOLDERS[key]
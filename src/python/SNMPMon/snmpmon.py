@@ -9,49 +9,95 @@ Authors:
 
 Date: 2022/11/21
 """
-import os
 import sys
-from easysnmp import Session
+import time
 from easysnmp.exceptions import EasySNMPUnknownObjectIDError
 from easysnmp.exceptions import EasySNMPTimeoutError
+from SNMPMon.collector import SNMPCollector, STATIC_KEYS, DYNAMIC_KEYS, DISCOVERY_KEYS
+from SNMPMon.iftable import InterfaceTable
+from SNMPMon.filterrules import FilterRules
+from SNMPMon.counterrates import CounterRates
+from SNMPMon.sessionpool import SessionPool
+from SNMPMon.resilience import Deadline, DeadlineExceeded, CircuitBreaker
 from SNMPMon.utilities import getConfig
 from SNMPMon.utilities import getTimeRotLogger
-from SNMPMon.utilities import dumpFileContentAsJson
+from SNMPMon.utilities import dumpFileContent
 from SNMPMon.utilities import getUTCnow
-from SNMPMon.utilities import keyMacMappings, overrideMacMappings
+from SNMPMon.utilities import keyMacMappings, overrideMacMappings, fdbCountMappings
 from SNMPMon.utilities import moveFile
+from SNMPMon.utilities import getLatestFileName
 
 
 class Overrides():
-    """Overrides Class"""
+    """Overrides Class. Overrides are registered in self.overrides (name is used in customOverride config):
+    oids - function(ifIndexes) which returns {oid: ifIndex} of values override needs (fetched with GET);
+    marker - scalar OID. Cached values are refreshed only if marker value changed or TTL (metadataTTL) passed.
+             If None, values are fetched every cycle;
+    apply - function(out, values) which applies values ({ifIndex: value}) on output."""
     def __init__(self):
-        pass
-
-    def _ifDescrSonic(self, session, out):
-        """Override ifDescr for SONiC"""
-        oids = {}
-        for key in out.keys():
-            val = 1000000000 + (int(key)*100)
-            oids["mib-2.47.1.1.1.1.7." + str(val)] = key
-
-        newNames = session.walk('1.3.6.1.2.1.47.1.1.1.1.7.')
-        for item in newNames:
-            if item.oid in oids:
-                out[oids[item.oid]].setdefault('ifAlias', '')
-                out[oids[item.oid]].setdefault('ifDescr', '')
-                tmpVal = out[oids[item.oid]]['ifDescr']
-                out[oids[item.oid]]['ifDescr'] = item.value
-                out[oids[item.oid]]['ifAlias'] += tmpVal
-        return out
+        # entLastChangeTime changes when entity (ports/optics) table changes
+        self.overrides = {'ifDescrSonic': {'oids': self._ifDescrSonicOids, 'marker': '1.3.6.1.2.1.47.1.4.1.0',
+                                           'apply': self._ifDescrSonic}}
+        self.overrideCache = {}
+
+    @staticmethod
+    def _ifDescrSonicOids(indexes):
+        """SONiC entPhysicalName OIDs (entPhysicalIndex = 1000000000 + ifIndex * 100)"""
+        return {f"1.3.6.1.2.1.47.1.1.1.1.7.{1000000000 + (int(indx) * 100)}": indx for indx in indexes}
 
-    def callOverrides(self, session, out):
-        """Check if override param defined. So far only special case for SONiC"""
-        # check if customOverride is defined and call based on name
-        if 'customOverride' in self.config['snmpMon'][self.hostname]:
-            if self.config['snmpMon'][self.hostname]['customOverride'] == 'ifDescrSonic':
-                return self._ifDescrSonic(session, out)
+    @staticmethod
+    def _ifDescrSonic(out, values):
+        """Override ifDescr for SONiC (etp1 -> Ethernet0). Original ifDescr is appended to ifAlias"""
+        for indx, value in values.items():
+            if indx not in out or value is None:
+                continue
+            out[indx].setdefault('ifAlias', '')
+            out[indx].setdefault('ifDescr', '')
+            tmpVal = out[indx]['ifDescr']
+            out[indx]['ifDescr'] = value
+            out[indx]['ifAlias'] += tmpVal
         return out
 
+    def _getOverrideValues(self, name, override, collector, out, err):
+        """Get override values from cache. Fetch only values which are not cached,
+        all of them if marker changed or TTL passed"""
+        cache = self.overrideCache.setdefault(name, {'marker': None, 'runtime': 0, 'values': {}})
+        errCount = len(err)
+        marker = None
+        if override['marker']:
+            marker = collector.getScalars([override['marker']], err)[override['marker']]
+            if len(err) > errCount:
+                # Marker request failed - keep using cached values
+                return cache['values']
+        ttl = int(self.config['snmpMon'][self.hostname].get('metadataTTL', 3600))
+        if not override['marker'] or marker != cache['marker'] or getUTCnow() - cache['runtime'] >= ttl:
+            if cache['values']:
+                self.logger.info(f'Override {name} marker changed ({cache["marker"]} -> {marker}) or TTL passed. Refresh values')
+            cache.update({'marker': marker, 'runtime': getUTCnow(), 'values': {}})
+        missing = [indx for indx in out if indx not in cache['values']]
+        if missing:
+            oids = override['oids'](missing)
+            values = collector.getScalars(list(oids.keys()), err)
+            if len(err) > errCount:
+                # Do not cache partial results
+                return {oids[oid]: val for oid, val in values.items()}
+            for oid, indx in oids.items():
+                # Not present values are cached as None, so they are not requested again
+                cache['values'][indx] = values.get(oid)
+        collector.stats['override_refresh'] = len(missing)
+        return cache['values']
+
+    def callOverrides(self, collector, out, err):
+        """Check if override param defined and call it based on name"""
+        name = self.config['snmpMon'][self.hostname].get('customOverride')
+        if not name:
+            return out
+        if name not in self.overrides:
+            self.logger.warning(f'customOverride {name} is not supported. Supported: {list(self.overrides.keys())}')
+            return out
+        override = self.overrides[name]
+        return override['apply'](out, self._getOverrideValues(name, override, collector, out, err))
+
 
 class SNMPMonitoring(Overrides):
     """SNMP Monitoring Class"""
@@ -60,6 +106,23 @@ class SNMPMonitoring(Overrides):
         self.config = config
         self.logger = self._getCustomLogger(hostname)
         self.hostname = hostname
+        self.filterRules = FilterRules((self.config.get('filterRules') or {}).get(hostname, {}), self.logger)
+        # Discovery state. After discovery walk, only included ifIndexes are polled
+        self.discovery = {'runtime': 0, 'markers': {}, 'indexes': [], 'columns': []}
+        # MAC scan state (vlans table, per vlan FDB counts and diff from previous scan)
+        self.macState = {'runtime': 0, 'fullruntime': 0, 'counts': {}, 'vlans': {}, 'diff': {'added': {}, 'removed': {}}}
+        # Interface metadata cache (STATIC_KEYS). Refreshed on TTL, ifLastChange change or sysUpTime reset
+        self.metadata = {'runtime': 0, 'sysUpTime': None, 'interfaces': {}, 'lastChange': {}}
+        # Previous counter samples for rate computation and time/sysUpTime of the last sample
+        self.rates = CounterRates()
+        self.lastSample = {'time': 0.0, 'sysUpTime': None}
+        # SNMP Session kept alive between cycles (created on first startwork)
+        self.sessionPool = None
+        # Polling interval (used by Daemon scheduler) and schedule statistics (set by Daemon)
+        self.runInterval = self.config['snmpMon'].get(hostname, {}).get('runInterval', None)
+        self.scheduleStats = {}
+        # Circuit breaker - stops polling dead device and probes it with exponential backoff
+        self.breaker = CircuitBreaker(self.logger, **self.config['snmpMon'].get(hostname, {}).get('breakerParams', {}))
 
     def _getCustomLogger(self, scanfile):
         """Get Custom Logger"""
@@ -70,82 +133,221 @@ class SNMPMonitoring(Overrides):
         self.config['logParams']['service'] = f'SNMP-{scanfile}'
         return getTimeRotLogger(**self.config['logParams'])
 
-    def _writeOutFile(self, out):
-        return dumpFileContentAsJson(self.config, self.hostname, out)
-
-    def __includeFilter(self, val):
-        """
-        # Filter rules inside configuration file
-        filterRules:
-          dellos9_s0:
-            operator: 'and'
-            filters:
-              - Key: 'ifAdminStatus'
-                Val: 'up'
-                Startswith: False (default is False - if True - will use py startswith call)
-                Replacement: '<new_value>' (optional - if defined will replace value with new_value)
-              - Key: ifDescr
-                Val: ["hundredGigE 1/21", "Vlan 100"]
-        where val is dictionary and has:
-        {'ifDescr': 'Vlan 100',
-         'ifType': '135',
-          'ifAlias': 'Kubernetes Multus for SENSE',
-          'hostname': 'dellos9_s0',
-          'Key': 'ifHCInBroadcastPkts'}
-        """
-        retVal = True
-        if 'filterRules' not in self.config:
-            return retVal, val
-        if self.hostname not in self.config['filterRules']:
-            return retVal, val
-        filterChecks = []
-        for filterItem in self.config['filterRules'][self.hostname].get('filters', []):
-            filterKey = filterItem.get('Key', '')
-            filterVal = filterItem.get('Val', '')
-            filterStarts = filterItem.get('Startswith', False)
-            filterReplace = filterItem.get('Replacement', '')
-            if not filterKey or not filterVal:
-                # That is wrong filter. We raise error and continue to include it
-                self.logger.warning('Filter rule missing either Key or Val defined. Will not check based on this Key/Val')
-                filterChecks.append(True)
-                continue
-            if isinstance(filterVal, str):
-                if not filterStarts and filterKey in val and val[filterKey] == filterVal:
-                    filterChecks.append(True)
-                    val[filterKey] = filterReplace if filterReplace else val[filterKey]
-                elif filterStarts and filterKey in val and val[filterKey].startswith(filterVal):
-                    filterChecks.append(True)
-                    val[filterKey] = val[filterKey].replace(filterVal, filterReplace) if filterReplace else val[filterKey]
-                else:
-                    filterChecks.append(False)
-            elif isinstance(filterVal, list):
-                if val in filterVal:
-                    filterChecks.append(True)
-                else:
-                    filterChecks.append(False)
-        if not filterChecks:
-            retVal = True
-        elif self.config['filterRules'][self.hostname]['operator'] == 'and' and all(filterChecks):
-            retVal = True
-        elif self.config['filterRules'][self.hostname]['operator'] == 'or' and any(filterChecks):
-            retVal = True
+    def _getBulkParams(self):
+        """Get GETBULK parameters. SNMPv1 does not support GETBULK"""
+        bulkParams = dict(self.config['snmpMon'][self.hostname].get('bulkParams', {}))
+        if str(self.config['snmpMon'][self.hostname]['snmpParams'].get('version', 2)) == '1':
+            bulkParams['useBulk'] = False
+        return bulkParams
+
+    def _needDiscovery(self, markers):
+        """Check if full walk (discovery) is needed. It is needed if:
+        targeted polling disabled (rediscoverInterval 0), no discovery done yet,
+        rediscoverInterval passed or ifNumber/ifTableLastChange changed."""
+        interval = int(self.config['snmpMon'][self.hostname].get('rediscoverInterval', 3600))
+        if interval <= 0 or not self.discovery['runtime']:
+            return True
+        if getUTCnow() - self.discovery['runtime'] >= interval:
+            self.logger.info('Rediscover interval passed. Will do full walk of all interfaces')
+            return True
+        # sysUpTime changes on every poll (device restart is handled by _checkMetadata)
+        for key in ['ifNumber.0', 'ifTableLastChange.0']:
+            val = markers.get(key)
+            if val is not None and self.discovery['markers'].get(key) is not None \
+                    and val != self.discovery['markers'][key]:
+                self.logger.info(f'{key} changed ({self.discovery["markers"][key]} -> {val}). Will do full walk')
+                return True
+        return False
+
+    def _checkMetadata(self, markers):
+        """Invalidate metadata cache if TTL passed or device restarted (sysUpTime went back)"""
+        ttl = int(self.config['snmpMon'][self.hostname].get('metadataTTL', 3600))
+        uptime = markers.get('sysUpTime.0')
+        if uptime is not None and self.metadata['sysUpTime'] is not None \
+                and int(uptime) < int(self.metadata['sysUpTime']):
+            self.logger.info('sysUpTime went back. Device restarted, invalidate interface metadata and discovery')
+            self.metadata['runtime'] = 0
+            self.discovery['runtime'] = 0
+        elif self.metadata['runtime'] and getUTCnow() - self.metadata['runtime'] >= ttl:
+            self.logger.info('Interface metadata TTL passed. Will refresh it')
+            self.metadata['runtime'] = 0
+        self.metadata['sysUpTime'] = uptime
+        return not self.metadata['runtime']
+
+    def _updateMetadata(self, collector, out, fullRefresh, err):
+        """Update interface metadata cache from collected output"""
+        if fullRefresh:
+            self.metadata['interfaces'] = {}
+            self.metadata['lastChange'] = {}
+            refresh = []
+            collected = out
         else:
-            retVal = False
-        return retVal, val
+            # Refresh metadata only for new interfaces or interfaces which ifLastChange changed
+            refresh = [indx for indx, vals in out.items() if indx not in self.metadata['interfaces'] or
+                       vals.get('ifLastChange') != self.metadata['lastChange'].get(indx)]
+            collected = {}
+            if refresh:
+                self.logger.info(f'Refresh metadata for {len(refresh)} interfaces')
+                collected = collector.getColumns(STATIC_KEYS, refresh, err)
+                for indx, vals in collected.items():
+                    out.setdefault(indx, {}).update(vals)
+        skip = set()
+        if collector.stats['deadline_exceeded']:
+            # Requests go row by row, so rows after the last collected one are missing and the last one
+            # can be cut. Their metadata is not cached (refreshed next cycle)
+            skip = set(refresh) - set(collected)
+            skip.add(next(reversed(collected), None))
+        for indx, vals in out.items():
+            if (fullRefresh or indx in refresh) and indx not in skip:
+                self.metadata['interfaces'][indx] = {key: vals[key] for key in STATIC_KEYS if key in vals}
+            self.metadata['lastChange'][indx] = vals.pop('ifLastChange', None)
+        if fullRefresh and self._isTrusted(err):
+            self.metadata['runtime'] = getUTCnow()
+        collector.stats['metadata_refresh'] = len(out) if fullRefresh else len(refresh)
 
-    def scanMacAddresses(self, session):
-        """Scan all MAC addresses"""
-        macs = {'vlans': {}}
-        mappings = keyMacMappings(self.config['snmpMon'][self.hostname].get('network_os', 'default'))
-        mappings = overrideMacMappings(self.config['snmpMon'][self.hostname].get('macoverride', {}), mappings)
-        allvals = session.walk(mappings['oid'])
+    def _mergeMetadata(self, out):
+        """Merge cached metadata with polled dynamic values. Returns InterfaceTable"""
+        table = InterfaceTable()
+        for indx, vals in out.items():
+            row = table.addRow(indx, self.metadata['interfaces'].get(indx, {}))
+            for key, val in vals.items():
+                row[key] = val
+        return table
+
+    @staticmethod
+    def _isUnreachable(collector, err):
+        """Device is unreachable if nothing was received and there were timeouts"""
+        return not collector.stats['varbinds'] and \
+            any(isinstance(ex, (EasySNMPTimeoutError, DeadlineExceeded)) for ex in err)
+
+    @staticmethod
+    def _isTrusted(err):
+        """Collected rows are trusted if there were no errors other than deadline
+        (deadline only leaves rows out, rows which were collected are complete)"""
+        return all(isinstance(ex, DeadlineExceeded) for ex in err)
+
+    def _getDeadline(self):
+        """Get deadline budget (seconds) for a single cycle. Default 0 - no deadline"""
+        return float(self.config['snmpMon'][self.hostname].get('deadline', 0))
+
+    def _collectInterfaces(self, collector, err):
+        """Collect interfaces. Full walk on discovery, otherwise GET only discovered ifIndexes.
+        Static (metadata) columns are fetched only if metadata cache is invalid."""
+        markers = collector.getScalars(['sysUpTime.0', 'ifNumber.0', 'ifTableLastChange.0'], err)
+        if self._isUnreachable(collector, err):
+            # First request timed out - do not waste time on all other requests
+            return {}, False
+        fullRefresh = self._checkMetadata(markers)
+        columns = DYNAMIC_KEYS + ['ifLastChange'] + (STATIC_KEYS if fullRefresh else [])
+        discovery = self._needDiscovery(markers)
+        startTime = time.time()
+        if discovery:
+            # Discovery walk is not limited by deadline (cut walk would be repeated on every cycle).
+            # Deadline budget starts after it
+            collector.deadline = Deadline(0)
+            out = collector.walkColumns(columns, err)
+            collector.deadline = Deadline(self._getDeadline())
+            self.discovery = {'runtime': 0, 'markers': markers, 'indexes': [],
+                              'columns': [key for key in columns if any(key in vals for vals in out.values())]}
+            if not fullRefresh:
+                # Forget metadata of interfaces which are gone
+                for indx in set(self.metadata['interfaces']) - set(out):
+                    self.metadata['interfaces'].pop(indx, None)
+                    self.metadata['lastChange'].pop(indx, None)
+        else:
+            columns = [key for key in columns if key in self.discovery['columns'] or key in STATIC_KEYS]
+            out = collector.getColumns(columns, self.discovery['indexes'], err)
+        # Counters are sampled between start and end of collection
+        self.lastSample = {'time': (startTime + time.time()) / 2, 'sysUpTime': markers.get('sysUpTime.0')}
+        collector.stats['discovery'] = int(discovery)
+        self._updateMetadata(collector, out, fullRefresh, err)
+        return self._mergeMetadata(out), discovery
+
+    def _addRates(self, out, discovery):
+        """Add per second rates (<key>Rate) for all counter keys"""
+        if self.rates.checkRestart(self.lastSample['sysUpTime']):
+            self.logger.info('sysUpTime went back. Device restarted, counter history reset')
+        if discovery:
+            self.rates.prune(out.keys())
+        for indx, vals in out.items():
+            for key, rate in self.rates.update(indx, self.lastSample['time'], vals).items():
+                vals[f'{key}Rate'] = rate
+        return out
+
+    def _writeOutFile(self, out):
+        return dumpFileContent(self.config, self.hostname, out)
+
+    @staticmethod
+    def _parseMacs(allvals, mappings):
+        """Parse FDB walk output to {vlan: [mac, ...]}"""
+        vlans = {}
         for item in allvals:
-            splt = item.oid[(len(mappings['mib'])):].split('.')
+            fullOid = f"{item.oid}.{item.oid_index}" if item.oid_index else item.oid
+            splt = fullOid[(len(mappings['mib'])):].split('.')
             vlan = splt.pop(0)
             mac = [format(int(x), '02x') for x in splt]
-            macs['vlans'].setdefault(vlan, [])
-            macs['vlans'][vlan].append(":".join(mac))
-        return macs
+            vlans.setdefault(vlan, [])
+            vlans[vlan].append(":".join(mac))
+        return vlans
+
+    @staticmethod
+    def _diffMacs(oldVlans, newVlans):
+        """Get added/removed MAC addresses per vlan between two scans"""
+        diff = {'added': {}, 'removed': {}}
+        for vlan in set(oldVlans) | set(newVlans):
+            oldMacs, newMacs = set(oldVlans.get(vlan, [])), set(newVlans.get(vlan, []))
+            if newMacs - oldMacs:
+                diff['added'][vlan] = sorted(newMacs - oldMacs)
+            if oldMacs - newMacs:
+                diff['removed'][vlan] = sorted(oldMacs - newMacs)
+        return diff
+
+    def _getFdbCounts(self, collector):
+        """Get number of FDB entries per vlan (dot1qFdbDynamicCount). Empty if not supported"""
+        mappings = fdbCountMappings()
+        counts = {}
+        for item in collector.walkSubtree(mappings['oid']):
+            fullOid = f"{item.oid}.{item.oid_index}" if item.oid_index else item.oid
+            counts[fullOid.split('.')[-1]] = item.value
+        return counts
+
+    def scanMacAddresses(self, collector, err):
+        """Scan MAC addresses. Runs on its own interval (macParams.interval) and
+        re-walks only vlans which FDB entry count changed (full walk every macParams.fullInterval)"""
+        macParams = self.config['snmpMon'][self.hostname].get('macParams', {})
+        now = getUTCnow()
+        if self.macState['runtime'] and now - self.macState['runtime'] < int(macParams.get('interval', 300)):
+            return self._macOutput()
+        mappings = keyMacMappings(self.config['snmpMon'][self.hostname].get('network_os', 'default'))
+        mappings = overrideMacMappings(self.config['snmpMon'][self.hostname].get('macoverride', {}), mappings)
+        try:
+            counts = self._getFdbCounts(collector)
+            fullScan = not counts or not self.macState['fullruntime'] or \
+                now - self.macState['fullruntime'] >= int(macParams.get('fullInterval', 3600))
+            if fullScan:
+                vlans = self._parseMacs(collector.walkSubtree(mappings['oid']), mappings)
+            else:
+                vlans = dict(self.macState['vlans'])
+                for vlan in set(counts) | set(self.macState['counts']):
+                    if counts.get(vlan) == self.macState['counts'].get(vlan):
+                        continue
+                    vlanMacs = self._parseMacs(collector.walkSubtree(f"{mappings['oid']}.{vlan}"), mappings)
+                    vlans.pop(vlan, None)
+                    vlans.update(vlanMacs)
+        except (EasySNMPUnknownObjectIDError, EasySNMPTimeoutError, DeadlineExceeded) as ex:
+            self.logger.warning(f'Got exception during MAC scan: {ex}. Will use previous MAC table')
+            err.append(ex)
+            return self._macOutput()
+        self.macState['diff'] = self._diffMacs(self.macState['vlans'], vlans)
+        self.macState.update({'runtime': now, 'counts': counts, 'vlans': vlans})
+        if fullScan:
+            self.macState['fullruntime'] = now
+        return self._macOutput()
+
+    def _macOutput(self):
+        """MAC output: full table, diff from previous scan and scan time"""
+        return {'vlans': self.macState['vlans'], 'diff': self.macState['diff'],
+                'scan_runtime': self.macState['runtime']}
 
     def startwork(self):
         """Scan all switches and get snmp data"""
@@ -157,45 +359,47 @@ class SNMPMonitoring(Overrides):
         if 'snmpParams' not in self.config['snmpMon'][self.hostname]:
             self.logger.info(f'Host: {self.hostname} config does not have snmpParams parameters.')
             return
-        try:
-            session = Session(**self.config['snmpMon'][self.hostname]['snmpParams'])
-        except ValueError:
-            conf = self.config['snmpMon'][self.hostname]['snmpParams']
-            hostname = conf.pop('hostname')
-            session = Session(**conf)
-            session.update_session(hostname=hostname)
-        out = {}
-        for key in ['ifDescr', 'ifType', 'ifMtu', 'ifAdminStatus', 'ifOperStatus',
-                    'ifHighSpeed', 'ifAlias', 'ifHCInOctets', 'ifHCOutOctets', 'ifInDiscards',
-                    'ifOutDiscards', 'ifInErrors', 'ifOutErrors', 'ifHCInUcastPkts',
-                    'ifHCOutUcastPkts', 'ifHCInMulticastPkts', 'ifHCOutMulticastPkts',
-                    'ifHCInBroadcastPkts', 'ifHCOutBroadcastPkts']:
-            try:
-                allvals = session.walk(key)
-                for item in allvals:
-                    indx = item.oid_index
-                    out.setdefault(indx, {})
-                    out[indx][key] = item.value.replace('\x00', '')
-            except EasySNMPUnknownObjectIDError as ex:
-                self.logger.warning(f'Got exception for key {key}: {ex}')
-                err.append(ex)
-                continue
-            except EasySNMPTimeoutError as ex:
-                self.logger.warning(f'Got SNMP Timeout Exception: {ex}')
-                err.append(ex)
-                continue
+        if not self.breaker.allow(getUTCnow()):
+            self.logger.info(f'Circuit breaker open until {self.breaker.openUntil}. Skip this cycle')
+            return
+        if self.sessionPool is None:
+            self.sessionPool = SessionPool(self.config['snmpMon'][self.hostname]['snmpParams'], self.logger,
+                                           **self.config['snmpMon'][self.hostname].get('sessionParams', {}))
+        # Probe with a single sysUpTime GET if device was not responding (breaker) or had timeouts
+        if self.breaker.state(getUTCnow()) == 'probe' or self.sessionPool.stats['timeout_streak']:
+            if self.sessionPool.healthCheck() is None:
+                self.breaker.recordFailure(getUTCnow())
+                raise Exception(f'SNMP health check (sysUpTime) failed for {self.hostname}. Skip this cycle')
+        session = self.sessionPool.getSession()
+        collector = SNMPCollector(session, self.logger, deadline=Deadline(self._getDeadline()), **self._getBulkParams())
+        out, discovery = self._collectInterfaces(collector, err)
+        if self._isUnreachable(collector, err):
+            self.breaker.recordFailure(getUTCnow())
+            self.sessionPool.reportCycle(err)
+            raise Exception(f'Device {self.hostname} is not reachable. Errors: {err}')
+        self.breaker.recordSuccess()
+        if discovery:
+            # Poll interfaces which pass rules on static keys. Rules on status keys
+            # (e.g. ifOperStatus) can change any cycle, so they are applied below on every cycle
+            candidates = self.filterRules.candidateIndexes(out, DISCOVERY_KEYS)
         # Filter items out
-        filteredOut = {}
-        for indx, vals in out.items():
-            inclFlag, vals = self.__includeFilter(vals)
-            if inclFlag:
-                filteredOut[indx] = vals
-        filteredOut = self.callOverrides(session, filteredOut)
-        jsonOut[self.hostname] = filteredOut
-        jsonOut['macs'] = self.scanMacAddresses(session)
+        filteredOut = self.filterRules.filterTable(out)
+        if discovery and self._isTrusted(err):
+            # Discovery is trusted only if walk had no errors, otherwise repeat it next cycle
+            self.discovery['runtime'] = getUTCnow()
+            self.discovery['indexes'] = [indx for indx in out.keys() if indx in candidates]
+        collector.stats['indexes'] = len(filteredOut)
+        filteredOut = self.callOverrides(collector, filteredOut, err)
+        jsonOut[self.hostname] = self._addRates(filteredOut, discovery).toDict()
+        jsonOut['snmp_sample_time'] = self.lastSample['time']
+        jsonOut['macs'] = self.scanMacAddresses(collector, err)
         jsonOut['snmp_scan_runtime'] = getUTCnow()
+        self.sessionPool.reportCycle(err)
+        jsonOut['snmp_scan_stats'] = dict(collector.stats, **self.sessionPool.stats, **self.breaker.stats,
+                                          **self.scheduleStats)
+        self.logger.info(f"SNMP scan used {collector.stats['pdus']} PDUs in {collector.stats['roundtrips']} round-trips")
         newFName = self._writeOutFile(jsonOut)
-        latestFName = os.path.join(self.config['tmpdir'], f'snmp-{self.hostname}-latest.json')
+        latestFName = getLatestFileName(self.config, self.hostname)
         moveFile(latestFName, newFName)
         if err:
             raise Exception(f'SNMP Monitoring Errors: {err}')
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+    In-process supervisor for MultiWorker. Worker processes (SNMPMonitoring, SNMPPoller,
+    ESnetMonitoring, TSDSMonitoring) are started as direct children and tracked with
+    process handles, so there is no status subprocess per worker on every cycle.
+    Workers started by a previous MultiWorker (pidfile) are adopted with psutil handles.
+    Exited workers are reported to exit callbacks and restarted with exponential backoff.
+"""
+import os
+import glob
+import time
+import subprocess
+import psutil
+from SNMPMon.daemonizer import getPidFile
+
+# Worker components started by MultiWorker (only one of them is active at a time)
+COMPONENTS = ['SNMPMonitoring', 'SNMPPoller', 'ESnetMonitoring', 'TSDSMonitoring']
+
+
+class Worker():
+    """Supervised worker process"""
+    def __init__(self, component, devicename):
+        self.component = component
+        self.devicename = devicename
+        self.name = f'{component}-{devicename}'
+        self.pidfile = getPidFile(component, devicename)
+        # subprocess.Popen for own children, psutil.Process for adopted workers
+        self.handle = None
+        self.started = 0.0
+        self.nextStart = 0.0
+        self.backoff = 0.0
+        self.stats = {'running': 0, 'pid': 0, 'starts': 0, 'restarts': 0, 'exits': 0,
+                      'last_exit_code': 0, 'last_exit_time': 0, 'uptime': 0.0, 'backoff': 0.0}
+
+    def poll(self):
+        """Check if worker exited. Returns None if running, exit code otherwise (-1 if unknown)"""
+        if self.handle is None:
+            return -1
+        if isinstance(self.handle, subprocess.Popen):
+            return self.handle.poll()
+        try:
+            if self.handle.is_running() and self.handle.status() != psutil.STATUS_ZOMBIE:
+                return None
+        except psutil.NoSuchProcess:
+            pass
+        return -1
+
+
+class Supervisor():
+    """Start, track and restart worker processes"""
+    def __init__(self, logger, params=None):
+        self.logger = logger
+        params = params or {}
+        self.backoff = float(params.get('backoff', 5))
+        self.maxBackoff = float(params.get('maxBackoff', 300))
+        # Worker which ran at least stableTime seconds restarts without backoff
+        self.stableTime = float(params.get('stableTime', 300))
+        self.workers = {}
+        self.callbacks = []
+        self.stats = {'supervisor_workers': 0, 'supervisor_running': 0, 'supervisor_starts': 0,
+                      'supervisor_restarts': 0, 'supervisor_exits': 0, 'supervisor_adopted': 0}
+
+    def onExit(self, callback):
+        """Register exit callback: callback(worker, exitCode)"""
+        self.callbacks.append(callback)
+
+    def _adopt(self, worker):
+        """Adopt worker started by previous MultiWorker (pidfile). Returns True if it is running"""
+        try:
+            with open(worker.pidfile, 'r', encoding='utf-8') as fd:
+                pid = int(fd.read().strip())
+            proc = psutil.Process(pid)
+            # Protect from pid reuse - process must be this worker
+            cmdline = proc.cmdline()
+            if not any(worker.component in arg for arg in cmdline) or worker.devicename not in cmdline:
+                return False
+        except (OSError, ValueError, psutil.Error):
+            return False
+        worker.handle = proc
+        worker.started = proc.create_time()
+        worker.stats.update({'running': 1, 'pid': pid})
+        self.stats['supervisor_adopted'] += 1
+        self.logger.info(f'Adopted running {worker.name} (pid {pid})')
+        return True
+
+    def _start(self, worker):
+        """Start worker process (runs in foreground of child process)"""
+        try:
+            worker.handle = subprocess.Popen([worker.component, '--action', 'start', '--devicename', worker.devicename],
+                                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                             stderr=subprocess.DEVNULL, start_new_session=True)
+        except OSError as ex:
+            self.logger.error(f'Failed to start {worker.name}: {ex}')
+            self._exited(worker, -1)
+            return
+        with open(worker.pidfile, 'w', encoding='utf-8') as fd:
+            fd.write(f'{worker.handle.pid}\n')
+        worker.started = time.time()
+        if worker.stats['starts']:
+            worker.stats['restarts'] += 1
+            self.stats['supervisor_restarts'] += 1
+        worker.stats['starts'] += 1
+        worker.stats.update({'running': 1, 'pid': worker.handle.pid})
+        self.stats['supervisor_starts'] += 1
+        self.logger.info(f'Started {worker.name} (pid {worker.handle.pid})')
+
+    def _exited(self, worker, exitCode):
+        """Mark worker as exited, schedule restart with backoff and call exit callbacks"""
+        now = time.time()
+        if worker.started and now - worker.started >= self.stableTime:
+            worker.backoff = 0.0
+        else:
+            worker.backoff = min(self.maxBackoff, worker.backoff * 2 if worker.backoff else self.backoff)
+        worker.nextStart = now + worker.backoff
+        worker.handle = None
+        worker.stats.update({'running': 0, 'pid': 0, 'last_exit_code': exitCode, 'last_exit_time': int(now),
+                             'backoff': worker.backoff})
+        worker.stats['exits'] += 1
+        self.stats['supervisor_exits'] += 1
+        try:
+            os.remove(worker.pidfile)
+        except OSError:
+            pass
+        self.logger.warning(f'{worker.name} exited with code {exitCode}. Restart in {worker.backoff} seconds')
+        for callback in self.callbacks:
+            try:
+                callback(worker, exitCode)
+            except Exception as ex:
+                self.logger.error(f'Exit callback of {worker.name} failed: {ex}')
+
+    def check(self):
+        """Check all workers for exit (reaps own children)"""
+        for worker in self.workers.values():
+            if worker.handle is None:
+                continue
+            exitCode = worker.poll()
+            if exitCode is not None:
+                self._exited(worker, exitCode)
+
+    def ensure(self, component, devicename):
+        """Make sure worker is running: adopt or start it (restart if exited and backoff passed)"""
+        key = (component, devicename)
+        worker = self.workers.get(key)
+        if worker is None:
+            worker = self.workers[key] = Worker(component, devicename)
+            if self._adopt(worker):
+                return worker
+        elif worker.handle is not None:
+            exitCode = worker.poll()
+            if exitCode is None:
+                return worker
+            self._exited(worker, exitCode)
+        if time.time() >= worker.nextStart:
+            self._start(worker)
+        return worker
+
+    def stop(self, component, devicename):
+        """Stop worker (and its children) and stop supervising it. Returns True if it was running"""
+        worker = self.workers.pop((component, devicename), None) or Worker(component, devicename)
+        if worker.handle is None and not self._adopt(worker):
+            return False
+        try:
+            proc = psutil.Process(worker.handle.pid)
+            for child in proc.children(recursive=True):
+                child.kill()
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+        if isinstance(worker.handle, subprocess.Popen):
+            worker.handle.wait()
+        try:
+            os.remove(worker.pidfile)
+        except OSError:
+            pass
+        self.logger.info(f'Stopped {worker.name}')
+        return True
+
+    def prune(self, component, devicenames):
+        """Stop component workers which are not in devicenames (removed from config or httpdir).
+        Returns names of stopped workers"""
+        stopped = []
+        for key in list(self.workers):
+            if key[0] == component and key[1] not in devicenames:
+                self.stop(*key)
+                stopped.append(f'{key[0]}-{key[1]}')
+        return stopped
+
+    def pruneInactive(self, active):
+        """Stop workers of all components except active (pollerMode or service switch), also
+        the ones started by previous MultiWorker (pidfile). Returns names of stopped workers"""
+        keys = {key for key in self.workers if key[0] != active}
+        for component in COMPONENTS:
+            if component == active:
+                continue
+            prefix = getPidFile(component, '*')[:-len('*.pid')]
+            for fName in glob.glob(getPidFile(component, '*')):
+                keys.add((component, fName[len(prefix):-len('.pid')]))
+        return [f'{key[0]}-{key[1]}' for key in sorted(keys) if self.stop(*key)]
+
+    def getStats(self):
+        """Supervisor and per worker metrics"""
+        now = time.time()
+        for worker in self.workers.values():
+            worker.stats['uptime'] = now - worker.started if worker.handle is not None else 0.0
+        self.stats['supervisor_workers'] = len(self.workers)
+        self.stats['supervisor_running'] = sum(1 for worker in self.workers.values() if worker.handle is not None)
+        return {'supervisor': dict(self.stats),
+                'workers': {worker.name: dict(worker.stats) for worker in self.workers.values()}}
@@ -9,6 +9,7 @@ from SNMPMon.utilities import getFileContentAsJson
 from SNMPMon.utilities import dumpFileContentAsJson
 from SNMPMon.utilities import getTimeRotLogger
 from SNMPMon.utilities import getUTCnow
+from SNMPMon.manifest import registerOutput
 
 
 def sum_and_average(data):
@@ -83,7 +84,8 @@ class TSDS():
             # Set the runtime
             snmpout.setdefault(device, {}).setdefault('snmp_scan_runtime', getUTCnow())
         pprint.pprint(snmpout)
-        return dumpFileContentAsJson(self.config, device, snmpout)
+        fName = dumpFileContentAsJson(self.config, device, snmpout)
+        return registerOutput(self.config, fName, 'TSDSMonitoring')
 
     def _callTSDS(self, host, fields):
         """Call TSDS and Get data"""
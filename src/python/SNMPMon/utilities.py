@@ -15,6 +15,7 @@ import logging
 import logging.handlers
 import simplejson as json
 from yaml import safe_load as yload
+from SNMPMon.snapshot import isSnapshot, SnapshotReader, writeSnapshot
 
 # Logging levels.
 LEVELS = {'FATAL': logging.FATAL,
@@ -52,26 +53,51 @@ def evaldict(inputDict):
         raise Exception(f'Got Syntax Error: {ex}') from ex
     return out
 
-def getFileContentAsJson(inputFile):
-    """Get file content as json."""
+def getFileContentAsJson(inputFile, lazy=False):
+    """Get file content as json. Binary snapshots are detected and decoded
+    (if lazy - returned as SnapshotReader, which decodes top level keys on access)."""
     out = {}
+    if os.path.isfile(inputFile) and isSnapshot(inputFile):
+        reader = SnapshotReader(inputFile)
+        if lazy:
+            return reader
+        out = reader.toDict()
+        reader.close()
+        return out
     if os.path.isfile(inputFile):
         with open(inputFile, 'r', encoding='utf-8') as fd:
             try:
                 out = json.load(fd)
             except ValueError:
-                print(fd.seek(0))
+                fd.seek(0)
                 out = evaldict(fd.read())
     return out
 
+def getOutSuffix(config):
+    """Get output file suffix for configured snapshot format (.snap for binary, .json otherwise)"""
+    return '.snap' if config.get('snapshotFormat', 'json') == 'binary' else '.json'
+
+def getLatestFileName(config, name):
+    """Get latest output file name (snmp-<name>-latest.<suffix> in tmpdir)"""
+    return os.path.join(config['tmpdir'], f'snmp-{name}-latest{getOutSuffix(config)}')
+
+def _getOutFileName(config, name, fullpath=False):
+    """Get output file name (snmp-<name>.<suffix> in tmpdir)"""
+    if fullpath:
+        return name
+    if not os.path.isdir(config['tmpdir']):
+        os.makedirs(config['tmpdir'])
+    return os.path.join(config['tmpdir'], f'snmp-{name}{getOutSuffix(config)}')
+
+def dumpFileContent(config, name, content, fullpath=False):
+    """Dump File content in configured snapshot format (snapshotFormat: json or binary)."""
+    if getOutSuffix(config) == '.snap':
+        return writeSnapshot(_getOutFileName(config, name, fullpath), content)
+    return dumpFileContentAsJson(config, name, content, fullpath)
+
 def dumpFileContentAsJson(config, name, content, fullpath=False):
     """Dump File content with locks."""
-    if fullpath:
-        filename = name
-    else:
-        if not os.path.isdir(config['tmpdir']):
-            os.makedirs(config['tmpdir'])
-        filename = os.path.join(config['tmpdir'], f'snmp-{name}.json')
+    filename = _getOutFileName(config, name, fullpath)
     tmpoutFile = filename + '.tmp'
     with open(tmpoutFile, 'w+', encoding='utf-8') as fd:
         json.dump(content, fd)
@@ -153,6 +179,10 @@ def keyMacMappings(network_os):
         return mappings[network_os]
     return default
 
+def fdbCountMappings():
+    """Q-BRIDGE-MIB dot1qFdbDynamicCount - number of dynamic FDB entries per FDB Id (VLAN)"""
+    return {"oid": "1.3.6.1.2.1.17.7.1.2.1.1.2", "mib": "mib-2.17.7.1.2.1.1.2."}
+
 def overrideMacMappings(config, mappings):
     """Override Mac mappings"""
     if 'oid' in config:
@@ -166,16 +196,41 @@ def findMaxInteger(strlist):
     intlist = list(map(int, strlist))
     return max(intlist)
 
+class IndexedMerge():
+    """Merge outputs into dictionary (same semantics as updatedict). Keeps next free
+    integer index of each nested container, so merge is linear in merged entries."""
+    def __init__(self, orig=None):
+        self.out = orig if orig is not None else {}
+        # (key, key1) -> (container, next free integer index)
+        self.nextIndex = {}
+
+    def _nextIndex(self, key, key1):
+        """Get next free integer index of out[key][key1] (scanned once per container)"""
+        container = self.out.get(key, {}).get(key1, {})
+        tracked = self.nextIndex.get((key, key1))
+        if tracked and tracked[0] is container:
+            return tracked[1]
+        allitems = list(container.keys())
+        return findMaxInteger(allitems) + 1 if allitems else 0
+
+    def update(self, new):
+        """Merge new output. Returns merged dictionary"""
+        for key, val in new.items():
+            for key1, val1 in val.items():
+                if not isinstance(val1, dict):
+                    self.out.setdefault(key, {})[key1] = val1
+                    continue
+                if not val1:
+                    continue
+                nextint = self._nextIndex(key, key1)
+                container = self.out.setdefault(key, {}).setdefault(key1, {})
+                for mval in val1.values():
+                    container[str(nextint)] = mval
+                    nextint += 1
+                self.nextIndex[(key, key1)] = (container, nextint)
+        return self.out
+
+
 def updatedict(orig, new):
     """Update dictionary."""
-    for key, val in new.items():
-        for key1, val1 in val.items():
-            if not isinstance(val1, dict):
-                orig.setdefault(key, {}).setdefault(key1, "")
-                orig[key][key1] = val1
-                continue
-            for _mkey, mval in val1.items():
-                allitems = list(orig.get(key, {}).get(key1, {}).keys())
-                nextint = findMaxInteger(allitems) + 1 if allitems else 0
-                orig.setdefault(key, {}).setdefault(key1, {})[str(nextint)] = mval
-    return orig
+    return IndexedMerge(orig).update(new)
@@ -11,17 +11,27 @@ import os
 import os.path
 import time
 import json
+import hashlib
+import threading
 from datetime import datetime
 from datetime import timezone
-from prometheus_client import generate_latest, CollectorRegistry
-from prometheus_client import Gauge
-from prometheus_client import Info
 from SNMPMon.utilities import getStreamLogger
 from SNMPMon.utilities import getFileContentAsJson
 from SNMPMon.utilities import dumpFileContentAsJson
-from SNMPMon.utilities import isValFloat
 from SNMPMon.utilities import getUTCnow
 from SNMPMon.utilities import getConfig
+from SNMPMon.snapshotholder import getSnapshotHolder
+from SNMPMon.snapshot import SnapshotReader
+from SNMPMon.exposition import DEVICE_FAMILIES
+from SNMPMon.exposition import GLOBAL_FAMILIES
+from SNMPMon.exposition import FORMATS
+from SNMPMon.exposition import FamilyWriter
+from SNMPMon.exposition import iterExposition
+from SNMPMon.exposition import compressChunks
+from SNMPMon.exposition import negotiateFormat
+from SNMPMon.exposition import negotiateEncoding
+from SNMPMon.exposition import writeDevice
+from SNMPMon.exposition import writeStats
 
 
 class Authorize():
@@ -89,6 +99,119 @@ class Authorize():
         # Check DN in authorized list
         return self.checkAuthorized(environ)
 
+class ExpositionCache():
+    """Rendered Prometheus exposition per host (None - all devices), valid for one output generation.
+    Format (text, OpenMetrics) and encoding (identity, gzip, zstd) variants are rendered and
+    compressed on first request and cached with the same generation. Shared by all Frontends of the process."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Per device fragments: devname -> {'version', 'content', 'families', 'validUntil'}
+        self.fragments = {}
+        self.stats = {'exposition_cache_hits': 0, 'exposition_cache_misses': 0, 'exposition_cache_hit_ratio': 0.0,
+                      'exposition_not_modified': 0, 'exposition_renders': 0, 'exposition_render_ms': 0.0,
+                      'exposition_render_ms_total': 0.0, 'exposition_bytes': 0,
+                      'exposition_fragment_hits': 0, 'exposition_fragment_renders': 0,
+                      'exposition_compressions': 0, 'exposition_compress_ms': 0.0, 'exposition_compressed_bytes': 0}
+
+    def get(self, host, key):
+        """Get cached entry if it was rendered for the same generation and is still valid"""
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry['key'] == key and getUTCnow() < entry['validUntil']:
+                self.stats['exposition_cache_hits'] += 1
+                return entry
+            self.stats['exposition_cache_misses'] += 1
+            return None
+
+    def put(self, host, key, families, fragments, validUntil, renderTime):
+        """Cache rendered exposition (chunks reference device fragments, they are not copied).
+        Returns cache entry with text format variant"""
+        chunks = list(iterExposition(families, fragments))
+        digest = hashlib.blake2b(digest_size=8)
+        for chunk in chunks:
+            digest.update(chunk)
+        variant = {'chunks': chunks, 'length': sum(map(len, chunks)), 'etag': f'"{digest.hexdigest()}"'}
+        entry = {'key': key, 'families': families, 'fragments': fragments, 'validUntil': validUntil,
+                 'digest': digest.hexdigest(), 'variants': {('text', None): variant}}
+        with self.lock:
+            self.entries[host] = entry
+            self.stats['exposition_renders'] += 1
+            self.stats['exposition_render_ms'] = renderTime * 1000
+            self.stats['exposition_render_ms_total'] += renderTime * 1000
+            self.stats['exposition_bytes'] = variant['length']
+            lookups = self.stats['exposition_cache_hits'] + self.stats['exposition_cache_misses']
+            self.stats['exposition_cache_hit_ratio'] = self.stats['exposition_cache_hits'] / lookups if lookups else 0.0
+        return entry
+
+    def getVariant(self, entry, fmt, encoding):
+        """Get format/encoding variant of cached entry (rendered and compressed once per generation)"""
+        variant = entry['variants'].get((fmt, encoding))
+        if variant:
+            return variant
+        startTime = time.time()
+        chunks = entry['variants'][('text', None)]['chunks']
+        if fmt != 'text':
+            chunks = list(iterExposition(entry['families'], entry['fragments'], fmt))
+        if encoding:
+            chunks = [compressChunks(chunks, encoding)]
+        suffix = '-'.join(item for item in (fmt if fmt != 'text' else '', encoding) if item)
+        variant = {'chunks': chunks, 'length': sum(map(len, chunks)), 'etag': f'"{entry["digest"]}-{suffix}"'}
+        with self.lock:
+            # Other thread could render it in the meantime - keep the first one
+            variant = entry['variants'].setdefault((fmt, encoding), variant)
+            if encoding:
+                self.stats['exposition_compressions'] += 1
+                self.stats['exposition_compress_ms'] = (time.time() - startTime) * 1000
+                self.stats['exposition_compressed_bytes'] = variant['length']
+        return variant
+
+    def getFragment(self, devname, version=None, content=None):
+        """Get device fragment if it is still valid and device output did not change
+        (same snapshot section digest, or equal content if output has no digest)"""
+        with self.lock:
+            fragment = self.fragments.get(devname)
+        if not fragment or getUTCnow() >= fragment['validUntil']:
+            return None
+        if version is not None and fragment['version'] != version:
+            return None
+        if version is None and content is not None and fragment['content'] != content:
+            return None
+        with self.lock:
+            self.stats['exposition_fragment_hits'] += 1
+        return fragment
+
+    def putFragment(self, devname, fragment):
+        """Cache rendered device fragment"""
+        with self.lock:
+            self.fragments[devname] = fragment
+            self.stats['exposition_fragment_renders'] += 1
+
+    def pruneFragments(self, devices):
+        """Remove fragments of devices which are not in output anymore"""
+        with self.lock:
+            for devname in set(self.fragments) - set(devices):
+                del self.fragments[devname]
+
+    def notModified(self):
+        """Count conditional request answered with 304"""
+        with self.lock:
+            self.stats['exposition_not_modified'] += 1
+
+
+# Process wide exposition cache (shared by all threads and Frontends of the process)
+EXPOSITION_CACHE = ExpositionCache()
+
+
+def etagMatches(environ, etag):
+    """Check if request If-None-Match header matches etag"""
+    ifNoneMatch = environ.get('HTTP_IF_NONE_MATCH', '')
+    if not ifNoneMatch:
+        return False
+    tags = [tag.strip() for tag in ifNoneMatch.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
 class Frontend(Authorize):
     """Frontend for SNMPMon. Exposes SNMP Data in Prometheus format."""
     def __init__(self):
@@ -96,14 +219,77 @@ class Frontend(Authorize):
         self.logger = getStreamLogger(**self.config.get('logParams', {}))
         self.headers = [('Cache-Control', 'no-cache, no-store, must-revalidate'),
                         ('Pragma', 'no-cache'), ('Expires', '0'), ('Content-Type', 'text/plain')]
+        # Latest output (file or shared memory store), loaded once per generation for the process
+        self.holder = getSnapshotHolder(self.config, self.logger)
         Authorize.__init__(self, self.config, self.logger)
 
-    def metrics(self, host = None):
-        """Return metrics view"""
-        registry = self.__cleanRegistry()
-        self.__getSNMPData(registry, host)
-        data = generate_latest(registry)
-        return iter([data])
+    def metrics(self, environ, start_response, host = None):
+        """Return metrics view. Exposition is rendered once per output generation and
+        cached (process wide). Supports conditional requests (ETag/If-None-Match),
+        OpenMetrics format (Accept) and gzip/zstd compression (Accept-Encoding)"""
+        key = self.holder.generation(host)
+        entry = EXPOSITION_CACHE.get(host, key)
+        if entry is None:
+            startTime = time.time()
+            devices = self.holder.withOutput(lambda output: self.__updateFragments(output, host))
+            families, fragments, validUntil = self.__assemble(devices, host)
+            entry = EXPOSITION_CACHE.put(host, key, families, fragments, validUntil, time.time() - startTime)
+        fmt = negotiateFormat(environ.get('HTTP_ACCEPT', ''))
+        encoding = negotiateEncoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        variant = EXPOSITION_CACHE.getVariant(entry, fmt, encoding)
+        headers = [('Cache-Control', 'no-cache'), ('Content-Type', FORMATS[fmt]),
+                   ('Vary', 'Accept, Accept-Encoding'), ('ETag', variant['etag'])]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if etagMatches(environ, variant['etag']):
+            EXPOSITION_CACHE.notModified()
+            start_response('304 Not Modified', headers)
+            return iter([b''])
+        start_response('200 OK', headers + [('Content-Length', str(variant['length']))])
+        return iter(variant['chunks'])
+
+    def __updateFragments(self, output, host=None):
+        """Render fragments of new and changed devices (others are reused). Returns device names"""
+        devices = [devname for devname in output.keys() if not host or devname == host]
+        for devname in devices:
+            if isinstance(output, SnapshotReader):
+                # Unchanged device is not even decoded
+                version, content = output.digest(devname), None
+            else:
+                version, content = None, output[devname]
+            if EXPOSITION_CACHE.getFragment(devname, version, content):
+                continue
+            devout = output[devname]
+            families, validUntil = writeDevice(devname, devout, self.logger)
+            EXPOSITION_CACHE.putFragment(devname, {'version': version, 'content': content,
+                                                   'families': families, 'validUntil': validUntil})
+        return devices
+
+    def __assemble(self, devices, host=None):
+        """Exposition chunks of device fragments per metric family (global families only for /metrics).
+        Returns (families, fragments, valid until UTC timestamp)"""
+        fragments = [fragment for fragment in map(EXPOSITION_CACHE.fragments.get, devices) if fragment]
+        validUntil = min([fragment['validUntil'] for fragment in fragments], default=float('inf'))
+        fragments = [fragment['families'] for fragment in fragments]
+        families = DEVICE_FAMILIES
+        if not host:
+            EXPOSITION_CACHE.pruneFragments(devices)
+            fragments.append(self.__writeGlobal())
+            families = dict(DEVICE_FAMILIES, **GLOBAL_FAMILIES)
+        return families, fragments, validUntil
+
+    def __writeGlobal(self):
+        """Write global families: MultiWorker supervisor and exposition cache statistics"""
+        supervisor = FamilyWriter('supervisor_statistics')
+        stats = getFileContentAsJson(os.path.join(self.config['tmpdir'], 'supervisor-stats.json'))
+        writeStats(stats.get('supervisor', {}), {'worker': 'supervisor'}, supervisor)
+        for worker, vals in stats.get('workers', {}).items():
+            writeStats(vals, {'worker': worker}, supervisor)
+        # Exposition cache statistics as of last render
+        exposition = FamilyWriter('exposition_cache_statistics')
+        writeStats(dict(EXPOSITION_CACHE.stats, **self.holder.stats), {}, exposition)
+        return {'supervisor_statistics': supervisor.getvalue(),
+                'exposition_cache_statistics': exposition.getvalue()}
 
     def __getinputdata(self, environ):
         """Get input data from request"""
@@ -175,80 +361,6 @@ class Frontend(Authorize):
         except Exception as ex:
             raise Exception(f"Error: {ex}") from ex
 
-    @staticmethod
-    def __cleanRegistry():
-        """Get new/clean prometheus registry."""
-        registry = CollectorRegistry()
-        return registry
-
-    def __getLatestOutput(self):
-        fName = os.path.join(self.config['tmpdir'], 'snmp-multiworker-latest.json')
-        retryCount = 0
-        while retryCount < 5:
-            try:
-                out = getFileContentAsJson(fName)
-                if out:
-                    return out
-            except Exception as ex:
-                self.logger.debug(f'Got Exception: {ex}')
-            retryCount += 1
-            time.sleep(0.2)
-        return {}
-
-    def __addMacInfo(self, macVals, devname, macState):
-        """Add Mac Info to prometheus output"""
-        for _cntr, vlandict in macVals.items():
-            for vlan, macs in vlandict.items():
-                incr = 0
-                added = []
-                for mac in macs:
-                    # Secure from duplicate entries;
-                    if mac.lower() in added:
-                        continue
-                    added.append(mac.lower())
-                    macState.labels(**{'vlan': vlan, 'hostname': devname, 'incr': str(incr)}).info({'macaddress': mac.lower()})
-                    incr += 1
-
-    def __addGeneralInfo(self, vals, devname, snmpGauge):
-        """Add General Info to prometheus output"""
-        for _cntr, val in vals.items():
-            keys = {'ifDescr': val.get('ifDescr', ''), 'ifType': val.get('ifType', ''),
-                    'ifAlias': val.get('ifAlias', ''), 'hostname': devname}
-            for key1, val1 in val.items():
-                if isValFloat(val1):
-                    keys['Key'] = key1
-                    snmpGauge.labels(**keys).set(val1)
-
-    def __getSNMPData(self, registry, host = None):
-        """Add SNMP Data to prometheus output"""
-        # Here get info from DB for switch snmp details
-        output = self.__getLatestOutput()
-        runtimeInfo = Gauge('service_runtime_timestamp', 'Service Runtime Timestamp', ['servicename', 'hostname'], registry=registry)
-        snmpGauge = Gauge('interface_statistics', 'Interface Statistics',
-                          ['ifDescr', 'ifType', 'ifAlias', 'hostname', 'Key'], registry=registry)
-        macState = Info("mac_table", "Mac Address Table", labelnames=["vlan", "hostname", "incr"], registry=registry)
-        if not output:
-            return
-        for devname, devout in output.items():
-            if host and devname != host:
-                continue
-            if 'snmp_scan_runtime' not in devout:
-                runtimeInfo.labels(**{'servicename': 'SNMPMonitoring', 'hostname': devname}).set(0)
-                self.logger.info('SNMP Scan Runtime does not have runtime details. Something wrong with SNMPRuntime Thread')
-                # We need runtime timestamp. Anything older than 5mins, ignored. It shows that there is an issue with SNMPMon Thread.
-                return
-            if int(devout['snmp_scan_runtime']) < int(getUTCnow() - 300):
-                runtimeInfo.labels(**{'servicename': 'SNMPMonitoring', 'hostname': devname}).set(devout['snmp_scan_runtime'])
-                self.logger.info('SNMP Scan Runtime is older than 5 mins. Something wrong with SNMPRuntime Thread')
-                return
-            for hostname, vals in devout.items():
-                if hostname == 'snmp_scan_runtime':
-                    runtimeInfo.labels(**{'servicename': 'SNMPMonitoring', 'hostname': devname}).set(vals)
-                elif hostname == "macs":
-                    self.__addMacInfo(vals, devname, macState)
-                else:
-                    self.__addGeneralInfo(vals, devname, snmpGauge)
-
     def _submitRequest(self, environ, start_response):
         """Submit Request check"""
         # Accept post method and save to httpdir config location
@@ -278,13 +390,11 @@ class Frontend(Authorize):
             start_response('401 Unauthorized', self.headers)
             return [bytes(f'Unauthorized access. {str(ex)}', "UTF-8")]
         if environ['SCRIPT_URL'] == '/metrics':
-            start_response('200 OK', self.headers)
-            return self.metrics()
+            return self.metrics(environ, start_response)
         # Accept post method and save to httpdir config location
         if environ['SCRIPT_URL'].startswith('/submit'):
             return self._submitRequest(environ, start_response)
         if environ['SCRIPT_URL'] in self.allowedUrls:
-            start_response('200 OK', self.headers)
-            return self.metrics(self.allowedUrls[environ['SCRIPT_URL']])
+            return self.metrics(environ, start_response, self.allowedUrls[environ['SCRIPT_URL']])
         start_response('404 Not Found', self.headers)
         return iter([b'Not Found'])
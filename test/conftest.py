@@ -0,0 +1,5 @@
+"""Test configuration: make SNMPMon importable from source tree"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'python'))
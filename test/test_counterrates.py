@@ -0,0 +1,70 @@
+"""Tests for counter rates (wraps, resets and agent restarts)"""
+from SNMPMon.counterrates import CounterRates
+
+
+def testRate():
+    """Rate is delta per second between two latest samples"""
+    rates = CounterRates()
+    assert not rates.update('1', 100.0, {'ifHCInOctets': 1000, 'ifInErrors': 1})
+    assert rates.update('1', 110.0, {'ifHCInOctets': 3000, 'ifInErrors': 1}) == {'ifHCInOctets': 200.0,
+                                                                                  'ifInErrors': 0.0}
+    assert rates.update('1', 120.0, {'ifHCInOctets': 4000, 'ifInErrors': 11}) == {'ifHCInOctets': 100.0,
+                                                                                   'ifInErrors': 1.0}
+
+
+def testCounter32Wrap():
+    """Counter32 wraps at 2**32"""
+    rates = CounterRates(['ifInErrors'])
+    rates.update('1', 0.0, {'ifInErrors': 2**32 - 10})
+    assert rates.update('1', 1.0, {'ifInErrors': 5}) == {'ifInErrors': 15.0}
+
+
+def testCounter64Wrap():
+    """Counter64 wraps at 2**64, also Counter32 key which value already went above 2**32"""
+    rates = CounterRates(['ifHCInOctets', 'ifInErrors'])
+    rates.update('1', 0.0, {'ifHCInOctets': 2**64 - 100, 'ifInErrors': 2**40})
+    assert rates.update('1', 2.0, {'ifHCInOctets': 100, 'ifInErrors': 2**40 + 4}) == {'ifHCInOctets': 100.0,
+                                                                                      'ifInErrors': 2.0}
+    rates.update('1', 3.0, {'ifHCInOctets': 0, 'ifInErrors': 2**64 - 2})
+    assert rates.update('1', 4.0, {'ifHCInOctets': 0, 'ifInErrors': 2})['ifInErrors'] == 4.0
+
+
+def testCounterReset():
+    """Counter which went back too much for a wrap (cleared) has no rate"""
+    rates = CounterRates(['ifHCInOctets', 'ifHCOutOctets'])
+    rates.update('1', 0.0, {'ifHCInOctets': 10**12, 'ifHCOutOctets': 10})
+    assert rates.update('1', 1.0, {'ifHCInOctets': 10, 'ifHCOutOctets': 20}) == {'ifHCOutOctets': 10.0}
+    # Next sample is compared with the reset value
+    assert rates.update('1', 2.0, {'ifHCInOctets': 30, 'ifHCOutOctets': 20}) == {'ifHCInOctets': 20.0,
+                                                                                 'ifHCOutOctets': 0.0}
+
+
+def testInvalidAndMissingValues():
+    """Missing or invalid values and same sample time do not produce rates"""
+    rates = CounterRates(['ifHCInOctets', 'ifHCOutOctets'])
+    rates.update('1', 0.0, {'ifHCInOctets': 10, 'ifHCOutOctets': 'bad'})
+    assert rates.update('1', 0.0, {'ifHCInOctets': 20, 'ifHCOutOctets': 10}) == {}
+    assert rates.update('1', 1.0, {'ifHCInOctets': 30}) == {'ifHCInOctets': 10.0}
+
+
+def testAgentRestart():
+    """sysUpTime going back resets history (no rate across restart)"""
+    rates = CounterRates(['ifHCInOctets'])
+    assert not rates.checkRestart(1000)
+    rates.update('1', 0.0, {'ifHCInOctets': 5000})
+    assert not rates.checkRestart(2000)
+    assert rates.checkRestart(10)
+    assert not rates.update('1', 10.0, {'ifHCInOctets': 100})
+    assert rates.update('1', 20.0, {'ifHCInOctets': 200}) == {'ifHCInOctets': 10.0}
+
+
+def testPruneReusesRows():
+    """Pruned interface rows are reused and start without history"""
+    rates = CounterRates(['ifHCInOctets'])
+    rates.update('1', 0.0, {'ifHCInOctets': 10})
+    rates.update('2', 0.0, {'ifHCInOctets': 10})
+    rates.prune(['2'])
+    assert list(rates.rows) == ['2']
+    assert not rates.update('3', 1.0, {'ifHCInOctets': 20})
+    assert len(rates.heads) == 2
+    assert rates.update('2', 1.0, {'ifHCInOctets': 20}) == {'ifHCInOctets': 10.0}
@@ -0,0 +1,47 @@
+"""Tests for wall-clock aligned tick schedule (jitter, overruns)"""
+from SNMPMon.daemonizer import TickSchedule
+
+
+def testJitterOffset():
+    """Offset is deterministic per name, within jitter * interval and differs between names"""
+    offsets = [TickSchedule(f'device{num}', 60, 0.5).offset for num in range(20)]
+    assert offsets == [TickSchedule(f'device{num}', 60, 0.5).offset for num in range(20)]
+    assert all(0 <= offset < 30 for offset in offsets)
+    assert len(set(offsets)) > 1
+    assert TickSchedule('device1', 60, 0).offset == 0
+    # Jitter is limited to one interval
+    assert TickSchedule('device1', 60, 5).offset == TickSchedule('device1', 60, 1).offset
+
+
+def testAlignedTicks():
+    """Ticks are at k * interval + offset"""
+    sched = TickSchedule('device1', 30)
+    sched.start(1000.0)
+    first = sched.nextTick
+    assert 1000.0 <= first < 1030.0
+    assert abs((first - sched.offset) / 30 - round((first - sched.offset) / 30)) < 1e-9
+    assert not sched.due(first - 0.1) and sched.due(first)
+    assert sched.waitTime(first - 2) == 2
+    assert sched.followingTick() == first + 30
+    sched.completed(first, first + 5)
+    assert sched.nextTick == first + 30
+    assert sched.alignedTick(sched.nextTick) == sched.nextTick
+
+
+def testImmediateStart():
+    """Immediate start runs now, next tick is aligned"""
+    sched = TickSchedule('device1', 30, 0.5)
+    sched.start(1000.0, immediate=True)
+    assert sched.due(1000.0)
+    assert sched.followingTick() == sched.alignedTick(1030.0)
+
+
+def testOverrunSkipsMissedTicks():
+    """Run longer than interval skips missed ticks and counts them"""
+    sched = TickSchedule('device1', 10, 0)
+    sched.start(100.0)
+    sched.completed(100.0, 135.0)
+    assert sched.nextTick == 140.0
+    assert sched.stats['schedule_overruns'] == 1
+    assert sched.stats['schedule_missed_ticks'] == 3
+    assert sched.stats['schedule_last_runtime'] == 35.0
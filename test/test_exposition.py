@@ -0,0 +1,86 @@
+"""Tests for exposition format/encoding negotiation, compression and ETags"""
+import gzip
+import pytest
+from SNMPMon.utilities import getUTCnow
+from SNMPMon.exposition import ENCODINGS, negotiateFormat, negotiateEncoding, compressChunks, iterExposition
+from SNMPMon.webserver import ExpositionCache, etagMatches
+
+FAMILIES = {'interface_statistics': ('Interface Statistics', ['hostname', 'Key'], 'gauge'),
+            'mac_table_info': ('Mac Address Table', ['vlan', 'hostname', 'incr'], 'info')}
+FRAGMENTS = [{'interface_statistics': b'interface_statistics{Key="a",hostname="dev1"} 1.0\n'},
+             {'interface_statistics': b'interface_statistics{Key="a",hostname="dev2"} 2.0\n',
+              'mac_table_info': b'mac_table_info{hostname="dev2",incr="0",vlan="1"} 1.0\n'}]
+
+
+@pytest.mark.parametrize('accept, fmt', [
+    (None, 'text'), ('', 'text'), ('text/plain', 'text'), ('*/*', 'text'),
+    ('application/openmetrics-text', 'openmetrics'),
+    ('application/openmetrics-text;version=1.0.0,text/plain;version=0.0.4;q=0.5,*/*;q=0.1', 'openmetrics'),
+    ('application/openmetrics-text;q=0.3,text/plain;q=0.7', 'text'),
+    ('application/openmetrics-text;q=0', 'text')])
+def testNegotiateFormat(accept, fmt):
+    """OpenMetrics only if it is preferred over text/plain"""
+    assert negotiateFormat(accept) == fmt
+
+
+@pytest.mark.parametrize('acceptEncoding, encoding', [
+    (None, None), ('', None), ('identity', None), ('gzip', 'gzip'), ('GZIP, deflate', 'gzip'),
+    ('gzip;q=0', None), ('br, gzip;q=0.5', 'gzip'), ('*', ENCODINGS[0]),
+    ('*;q=0.5, gzip;q=0', 'zstd' if 'zstd' in ENCODINGS else None)])
+def testNegotiateEncoding(acceptEncoding, encoding):
+    """Best supported encoding (by quality, then server preference)"""
+    assert negotiateEncoding(acceptEncoding) == encoding
+
+
+def testExpositionFormats():
+    """Samples of all fragments follow family header, OpenMetrics ends with EOF"""
+    text = b''.join(iterExposition(FAMILIES, FRAGMENTS))
+    assert text.startswith(b'# HELP interface_statistics Interface Statistics\n# TYPE interface_statistics gauge\n')
+    assert b'# TYPE mac_table_info gauge\n' in text
+    assert text.index(b'hostname="dev1"') < text.index(b'hostname="dev2"} 2.0')
+    openmetrics = b''.join(iterExposition(FAMILIES, FRAGMENTS, 'openmetrics'))
+    assert b'# TYPE mac_table info\n' in openmetrics and openmetrics.endswith(b'# EOF\n')
+
+
+def testCompression():
+    """Compressed exposition decompresses to the same bytes"""
+    chunks = list(iterExposition(FAMILIES, FRAGMENTS))
+    assert gzip.decompress(compressChunks(chunks, 'gzip')) == b''.join(chunks)
+    with pytest.raises(ValueError):
+        compressChunks(chunks, 'br')
+
+
+def testCacheVariantsAndEtags():
+    """Each format/encoding variant has own ETag, variants are rendered once per generation"""
+    cache = ExpositionCache()
+    assert cache.get(None, 'gen1') is None
+    entry = cache.put(None, 'gen1', FAMILIES, FRAGMENTS, getUTCnow() + 60, 0.01)
+    assert cache.get(None, 'gen1') is entry
+    assert cache.get(None, 'gen2') is None
+    text = cache.getVariant(entry, 'text', None)
+    gzipped = cache.getVariant(entry, 'text', 'gzip')
+    openmetrics = cache.getVariant(entry, 'openmetrics', None)
+    assert cache.getVariant(entry, 'text', 'gzip') is gzipped
+    assert cache.stats['exposition_compressions'] == 1
+    assert len({text['etag'], gzipped['etag'], openmetrics['etag']}) == 3
+    assert gzip.decompress(b''.join(gzipped['chunks'])) == b''.join(text['chunks'])
+    # Same content - same ETag (also for other generation)
+    other = cache.put(None, 'gen2', FAMILIES, FRAGMENTS, getUTCnow() + 60, 0.01)
+    assert cache.getVariant(other, 'text', None)['etag'] == text['etag']
+    changed = cache.put(None, 'gen3', FAMILIES, FRAGMENTS[:1], getUTCnow() + 60, 0.01)
+    assert cache.getVariant(changed, 'text', None)['etag'] != text['etag']
+
+
+def testExpiredEntry():
+    """Entry is not used after it expired"""
+    cache = ExpositionCache()
+    cache.put('dev1', 'gen1', FAMILIES, FRAGMENTS, getUTCnow() - 1, 0.01)
+    assert cache.get('dev1', 'gen1') is None
+
+
+@pytest.mark.parametrize('ifNoneMatch, matches', [
+    (None, False), ('"abc"', True), ('W/"abc"', True), ('"x", "abc"', True), ('*', True), ('"abcd"', False)])
+def testEtagMatches(ifNoneMatch, matches):
+    """If-None-Match matches strong, weak, listed and any ETag"""
+    environ = {'HTTP_IF_NONE_MATCH': ifNoneMatch} if ifNoneMatch else {}
+    assert etagMatches(environ, '"abc"') is matches
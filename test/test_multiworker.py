@@ -0,0 +1,124 @@
+"""Tests for MultiWorker incremental merge and worker supervision on pollerMode switch"""
+import os
+import json
+import stat
+import uuid
+import psutil
+import pytest
+from SNMPMon.multiworker import MultiWorker
+from SNMPMon.utilities import getFileContentAsJson, getLatestFileName, updatedict
+
+
+@pytest.fixture(name='config')
+def fixtureConfig(tmp_path, monkeypatch):
+    """MultiWorker config with fake worker commands on PATH"""
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    for component in ['SNMPMonitoring', 'SNMPPoller']:
+        script = bindir / component
+        script.write_text('#!/bin/sh\nsleep 1000\n')
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    for dirname in ['tmp', 'http', 'logs']:
+        (tmp_path / dirname).mkdir()
+    devices = [f'test-{uuid.uuid4().hex[:8]}' for _ in range(2)]
+    return {'tmpdir': str(tmp_path / 'tmp'), 'httpdir': str(tmp_path / 'http'),
+            'logParams': {'logFile': str(tmp_path / 'logs' / 'multiworker.log'), 'logLevel': 'DEBUG',
+                          'rotateTime': 'midnight', 'backupCount': 1},
+            'mergeOnChange': False, 'outputManifest': False,
+            'snmpMon': {device: {} for device in devices}}
+
+
+def _running(worker):
+    return worker.handle is not None and worker.poll() is None
+
+
+def _alive(pid):
+    """Process is running (killed worker stays zombie until its parent reaps it)"""
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _cleanup(*workers):
+    for mworker in workers:
+        for key in list(mworker.supervisor.workers):
+            mworker.supervisor.stop(*key)
+
+
+def testPollerModeSwitchStopsProcessWorkers(config):
+    """Switch to async poller stops all per device SNMPMonitoring workers"""
+    mworker = MultiWorker(config)
+    try:
+        mworker.startwork()
+        workers = dict(mworker.supervisor.workers)
+        assert sorted(workers) == sorted(('SNMPMonitoring', device) for device in config['snmpMon'])
+        assert all(_running(worker) for worker in workers.values())
+        pids = [worker.handle.pid for worker in workers.values()]
+        config['pollerMode'] = 'async'
+        mworker.startwork()
+        assert list(mworker.supervisor.workers) == [('SNMPPoller', 'all')]
+        assert _running(mworker.supervisor.workers[('SNMPPoller', 'all')])
+        assert not any(_alive(pid) for pid in pids)
+        assert not any(os.path.exists(worker.pidfile) for worker in workers.values())
+    finally:
+        _cleanup(mworker)
+
+
+def testPollerModeSwitchStopsPreviousWorkers(config):
+    """Workers of previous MultiWorker (pidfile only) are stopped after restart with other pollerMode"""
+    previous = MultiWorker(config)
+    mworker = None
+    try:
+        previous.startwork()
+        pids = [worker.handle.pid for worker in previous.supervisor.workers.values()]
+        config['pollerMode'] = 'async'
+        mworker = MultiWorker(config)
+        mworker.startwork()
+        assert list(mworker.supervisor.workers) == [('SNMPPoller', 'all')]
+        assert not any(_alive(pid) for pid in pids)
+    finally:
+        _cleanup(previous, *([mworker] if mworker else []))
+
+
+def _write(config, name, content):
+    fName = os.path.join(config['tmpdir'], name)
+    with open(fName + '.tmp', 'w', encoding='utf-8') as fd:
+        json.dump(content, fd)
+    os.replace(fName + '.tmp', fName)
+
+
+def _expected(config, extra):
+    out = {device: getFileContentAsJson(getLatestFileName(config, device)) for device in config['snmpMon']}
+    return updatedict(out, extra) if extra else out
+
+
+def testIncrementalMerge(config):  # pylint: disable=protected-access
+    """Only changed files are parsed and only affected keys are merged again.
+    Merged output is the same as full merge, in source order"""
+    dev1, dev2 = config['snmpMon']
+    _write(config, f'snmp-{dev1}-latest.json', {'1': {'ifDescr': 'a'}, 'macs': {'0': 'm1'}})
+    _write(config, f'snmp-{dev2}-latest.json', {'1': {'ifDescr': 'b'}})
+    extra = {dev1: {'macs': {'x': 'm2'}, 'hostname': 'h'}, 'other': {'k': 'v'}}
+    _write(config, 'extra.json', extra)
+    mworker = MultiWorker(config)
+    mworker._publishOutput()
+    merged = getFileContentAsJson(getLatestFileName(config, 'multiworker'))
+    assert merged == _expected(config, extra)
+    assert list(merged) == [dev1, dev2, 'other']
+    # Nothing changed - output is not written again
+    mworker._publishOutput()
+    assert mworker.mergeStats['merge_skipped_writes'] == 1
+    assert mworker.mergeStats['merge_reparses'] == 0
+    # Changed device output - only that device is merged again
+    _write(config, f'snmp-{dev2}-latest.json', {'1': {'ifDescr': 'c'}})
+    mworker._publishOutput()
+    assert mworker.mergeStats['merge_reparses'] == 1 and mworker.mergeStats['merge_rebuilt_keys'] == 1
+    assert getFileContentAsJson(getLatestFileName(config, 'multiworker')) == _expected(config, extra)
+    # Removed output - its keys are merged again (or dropped)
+    os.remove(os.path.join(config['tmpdir'], 'extra.json'))
+    mworker._publishOutput()
+    merged = getFileContentAsJson(getLatestFileName(config, 'multiworker'))
+    assert merged == _expected(config, None)
+    assert list(merged) == [dev1, dev2]
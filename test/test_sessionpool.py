@@ -0,0 +1,53 @@
+"""Tests for SNMP session pool timeout streak"""
+import logging
+import pytest
+
+pytest.importorskip('easysnmp')
+
+# pylint: disable=wrong-import-position
+from easysnmp.exceptions import EasySNMPTimeoutError
+from SNMPMon.sessionpool import SessionPool
+
+
+class Var():
+    """sysUpTime variable"""
+    value = 100
+
+
+class FlakySession():
+    """Session which answers health check GET but full cycles time out"""
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+
+    def get(self, _oid):
+        """Single GET"""
+        if not self.healthy:
+            raise EasySNMPTimeoutError('timeout')
+        return Var()
+
+
+def _pool(session, streak=3):
+    pool = SessionPool({'hostname': '127.0.0.1'}, logging.getLogger('test'), timeoutStreak=streak)
+    pool.session = session
+    return pool
+
+
+def testHealthCheckSuccessKeepsStreak():
+    """Session which times out on every cycle is rebuilt even if health checks pass in between"""
+    session = FlakySession()
+    pool = _pool(session)
+    for _ in range(2):
+        pool.reportCycle([EasySNMPTimeoutError('timeout')])
+        assert pool.healthCheck() == 100
+    assert pool.stats['timeout_streak'] == 2
+    pool.reportCycle([EasySNMPTimeoutError('timeout')])
+    assert pool.session is None
+
+
+def testHealthCheckFailureCounts():
+    """Failed health check counts towards streak, successful cycle resets it"""
+    pool = _pool(FlakySession(healthy=False))
+    assert pool.healthCheck() is None
+    assert pool.stats['timeout_streak'] == 1
+    pool.reportCycle([])
+    assert pool.stats['timeout_streak'] == 0
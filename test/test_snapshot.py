@@ -0,0 +1,56 @@
+"""Tests for binary snapshot encode/decode"""
+import pytest
+from SNMPMon.snapshot import dumps, loads, writeSnapshot, readSnapshot, SnapshotReader
+
+CONTENT = {'dev1': {'1': {'ifDescr': 'Ethernet1', 'ifHCInOctets': 2**64 - 1, 'ifInErrors': -1,
+                          'rate': 1.5, 'hostname': 'dev1'},
+                    '2': {'ifDescr': 'Ethernet2', 'ifHCInOctets': 10, 'rate': 0.0},
+                    'macs': {'vlan1': {'0': 'aa:bb', '1': 'cc:dd'}},
+                    'snmp_scan_runtime': 1700000000.25, 'hostname': 'dev1',
+                    'flags': [True, False, None, 'x']},
+           'dev2': {},
+           'other': {'list': [1, [2, 3], {'a': 'b'}], 'unicode': 'zaļš', 'big': 2**70, 'float': -0.5}}
+
+
+def testRoundTrip():
+    """Decoded snapshot is equal to encoded content"""
+    assert loads(dumps(CONTENT)) == CONTENT
+
+
+def testMixedColumns():
+    """Table columns with mixed or missing values are decoded as they were"""
+    content = {'dev': {'1': {'val': 1, 'opt': 'a'}, '2': {'val': 'x'}, '3': {'val': 2.5, 'opt': None}}}
+    assert loads(dumps(content)) == content
+
+
+def testFile(tmp_path):
+    """Snapshot file is read lazily, section by section"""
+    fName = writeSnapshot(str(tmp_path / 'out.snap'), CONTENT)
+    assert readSnapshot(fName) == CONTENT
+    reader = SnapshotReader(fName)
+    try:
+        assert list(reader) == list(CONTENT)
+        assert not reader.cache
+        assert reader['dev1'] == CONTENT['dev1']
+        assert list(reader.cache) == ['dev1']
+        assert reader.get('missing') is None
+        assert 'dev2' in reader and len(reader) == 3
+    finally:
+        reader.close()
+
+
+def testDigest():
+    """Section digest changes only if section content changed"""
+    old = SnapshotReader(data=dumps(CONTENT))
+    changed = dict(CONTENT, dev2={'1': {'ifDescr': 'new'}})
+    new = SnapshotReader(data=dumps(changed))
+    assert old.digest('dev1') == new.digest('dev1')
+    assert old.digest('dev2') != new.digest('dev2')
+
+
+def testInvalid():
+    """Not a snapshot (or truncated one) is rejected"""
+    with pytest.raises(ValueError):
+        loads(b'{"dev1": {}}')
+    with pytest.raises(ValueError):
+        loads(dumps(CONTENT)[:4])
@@ -0,0 +1,107 @@
+"""Tests for SNMPMonitoring discovery and targeted polling"""
+import pytest
+
+pytest.importorskip('easysnmp')
+
+# pylint: disable=wrong-import-position
+from SNMPMon.snmpmon import SNMPMonitoring
+from SNMPMon.sessionpool import SessionPool
+
+
+class Var():
+    """SNMP variable (same attributes as easysnmp SNMPVariable)"""
+    def __init__(self, oid, oidIndex, value, snmpType='INTEGER'):
+        self.oid = oid
+        self.oid_index = oidIndex
+        self.value = value
+        self.snmp_type = snmpType
+
+
+class FakeSession():
+    """SNMP session which serves a static ifTable and records requests"""
+    def __init__(self, interfaces=4):
+        self.scalars = {'sysUpTime.0': 1000, 'ifNumber.0': interfaces, 'ifTableLastChange.0': 50}
+        self.table = {}
+        for indx in range(1, interfaces + 1):
+            self.table[str(indx)] = {'ifDescr': f'Eth{indx}', 'ifType': 6, 'ifAdminStatus': 1,
+                                     'ifOperStatus': 1, 'ifHCInOctets': indx * 100, 'ifLastChange': 10}
+        self.walks = []
+        self.gets = []
+
+    def walk(self, oid):
+        """GETNEXT walk of a column (MAC table walks return nothing)"""
+        self.walks.append(oid)
+        return [Var(oid, indx, row[oid]) for indx, row in self.table.items() if oid in row]
+
+    def get(self, oids):
+        """GET of multiple varbinds"""
+        if isinstance(oids, str):
+            return Var(oids, '0', self.scalars[oids])
+        self.gets.append(list(oids))
+        out = []
+        for oid in oids:
+            if oid in self.scalars:
+                out.append(Var(oid, '0', self.scalars[oid]))
+                continue
+            col, indx = oid.split('.', 1)
+            if col in self.table.get(indx, {}):
+                out.append(Var(col, indx, self.table[indx][col]))
+            else:
+                out.append(Var(col, indx, '', 'NOSUCHINSTANCE'))
+        return out
+
+
+@pytest.fixture(name='monitor')
+def fixtureMonitor(tmp_path):
+    """SNMPMonitoring with fake session (SNMPv1, so columns are walked with GETNEXT)"""
+    snmpParams = {'hostname': '127.0.0.1', 'version': 1, 'community': 'public'}
+    config = {'tmpdir': str(tmp_path), 'logParams': {'logFile': str(tmp_path / 'log'), 'logLevel': 'WARNING'},
+              'snmpMon': {'dev1': {'snmpParams': snmpParams}}}
+    monitor = SNMPMonitoring(config, 'dev1')
+    monitor.sessionPool = SessionPool(snmpParams, monitor.logger)
+    monitor.sessionPool.session = FakeSession()
+    return monitor
+
+
+def testSecondCycleIsTargeted(monitor):
+    """Second cycle with unchanged ifNumber/ifTableLastChange only GETs discovered ifIndexes"""
+    session = monitor.sessionPool.session
+    monitor.startwork()
+    assert monitor.discovery['runtime']
+    assert sorted(monitor.discovery['indexes']) == ['1', '2', '3', '4']
+    columnWalks = [oid for oid in session.walks if oid in ('ifDescr', 'ifHCInOctets')]
+    assert columnWalks
+    session.walks, session.gets = [], []
+    # sysUpTime moves forward on every poll
+    session.scalars['sysUpTime.0'] += 3000
+    monitor.startwork()
+    assert not [oid for oid in session.walks if oid in ('ifDescr', 'ifHCInOctets')]
+    polled = {oid.split('.', 1)[1] for oids in session.gets for oid in oids if oid.startswith('ifHCInOctets.')}
+    assert polled == {'1', '2', '3', '4'}
+
+
+def testIfNumberChangeRediscovers(monitor):
+    """Changed ifNumber triggers a full walk"""
+    session = monitor.sessionPool.session
+    monitor.startwork()
+    session.walks = []
+    session.table['5'] = dict(session.table['1'], ifDescr='Eth5')
+    session.scalars['ifNumber.0'] = 5
+    monitor.startwork()
+    assert 'ifHCInOctets' in session.walks
+    assert '5' in monitor.discovery['indexes']
+
+
+def testDownInterfaceStaysPolled(monitor):
+    """Interface filtered out by status rule at discovery is polled again once it comes up"""
+    monitor.filterRules = type(monitor.filterRules)(
+        {'filters': [{'Key': 'ifOperStatus', 'Val': 1}]}, monitor.logger)
+    session = monitor.sessionPool.session
+    session.table['2']['ifOperStatus'] = 2
+    monitor.startwork()
+    assert '2' in monitor.discovery['indexes']
+    session.table['2']['ifOperStatus'] = 1
+    session.scalars['sysUpTime.0'] += 3000
+    monitor.startwork()
+    polled = {oid.split('.', 1)[1] for oids in session.gets for oid in oids if oid.startswith('ifOperStatus.')}
+    assert '2' in polled
@@ -0,0 +1,113 @@
+"""Tests for worker supervisor (backoff, adoption, prune)"""
+import os
+import stat
+import time
+import uuid
+import logging
+import pytest
+from SNMPMon.supervisor import Supervisor
+from SNMPMon.daemonizer import getPidFile
+
+COMPONENT = 'SNMPMonitoring'
+
+
+@pytest.fixture(name='devname')
+def fixtureDevname(tmp_path, monkeypatch):
+    """Fake worker command on PATH (device names ending with crash exit) and unique device name"""
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    script = bindir / COMPONENT
+    script.write_text('#!/bin/sh\ncase "$4" in *crash) exit 3;; esac\nsleep 1000\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    return f'test-{uuid.uuid4().hex[:8]}'
+
+
+@pytest.fixture(name='supervisors')
+def fixtureSupervisors():
+    """Created supervisors, all their workers are stopped at the end"""
+    out = []
+    yield out
+    for supervisor in out:
+        for key in list(supervisor.workers):
+            supervisor.stop(*key)
+
+
+def _supervisor(supervisors, **params):
+    supervisor = Supervisor(logging.getLogger('test'), dict({'backoff': 5, 'maxBackoff': 20}, **params))
+    supervisors.append(supervisor)
+    return supervisor
+
+
+def _waitExit(worker, timeout=5):
+    endTime = time.time() + timeout
+    while worker.poll() is None and time.time() < endTime:
+        time.sleep(0.01)
+
+
+def testBackoff(devname, supervisors):
+    """Crashing worker is restarted with exponential backoff, limited by maxBackoff"""
+    supervisor = _supervisor(supervisors)
+    exits = []
+    supervisor.onExit(lambda worker, exitCode: exits.append((worker.name, exitCode)))
+    worker = supervisor.ensure(COMPONENT, f'{devname}-crash')
+    backoffs = []
+    for _ in range(4):
+        _waitExit(worker)
+        supervisor.check()
+        backoffs.append(worker.backoff)
+        assert worker.handle is None and worker.nextStart > time.time()
+        # Not restarted before backoff passed
+        supervisor.ensure(COMPONENT, f'{devname}-crash')
+        assert worker.handle is None
+        worker.nextStart = 0
+        supervisor.ensure(COMPONENT, f'{devname}-crash')
+        assert worker.handle is not None
+    assert backoffs == [5, 10, 20, 20]
+    assert exits == [(f'{COMPONENT}-{devname}-crash', 3)] * 4
+    assert worker.stats['restarts'] == 4 and worker.stats['last_exit_code'] == 3
+
+
+def testStableWorkerRestartsWithoutBackoff(devname, supervisors):
+    """Worker which ran at least stableTime restarts immediately"""
+    supervisor = _supervisor(supervisors, stableTime=60)
+    worker = supervisor.ensure(COMPONENT, f'{devname}-crash')
+    _waitExit(worker)
+    worker.started -= 120
+    supervisor.check()
+    assert worker.backoff == 0
+    supervisor.ensure(COMPONENT, f'{devname}-crash')
+    assert worker.handle is not None
+
+
+def testAdopt(devname, supervisors):
+    """Worker started by previous supervisor (pidfile) is adopted, not started again"""
+    previous = _supervisor(supervisors)
+    pid = previous.ensure(COMPONENT, devname).handle.pid
+    supervisor = _supervisor(supervisors)
+    worker = supervisor.ensure(COMPONENT, devname)
+    assert worker.handle.pid == pid
+    assert supervisor.stats['supervisor_adopted'] == 1 and supervisor.stats['supervisor_starts'] == 0
+    assert worker.poll() is None
+
+
+def testAdoptReusedPid(devname, supervisors):
+    """Pidfile of other process (pid reused) is not adopted"""
+    supervisor = _supervisor(supervisors)
+    with open(getPidFile(COMPONENT, devname), 'w', encoding='utf-8') as fd:
+        fd.write(f'{os.getpid()}\n')
+    worker = supervisor.ensure(COMPONENT, devname)
+    assert worker.handle.pid != os.getpid()
+    assert supervisor.stats['supervisor_adopted'] == 0 and supervisor.stats['supervisor_starts'] == 1
+
+
+def testPrune(devname, supervisors):
+    """Workers not in device list are stopped"""
+    supervisor = _supervisor(supervisors)
+    kept = supervisor.ensure(COMPONENT, f'{devname}-a')
+    removed = supervisor.ensure(COMPONENT, f'{devname}-b')
+    assert supervisor.prune(COMPONENT, [f'{devname}-a']) == [f'{COMPONENT}-{devname}-b']
+    assert list(supervisor.workers) == [(COMPONENT, f'{devname}-a')]
+    assert removed.poll() is not None and not os.path.exists(removed.pidfile)
+    assert kept.poll() is None
+    assert supervisor.getStats()['supervisor']['supervisor_running'] == 1
@@ -0,0 +1,46 @@
+"""Tests for output merge (IndexedMerge/updatedict) and output file helpers"""
+from SNMPMon.utilities import IndexedMerge, updatedict, getFileContentAsJson
+
+
+def testMergeScalarsAndNested():
+    """Scalars are replaced, nested dicts are appended with next free integer index"""
+    orig = {'dev1': {'hostname': 'a', 'macs': {'0': 'm0', '1': 'm1'}}}
+    out = updatedict(orig, {'dev1': {'hostname': 'b', 'macs': {'x': 'm2', 'y': 'm3'}},
+                            'dev2': {'macs': {'x': 'm4'}}})
+    assert out == {'dev1': {'hostname': 'b', 'macs': {'0': 'm0', '1': 'm1', '2': 'm2', '3': 'm3'}},
+                   'dev2': {'macs': {'0': 'm4'}}}
+
+
+def testMergeSkipsEmpty():
+    """Empty nested dicts do not create containers"""
+    assert updatedict({}, {'dev1': {'macs': {}}}) == {}
+
+
+def testIndexedMergeSameAsRepeatedUpdatedict():
+    """Repeated merges continue after the highest integer index (not after the count of entries)"""
+    patches = [{'dev1': {'macs': {'a': str(num), 'b': str(num + 1)}}} for num in range(5)]
+    expected = {'dev1': {'macs': {'5': 'x'}}}
+    for patch in patches:
+        expected = updatedict(expected, patch)
+    merged = IndexedMerge({'dev1': {'macs': {'5': 'x'}}})
+    for patch in patches:
+        merged.update(patch)
+    assert merged.out == expected
+    assert sorted(map(int, merged.out['dev1']['macs'])) == [5] + list(range(6, 16))
+
+
+def testIndexedMergeReplacedContainer():
+    """Container replaced by a scalar merge (or outside) is scanned again"""
+    merged = IndexedMerge({'dev1': {'macs': {'0': 'a'}}})
+    merged.update({'dev1': {'macs': {'x': 'b'}}})
+    merged.out['dev1']['macs'] = {'7': 'c'}
+    merged.update({'dev1': {'macs': {'x': 'd'}}})
+    assert merged.out == {'dev1': {'macs': {'7': 'c', '8': 'd'}}}
+
+
+def testFileContentFallback(tmp_path, capsys):
+    """Output which is not JSON (python literal) is evaluated from the beginning of file"""
+    fName = tmp_path / 'out.json'
+    fName.write_text("{'dev1': {'up': True}}", encoding='utf-8')
+    assert getFileContentAsJson(str(fName)) == {'dev1': {'up': True}}
+    assert not capsys.readouterr().out